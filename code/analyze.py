@@ -4,15 +4,17 @@ Some analysis of the wf tags in semcor.
 
 Usage:
 
-$ python3 analyze.py MAXFILES?
+$ python3 analyze.py [-j PROCESSES] MAXFILES?
 
 The optional argument determines how many files are used for analysis, the
 default is to use all files. This assumes that files have been compiled with
-semcor.py. Results are printed to standard output and to a file weird-rdfs.txt,
-the latter contains some ANSI espace sequences and to see the contents you
-should just do a "cat weird-rdfs.txt" (those escape sequences are no good for
-Windows or when you want to open the file in an editor, this will be changed at
-some point).
+semcor.py. The analysis is done for each compiled file separately, using a pool
+of worker processes, and the results for the files are then merged. The -j
+option sets the number of processes, the default is the number of CPUs.
+Results are printed to standard output and to a file weird-rdfs.txt, the latter
+contains some ANSI espace sequences and to see the contents you should just do
+a "cat weird-rdfs.txt" (those escape sequences are no good for Windows or when
+you want to open the file in an editor, this will be changed at some point).
 
 There are a couple of funky parts to semcor. One is that the lemma value of
 proper names is set to the the entity type. This script analyzes what happens
@@ -24,6 +26,8 @@ names. Not sure exactly what they exactly are, but they are printed to the file
 weird-rdfs.txt. It should also be noted that those cases are not the same as the
 cases where the lemma is different from the actual text of the wf tag, that
 group is much bigger (more than half of all forms, it includes all inflections).
+Both cases are also reported by validate.py, which checks all files for these and
+other annotation problems.
 
 TODO:
 - add argument to suppress ANSI escape sequences in output file
@@ -32,97 +36,149 @@ TODO:
 """
 
 
-import sys
+from __future__ import print_function
+
+import sys, getopt, multiprocessing
 from collections import Counter
-from semcor import Semcor, SemcorFile
+
+import compiled
+from semcor import semcor_files
 from ansi import BLUE, GREY, END
 from utils import kwic_line
 
 
-def collect_data(sc, raw_attributes, attributes, attribute_index,
-                 groups, weird_rdfs):
-    
-    for scfile in sc.files:
-        for wf in scfile.forms:
-            raw_attributes['list'].extend(wf.keys)
-            # counting the attributes
-            for attr in attributes:
-                val = getattr(wf, attr)
-                if val is not None:
-                    attribute_index[attr]['count'] += 1
-                    attribute_index[attr]['values'].append(val)
-            # the case where we have a pn and the lemma is actually set to it
-            if wf.lemma == wf.pn == wf.rdf:
-                groups['count'] += 1
-                groups['tag'].append(wf.pos)
-                groups['pn_value'].append(wf.pn)
-                groups['rdf_value'].append(wf.rdf)
-            # there are rdf attributes used for something else
-            if wf.rdf is not None and wf.pn is None:
-                weird_rdfs.append(wf)
-    # make dictionaries of all the lists
-    raw_attributes['dict'] = Counter(raw_attributes['list'])
-    for key in ('tag', 'pn_value', 'rdf_value'):
-        groups[key] = Counter(groups[key])
-    for attr in attributes:
-        attribute_index[attr]['values'] = Counter(attribute_index[attr]['values'])
-
-
-def print_attr_info(raw_attributes, attribute_index):
+# the attributes of WordForms that are counted
+ATTRIBUTES = ('pos', 'rdf', 'pn', 'lemma', 'wnsn', 'lexsn')
+
+# the width of the contexts for the weird rdfs
+CONTEXT = 50
+
+
+def empty_result():
+    """Return a dictionary for the results of the analysis with all counts set
+    to zero. All counts are Counters or integers so they can be added up."""
+    return {
+        # the raw attributes on the wf tags
+        'keys': Counter(),
+        # counting the attributes and their values
+        'attributes': Counter(),
+        'values': dict((attr, Counter()) for attr in ATTRIBUTES),
+        # the case where we have a pn and the lemma is actually set to it
+        'pn_count': 0,
+        'tag': Counter(),
+        'pn_value': Counter(),
+        'rdf_value': Counter(),
+        # occurrences of nouns, used for counting basic types
+        'nouns': Counter(),
+        # KWIC data for forms with an rdf attribute that is not a proper name
+        'weird_rdfs': []}
+
+
+def analyze_file(fname):
+    """Analyze the compiled version of the Semcor file fname and return a
+    dictionary with the results. This is the map step, it only looks at one
+    file."""
+    scfile = compiled.read(compiled.file_name(fname), 'file')
+    result = empty_result()
+    for wf in scfile.forms:
+        result['keys'].update(wf.keys)
+        for attr in ATTRIBUTES:
+            val = getattr(wf, attr)
+            if val is not None:
+                result['attributes'][attr] += 1
+                result['values'][attr][val] += 1
+        if wf.lemma == wf.pn == wf.rdf:
+            result['pn_count'] += 1
+            result['tag'][wf.pos] += 1
+            result['pn_value'][wf.pn] += 1
+            result['rdf_value'][wf.rdf] += 1
+        # there are rdf attributes used for something else
+        if wf.rdf is not None and wf.pn is None:
+            result['weird_rdfs'].append((wf.rdf,) + wf.kwic(CONTEXT))
+        if wf.pos == 'NN':
+            result['nouns'][wf.lemma] += 1
+    return result
+
+
+def merge_results(total, result):
+    """Add the result for a file to the total. This is the reduce step."""
+    for key, value in result.items():
+        if key == 'values':
+            for attr in ATTRIBUTES:
+                total[key][attr].update(value[attr])
+        else:
+            total[key] += value
+    return total
+
+
+def collect_data(fnames, processes=None):
+    """Analyze the compiled files in fnames using a pool of processes and return
+    the merged results. The results for the files come back in the order of
+    fnames and are merged as they come in, so only the merged counts and the
+    results for a few files are in memory at any time."""
+    total = empty_result()
+    if processes == 1:
+        for fname in fnames:
+            merge_results(total, analyze_file(fname))
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            for result in pool.imap(analyze_file, fnames, chunksize=4):
+                merge_results(total, result)
+        finally:
+            pool.close()
+            pool.join()
+    return total
+
+
+def print_attr_info(results):
     # for now just printing the raw counts
     print("ATTRIBUTES\n")
-    for attr in sorted(raw_attributes['dict']):
-        print("  %6d  %s" % (raw_attributes['dict'][attr], attr))
+    for attr in sorted(results['keys']):
+        print("  %6d  %s" % (results['keys'][attr], attr))
 
 
-def print_pn_info(pns):
+def print_pn_info(results):
     print("\nPROPER NAMES")
-    print("\n   COUNT = %s" % pns['count'])
+    print("\n   COUNT = %s" % results['pn_count'])
     for key in ('tag', 'pn_value', 'rdf_value'):
         print()
-        for subkey, count in pns[key].items():
+        for subkey, count in results[key].items():
             print("     %4d  %s=%s" % (count, key, subkey))
     print()
 
 
-def print_weird_rdfs(forms):
+def print_weird_rdfs(weird_rdfs):
     lemmas = {}
-    context = 50
-    for wf in forms:
-        (left, kw, right) = wf.kwic(context)
-        lemmas.setdefault(wf.rdf, []).append((left, kw, right, wf.sent.as_string()))
+    for (rdf, left, kw, right) in weird_rdfs:
+        lemmas.setdefault(rdf, []).append((left, kw, right))
     with open('weird-rdfs.txt', 'w') as fh:
         for lemma in sorted(lemmas):
-            for (left, kw, right, sent) in lemmas[lemma]:
-                width = (2 * context) + 30
-                line = kwic_line(left, kw, right, context)
+            for (left, kw, right) in lemmas[lemma]:
+                width = (2 * CONTEXT) + 30
+                line = kwic_line(left, kw, right, CONTEXT)
                 line = '{s: <{width}}'.format(s=line, width=width)
                 fh.write("%s %s%s%s\n" % (line, GREY, lemma, END))
 
 
-def count_basic_types(sc):
-    """Counts how often noun tokens go with a particular count of basic types."""
+def count_basic_types(summaries, nouns):
+    """Counts how often noun tokens go with a particular count of basic types. The
+    nouns argument is a Counter with the number of occurrences for each noun, the
+    basic types of each noun are taken from the LemmaSummaries."""
     instances = 0
-    btypes_count = []
+    btypes_count = Counter()
     word_sets_per_btype_size = []
     for i in range(21):
         word_sets_per_btype_size.append(set())
-    for file in sc.files:
-        for wf in file.forms:
-            if wf.pos != 'NN':
-                continue
-            btypes = []
-            synsets = sc.synset_idx.get(wf.lemma,{}).values()
-            synsets = [ss for ss in synsets if ss.cat == 'noun']
-            for synset in synsets:
-                btypes.extend(synset.btypes.split())
-            instances += 1
-            btypes_count.append(len(set(btypes)))
-            word_sets_per_btype_size[len(set(btypes))].add(wf.lemma)
-            if len(set(btypes)) > 8:
-                print(len(set(btypes)), wf.lemma)
+    for lemma, count in nouns.items():
+        btypes = summaries.btypes(lemma)
+        instances += count
+        btypes_count[len(btypes)] += count
+        word_sets_per_btype_size[len(btypes)].add(lemma)
+        if len(btypes) > 8:
+            print(len(btypes), lemma)
     print("INSTANCES: %d" % instances)
-    print("TYPE_COUNT: %s" % Counter(btypes_count))
+    print("TYPE_COUNT: %s" % btypes_count)
     print("\nWORD_SET_PER_COUNT:")
     for i in range(21):
         words = word_sets_per_btype_size[i]
@@ -131,27 +187,19 @@ def count_basic_types(sc):
 
 if __name__ == '__main__':
 
-    maxfiles = int(sys.argv[1]) if len(sys.argv) > 1 else 999
-
-    sc = Semcor(maxfiles)
-
-    # basic statistics on all attributes
-    raw_attributes = { 'list': [], 'dict': None }
-    attributes = ('pos', 'rdf', 'pn', 'lemma', 'wnsn', 'lexsn')
-    attribute_index = {}
-    for attr in attributes:
-        attribute_index[attr] = { 'count': 0, 'values': [] }
-
-    # keeping track of what happens when there is a pn attribute attribute
-    pns = { 'count': 0, 'tag': [], 'pn_value': [], 'rdf_value': [] }
-
-    # those forms with an rdf attribute that do not have a group attribute
-    weird_rdfs = []
+    options, args = getopt.getopt(sys.argv[1:], 'j:')
+    options = { name: value for (name, value) in options }
+    processes = int(options['-j']) if '-j' in options else None
+    maxfiles = int(args[0]) if args else 999
 
-    collect_data(sc, raw_attributes, attributes, attribute_index, pns, weird_rdfs)
+    results = collect_data(semcor_files()[:maxfiles], processes)
 
-    print_attr_info(raw_attributes, attribute_index)
-    print_pn_info(pns)
-    print_weird_rdfs(weird_rdfs)
+    print_attr_info(results)
+    print_pn_info(results)
+    print_weird_rdfs(results['weird_rdfs'])
 
-    count_basic_types(sc)
+    try:
+        summaries = compiled.read(compiled.file_name('summaries'), 'summaries')
+    except (IOError, compiled.CompiledFormatError):
+        sys.exit("No compiled summaries, compile with semcor.py first")
+    count_basic_types(summaries, results['nouns'])
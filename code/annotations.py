@@ -0,0 +1,297 @@
+"""annotations.py
+
+Annotations from external tools, like dependency parses, aligned to Semcor
+tokens.
+
+An annotation layer has a column for each annotation, with one value for each
+global token identifier (see tokens.py), so all tokens of the corpus take a few
+integers per column and no Python objects are created for the parses:
+
+   head     the global token identifier of the head, -1 for the root and for
+            tokens without an annotation
+   deprel   the dependency relation with the head
+   lemma    the lemma given by the tool
+   pos      the part-of-speech given by the tool
+
+String values are stored as identifiers in a Vocabulary (see vocab.py), with -1
+for missing values. Layers are read from files in one of two formats, one
+sentence at a time, and are saved with the compiled files under a name.
+
+CoNLL files have one line per token and an empty line after each sentence. The
+columns are those of CoNLL-U or CoNLL-X, that is, the token number, the form,
+the lemma, two part-of-speech columns, features, the head and the dependency
+relation, with further columns ignored. A comment line '# sent_id = 42' before
+a sentence gives its sentence number, without it the number of the previous
+sentence plus one is used.
+
+JSONL files have one sentence per line, as in
+
+   {"sentence": 42, "tokens": [{"lemma": "say", "pos": "VBD", "head": 0, "deprel": "root"}, ...]}
+
+In both formats sentence numbers start at 1 and count the sentences of all files
+in the order of SEMCOR_FILES. This is the numbering of sent_idx after
+Semcor.create_sentence_index() with the base names of SEMCOR_FILES in that
+order, so sentence 1 is the first sentence of br-a01. A first sentence without
+a number is sentence 1. Sentence n is global sentence n - 1 in tokens.py and
+Semcor.sentence(), which start at 0. Heads are token numbers in the sentence
+starting at 1, with 0 for the root. Sentences with a different number of tokens
+than the Semcor sentence are skipped, as are sentence numbers that do not exist,
+so tools should be run on the tokens of Sentence.as_string() split on spaces.
+
+Usage:
+
+>>> layer = AnnotationLayer.read('parses.conll', table)
+>>> layer.save('stanford')
+>>> sc = Semcor()
+>>> sc.load_annotations('stanford')
+>>> layer = sc.annotations
+>>> layer.get_deprel(sc.token_id(wf))
+>>> list(layer.filter(sc, sc.lemma_idx['jury'], deprel='nsubj'))
+>>> list(sc.query('lemma=jury deprel=nsubj head=say'))
+
+Usage from the command line:
+
+$ python annotations.py import NAME FILE
+$ python annotations.py stats NAME
+
+The first reads FILE, which is in JSONL format if its name ends in .jsonl and in
+CoNLL format otherwise, and saves it as layer NAME. The second prints the
+number of tokens for each dependency relation in layer NAME.
+
+"""
+
+from __future__ import print_function
+
+import sys, json
+from array import array
+
+import compiled
+from vocab import Vocabulary
+from tokens import load_token_table
+
+
+COLUMNS = ('head', 'deprel', 'lemma', 'pos')
+
+
+class AnnotationLayer(object):
+
+    """Token-aligned annotation columns.
+
+    Instance variables:
+
+    table : TokenTable
+       The table with the global token identifiers that the columns use.
+
+    head, deprel, lemma, pos : arrays of integers
+       The columns, indexed on global token identifier.
+
+    deprels, lemmas, tags : Vocabulary
+       The strings for the deprel, lemma and pos columns.
+
+    sentences : integer
+       The number of sentences that were added.
+
+    skipped : integer
+       The number of sentences that were skipped because the sentence number
+       does not exist or because the number of tokens is different.
+
+    """
+
+    def __init__(self, table):
+        """Create an empty layer for the tokens in a TokenTable."""
+        self.table = table
+        size = table.token_starts[-1]
+        self.head = array('i', [-1]) * size
+        self.deprel = array('i', [-1]) * size
+        self.lemma = array('i', [-1]) * size
+        self.pos = array('i', [-1]) * size
+        self.deprels = Vocabulary()
+        self.lemmas = Vocabulary()
+        self.tags = Vocabulary()
+        self.sentences = 0
+        self.skipped = 0
+
+    def __getstate__(self):
+        # the table is loaded with the layer
+        state = self.__dict__.copy()
+        state['table'] = None
+        return state
+
+    def __str__(self):
+        return "<AnnotationLayer sentences=%d skipped=%d deprels=%d>" \
+               % (self.sentences, self.skipped, len(self.deprels))
+
+    @classmethod
+    def read(cls, path, table):
+        """Create a layer from a file in CoNLL or JSONL format, depending on the
+        extension of the file name."""
+        layer = cls(table)
+        with open(path) as fh:
+            if path.endswith('.jsonl'):
+                layer.add_jsonl(fh)
+            else:
+                layer.add_conll(fh)
+        return layer
+
+    def add_sentence(self, number, rows):
+        """Add a sentence with a global sentence number, which starts at 0, where
+        rows has a tuple with the lemma, pos, head and deprel of each token.
+        Returns False if the sentence was skipped."""
+        if not 0 <= number < self.table.sentence_starts[-1] \
+           or len(rows) != self.table.sentence_size(number):
+            self.skipped += 1
+            return False
+        start = self.table.sentence_tokens[number]
+        for token, (lemma, pos, head, deprel) in enumerate(rows, start):
+            self.lemma[token] = -1 if lemma is None else self.lemmas.add(lemma)
+            self.pos[token] = -1 if pos is None else self.tags.add(pos)
+            self.deprel[token] = -1 if deprel is None else self.deprels.add(deprel)
+            self.head[token] = start + head - 1 if head and head <= len(rows) else -1
+        self.sentences += 1
+        return True
+
+    def add_conll(self, lines):
+        """Add the sentences from lines in CoNLL format, with sentence numbers
+        starting at 1."""
+        number = 0
+        given = None
+        rows = []
+        for line in lines:
+            line = line.rstrip('\n')
+            if line.startswith('#'):
+                key, _, value = line[1:].partition('=')
+                if key.strip() == 'sent_id' and value.strip().isdigit():
+                    given = int(value)
+            elif line.strip():
+                fields = line.split('\t')
+                if len(fields) < 8:
+                    raise ValueError("expected at least 8 columns in %r" % line)
+                # multiword tokens like 1-2 and empty nodes like 1.1 are skipped,
+                # the second part-of-speech column is used if it has a value
+                if fields[0].isdigit():
+                    pos = value_or_none(fields[4]) or value_or_none(fields[3])
+                    head = int(fields[6]) if fields[6].isdigit() else None
+                    rows.append((value_or_none(fields[2]), pos, head, value_or_none(fields[7])))
+            elif rows:
+                number = number + 1 if given is None else given
+                self.add_sentence(number - 1, rows)
+                given = None
+                rows = []
+        if rows:
+            number = number + 1 if given is None else given
+            self.add_sentence(number - 1, rows)
+
+    def add_jsonl(self, lines):
+        """Add the sentences from lines in JSONL format, with sentence numbers
+        starting at 1."""
+        number = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            sentence = json.loads(line)
+            number = sentence.get('sentence', number + 1)
+            self.add_sentence(number - 1, [(t.get('lemma'), t.get('pos'), t.get('head'),
+                                        t.get('deprel'))
+                                       for t in sentence['tokens']])
+
+    def get_head(self, token):
+        """Return the global token identifier of the head of the token, or None
+        for the root and for tokens without an annotation."""
+        head = self.head[token]
+        return None if head < 0 else head
+
+    def get_deprel(self, token):
+        deprel = self.deprel[token]
+        return None if deprel < 0 else self.deprels.string(deprel)
+
+    def get_lemma(self, token):
+        lemma = self.lemma[token]
+        return None if lemma < 0 else self.lemmas.string(lemma)
+
+    def get_pos(self, token):
+        pos = self.pos[token]
+        return None if pos < 0 else self.tags.string(pos)
+
+    def head_lemma(self, token, semcor=None):
+        """Return the lemma of the head of the token, taken from the layer or,
+        if the layer has no lemma for it, from the Semcor WordForm."""
+        head = self.head[token]
+        if head < 0:
+            return None
+        lemma = self.get_lemma(head)
+        if lemma is None and semcor is not None:
+            element = semcor.token(head)
+            if element is not None and element.is_word_form():
+                lemma = element.lemma
+        return lemma
+
+    def tokens_with(self, deprel=None, head_lemma=None):
+        """Return an array with the global token identifiers of all tokens with
+        the dependency relation and the head lemma, None matches any value.
+        Head lemmas are only taken from the layer."""
+        deprel_id = -1 if deprel is None else self.deprels.get(deprel, -2)
+        lemma_id = -1 if head_lemma is None else self.lemmas.get(head_lemma, -2)
+        if deprel_id == -2 or lemma_id == -2:
+            return array('i')
+        tokens = range(len(self.head))
+        if deprel_id >= 0:
+            tokens = [t for t, d in zip(tokens, self.deprel) if d == deprel_id]
+        if lemma_id >= 0:
+            head, lemma = self.head, self.lemma
+            tokens = [t for t in tokens if head[t] >= 0 and lemma[head[t]] == lemma_id]
+        return array('i', tokens)
+
+    def filter(self, semcor, wfs, deprel=None, head_lemma=None):
+        """Yield the WordForms that have the dependency relation and the head
+        lemma, None matches any value."""
+        wfs = list(wfs)
+        deprel_id = None if deprel is None else self.deprels.get(deprel, -2)
+        for wf, token in zip(wfs, semcor.token_ids(wfs)):
+            if deprel_id is not None and self.deprel[token] != deprel_id:
+                continue
+            if head_lemma is not None and self.head_lemma(token, semcor) != head_lemma:
+                continue
+            yield wf
+
+    def save(self, name):
+        compiled.write(file_name(name), self, 'annotations')
+
+
+def file_name(name):
+    return compiled.file_name('annotations-' + name)
+
+
+def load_layer(name, table):
+    """Return the layer saved under name, raises an IOError if there is no such
+    layer and a ValueError if it does not match the token table."""
+    layer = compiled.read(file_name(name), 'annotations')
+    if len(layer.head) != table.token_starts[-1]:
+        raise ValueError("annotation layer %s does not match the compiled files" % name)
+    layer.table = table
+    return layer
+
+
+def value_or_none(value):
+    return None if value in ('_', '') else value
+
+
+if __name__ == '__main__':
+
+    from semcor import semcor_files
+
+    if len(sys.argv) == 4 and sys.argv[1] == 'import':
+        table = load_token_table([], semcor_files())
+        layer = AnnotationLayer.read(sys.argv[3], table)
+        layer.save(sys.argv[2])
+        print(layer)
+    elif len(sys.argv) == 3 and sys.argv[1] == 'stats':
+        layer = load_layer(sys.argv[2], load_token_table([], semcor_files()))
+        print(layer)
+        counts = array('i', [0]) * len(layer.deprels)
+        for deprel in layer.deprel:
+            if deprel >= 0:
+                counts[deprel] += 1
+        for deprel, count in sorted(zip(layer.deprels.strings, counts), key=lambda p: -p[1]):
+            print("%8d  %s" % (count, deprel))
+    else:
+        print(__doc__)
@@ -0,0 +1,260 @@
+"""benchmark.py
+
+Benchmarks for compiling, loading and querying Semcor.
+
+Usage:
+
+$ python benchmark.py compression [-n MAXFILES] [--bandwidth MBPS]
+
+   Writes the compiled files with each compression method to a temporary
+   directory and reports the total size, the time it takes to load all files
+   (reading, decompressing and unpickling, which is what Semcor._load does for
+   each file) and an estimate of the cold start time for a worker that first
+   needs to copy the files at a bandwidth of MBPS megabytes per second (the
+   default is 100). This assumes that the files were compiled.
+
+$ python benchmark.py loading [-n MAXFILES] [--threads THREADS]
+
+   Loads the compiled files and builds the lemma index one file after the
+   other, with and without garbage collection, and with the pipelined loader
+   that Semcor._load uses, where THREADS threads read the files (the default is
+   the number in compiled.THREADS). Each is run with a warm page cache and with
+   a cold one, for the cold runs the operating system is asked to drop the
+   files from the page cache first, which is only possible on some systems.
+
+$ python benchmark.py imports [--runs RUNS]
+
+   Imports each module in IMPORT_MODULES in a new interpreter and reports the
+   time taken by the import and by the whole process, which includes starting
+   the interpreter, taking the median of RUNS runs (the default is 5).
+
+$ python benchmark.py threads [-n MAXFILES] [--threads THREADS] [--rounds ROUNDS]
+
+   Loads and freezes Semcor and runs the browser commands in STRESS_COMMANDS
+   once in this thread and then ROUNDS times in a pool of THREADS threads (the
+   defaults are 10 rounds and 8 threads). Each round uses its own Browser and
+   the output of each round is compared to the output of the first run, any
+   difference is reported and makes the benchmark exit with an error.
+
+"""
+
+from __future__ import print_function
+
+import io, os, sys, gc, time, getopt, shutil, tempfile, threading, subprocess
+
+import compiled
+from semcor import semcor_files
+
+
+# Loaders compared by the loading benchmark, with a name, the number of threads
+# (None for the default) and whether garbage collection is switched off.
+LOADERS = [('sequential', 1, False), ('sequential, no gc', 1, True),
+           ('pipelined', None, True)]
+
+# Modules timed by the imports benchmark.
+IMPORT_MODULES = ['compiled', 'semcor', 'browse', 'analyze', 'evaluate', 'features',
+                  'splits', 'database', 'shared', 'lexicon', 'query', 'collocations']
+
+# Browser commands run by the threads benchmark, as a method name with its
+# arguments.
+STRESS_COMMANDS = [('show_noun', 'jury'), ('show_more',), ('show_verb', 'say'),
+                   ('show_stats', 'walk'), ('show_basic_type_pair', 'act-evt'),
+                   ('show_more',), ('show_paragraph', 'br-a01-13'),
+                   ('show_context', 'br-a01-13 3'), ('show_document_page', 1),
+                   ('show_query', 'pos=NN btype=act within sentence of lemma=say'),
+                   ('show_query', 'lemma~^walk pos=VB'), ('show_lemmas', 'grand_*')]
+
+
+# Compression methods and levels compared by the compression benchmark.
+COMPRESSION_METHODS = [(None, None), ('zlib', 1), ('zlib', 6), ('zlib', 9),
+                       ('lzma', 0), ('lzma', 1), ('lzma', 6)]
+
+
+def benchmark_compression(maxfiles=999, bandwidth=100):
+    fnames = semcor_files()[:maxfiles]
+    loaded = [compiled.read(compiled.file_name(fname), 'file') for fname in fnames]
+    tmpdir = tempfile.mkdtemp()
+    print("\n%-8s %5s %10s %10s %10s %12s" %
+          ('method', 'level', 'size (MB)', 'write (s)', 'load (s)', 'cold start (s)'))
+    try:
+        for compression, level in COMPRESSION_METHODS:
+            if compression == 'lzma' and compiled.lzma is None:
+                continue
+            paths = [os.path.join(tmpdir, os.path.basename(fname)) for fname in fnames]
+            t0 = time.time()
+            for path, semcor_file in zip(paths, loaded):
+                compiled.write(path, semcor_file, 'file', compression, level)
+            # garbage collection is switched off because with this many objects
+            # it takes more time than decompression and adds a lot of noise
+            gc.disable()
+            t1 = time.time()
+            for path in paths:
+                compiled.read(path, 'file')
+            t2 = time.time()
+            gc.enable()
+            size = sum(os.path.getsize(path) for path in paths) / 1000000.0
+            cold_start = size / bandwidth + (t2 - t1)
+            print("%-8s %5s %10.2f %10.2f %10.2f %12.2f"
+                  % (compression, level, size, t1 - t0, t2 - t1, cold_start))
+    finally:
+        shutil.rmtree(tmpdir)
+    print()
+
+
+def drop_from_page_cache(paths):
+    """Ask the operating system to drop the files from the page cache, return
+    False if this is not supported."""
+    if not hasattr(os, 'posix_fadvise'):
+        return False
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+    return True
+
+
+def load(paths, threads, no_gc):
+    """Load the files and index their forms on lemma, return the time taken."""
+    t0 = time.time()
+    if no_gc:
+        gc.disable()
+    try:
+        lemma_idx = {}
+        for semcor_file in compiled.read_many(paths, 'file', threads):
+            for form in semcor_file.forms:
+                lemma_idx.setdefault(form.lemma, []).append(form)
+        return time.time() - t0
+    finally:
+        gc.enable()
+
+
+def benchmark_loading(maxfiles=999, threads=None):
+    paths = [compiled.file_name(fname) for fname in semcor_files()[:maxfiles]]
+    if threads is None:
+        threads = compiled.THREADS
+    print("\n%-20s %8s %10s %10s" % ('loader', 'threads', 'warm (s)', 'cold (s)'))
+    for name, loader_threads, no_gc in LOADERS:
+        loader_threads = threads if loader_threads is None else loader_threads
+        # the first run warms the page cache
+        load(paths, loader_threads, no_gc)
+        warm = load(paths, loader_threads, no_gc)
+        if drop_from_page_cache(paths):
+            cold = "%10.2f" % load(paths, loader_threads, no_gc)
+        else:
+            cold = "%10s" % 'n/a'
+        print("%-20s %8d %10.2f %s" % (name, loader_threads, warm, cold))
+    print()
+
+
+def benchmark_imports(runs=5):
+    code = "import time; t0 = time.time(); import %s; print(time.time() - t0)"
+    print("\n%-12s %12s %12s" % ('module', 'import (ms)', 'process (ms)'))
+    for module in IMPORT_MODULES:
+        imports, processes = [], []
+        for run in range(runs):
+            t0 = time.time()
+            output = subprocess.check_output([sys.executable, '-c', code % module])
+            processes.append(time.time() - t0)
+            imports.append(float(output.decode().split()[-1]))
+        print("%-12s %12.1f %12.1f" % (module, 1000 * median(imports), 1000 * median(processes)))
+    print()
+
+
+class ThreadOutput(object):
+
+    """Replacement for sys.stdout that collects what is printed by a thread in a
+    buffer for that thread, between calls of start() and stop(). Output from
+    other threads goes to the real standard output."""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def start(self):
+        self.local.buffer = io.StringIO()
+
+    def stop(self):
+        output = self.local.buffer.getvalue()
+        self.local.buffer = None
+        return output
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is None:
+            sys.__stdout__.write(text)
+        else:
+            buffer.write(text)
+
+    def flush(self):
+        pass
+
+
+def run_commands(semcor, output):
+    """Run STRESS_COMMANDS with a new Browser and return what was printed."""
+    from browse import Browser
+    output.start()
+    try:
+        browser = Browser(semcor, interactive=False)
+        for command in STRESS_COMMANDS:
+            getattr(browser, command[0])(*command[1:])
+    finally:
+        result = output.stop()
+    return result
+
+
+def benchmark_threads(maxfiles=999, threads=8, rounds=10):
+    from multiprocessing.pool import ThreadPool
+    from semcor import Semcor
+    semcor = Semcor(maxfiles).freeze()
+    output = ThreadOutput()
+    sys.stdout = output
+    try:
+        t0 = time.time()
+        expected = run_commands(semcor, output)
+        t1 = time.time()
+        pool = ThreadPool(threads)
+        try:
+            results = pool.map(lambda n: run_commands(semcor, output), range(rounds))
+        finally:
+            pool.close()
+            pool.join()
+        t2 = time.time()
+    finally:
+        sys.stdout = sys.__stdout__
+    differences = [n for n, result in enumerate(results) if result != expected]
+    print("\n%d commands, %d lines of output" % (len(STRESS_COMMANDS), expected.count('\n')))
+    print("one round:              %6.2f seconds" % (t1 - t0))
+    print("%3d rounds, %2d threads:  %6.2f seconds" % (rounds, threads, t2 - t1))
+    if differences:
+        print("\nOutput differs from the first run in rounds %s\n"
+              % ' '.join(str(n) for n in differences))
+        sys.exit(1)
+    print("\nOutput of all rounds is identical\n")
+
+
+def median(values):
+    return sorted(values)[len(values) // 2]
+
+
+if __name__ == '__main__':
+
+    options, args = getopt.gnu_getopt(sys.argv[1:], 'n:', ['bandwidth=', 'threads=', 'runs=',
+                                                           'rounds='])
+    options = { name: value for (name, value) in options }
+    maxfiles = int(options.get('-n', 999))
+
+    if args == ['compression']:
+        bandwidth = float(options.get('--bandwidth', 100))
+        benchmark_compression(maxfiles, bandwidth)
+    elif args == ['loading']:
+        threads = int(options['--threads']) if '--threads' in options else None
+        benchmark_loading(maxfiles, threads)
+    elif args == ['imports']:
+        benchmark_imports(int(options.get('--runs', 5)))
+    elif args == ['threads']:
+        benchmark_threads(maxfiles, int(options.get('--threads', 8)),
+                          int(options.get('--rounds', 10)))
+    else:
+        print(__doc__)
@@ -11,45 +11,76 @@ $ python browse.py [--n MAXFILES]
 This assumes that sources have been compiled (see semcor.py).
 
 Current functionality:
-- printing statistics for a lemma (all senses)
+- printing statistics for a lemma (all senses), with the basic types, the most
+  frequent sense and the entropy of the senses (see summaries.py)
 - searching for a lemma and display results
 - include synset identifiers (new style, with lemmas) and glosses
 - display a paragraph that contains a given sentence
+- display a window of neighbouring sentences and page through a document
+- page through search results, which are selected randomly but reproducibly
+- search with a query language (see query.py) and explain the query plan
+- list lemmas and synsets by prefix or glob pattern, suggest lemmas for a lemma
+  that does not occur and complete lemmas with the tab key
 
 Further browser requirements
 - give me the documents/sentences where those two senses co-occur
 - search for a synset
 - search for occurrences of pairs of basic types
-- display context for a sentence (not the paragraph, but a window of
-  neighoring sentences)
-- add basic types to statistics on all senses for a word
 
 TODO:
 - when loading, print warning if sources have not been compiled yet
-  include note that python version matters
-- make sentences a linked list
-- for each sense only 10 word forms (selected randomly) are printed
-  perhaps add code to show more or to change the number of forms
 
 """
 
 from __future__ import print_function
 
-import sys, re, textwrap, random
+import sys, re, textwrap
 
 # SemcorFile needs to be imported for loading the pickled files
 from semcor import Semcor, SemcorFile
-from utils import read_input, kwic_line
+from utils import read_input
+from sampling import Pager
+from lexicon import is_pattern
+from query import QueryError
 from ansi import BLUE, GREEN, BOLD, GREY, END
 
+try:
+    import readline
+except ImportError:
+    # not available on all platforms, there is no completion without it
+    readline = None
+
+
+# commands that take a lemma as argument, used for completion
+LEMMA_COMMANDS = ('s', 'n', 'v', 'a', 'r', 'l')
+
+# maximum number of completions and suggestions
+COMPLETIONS = 100
+SUGGESTIONS = 10
+
 
 class Browser(object):
 
-    def __init__(self, semcor):
+    def __init__(self, semcor, interactive=True):
         self.semcor = semcor
-        self.userloop()
+        # the file and the number of the first sentence of the sentences that
+        # were printed last, used for paging through a document
+        self.document_page = None
+        self.document_page_size = 5
+        # sections of the last search, each with a title, a Pager over the
+        # results and a function that turns a page of results into lines
+        self.results = []
+        self.page_size = 10
+        self.seed = 0
+        self.completions = []
+        if interactive:
+            self.userloop()
 
     def userloop(self):
+        if readline is not None:
+            readline.set_completer(self.complete)
+            readline.set_completer_delims(' ')
+            readline.parse_and_bind('tab: complete')
         while True:
             print('*> ', end='')
             user_input = read_input().strip()
@@ -71,8 +102,28 @@ class Browser(object):
                 self.show_adjective(get_lemma(user_input))
             elif user_input.startswith('r '):
                 self.show_adverb(get_lemma(user_input))
+            elif user_input.startswith('query '):
+                self.show_query(user_input[6:].strip())
+            elif user_input.startswith('explain '):
+                self.show_query(user_input)
+            elif user_input.startswith('l '):
+                self.show_lemmas(get_lemma(user_input))
+            elif user_input.startswith('ls '):
+                self.show_synsets(user_input[3:].strip())
             elif user_input.startswith('p '):
                 self.show_paragraph(get_sentence(user_input))
+            elif user_input.startswith('c '):
+                self.show_context(user_input[2:].strip())
+            elif user_input == '>':
+                self.show_document_page(1)
+            elif user_input == '<':
+                self.show_document_page(-1)
+            elif user_input == 'm':
+                self.show_more()
+            elif user_input.startswith('ps '):
+                self.set_page_size(user_input[3:].strip())
+            elif user_input.startswith('seed '):
+                self.set_seed(user_input[5:].strip())
             elif user_input == 'bt':
                 self.show_basic_types()
             elif user_input.startswith('bt '):
@@ -85,8 +136,87 @@ class Browser(object):
                 print('\nUnknown command, available commands:')
                 print_help()
 
+    def complete(self, text, state):
+        """Completer for readline, lemmas are completed after the commands in
+        LEMMA_COMMANDS, where spaces in the input stand for underscores."""
+        if state == 0:
+            line = readline.get_line_buffer()[:readline.get_endidx()]
+            fields = line.split(' ', 1)
+            self.completions = []
+            if len(fields) == 2 and fields[0] in LEMMA_COMMANDS:
+                prefix = fields[1].lstrip().replace(' ', '_').lower()
+                typed = len(prefix) - len(text)
+                self.completions = [lemma[typed:] for lemma
+                                    in self.semcor.lexicon.prefix(prefix, COMPLETIONS)]
+        if state < len(self.completions):
+            return self.completions[state]
+        return None
+
     def get_lemmas(self, lemma):
-        return self.semcor.lemma_idx.get(lemma, [])
+        """Return the WordForms for the lemma, print suggestions for other lemmas
+        if there are none."""
+        lemma = lemma.lower()
+        wfs = self.semcor.lemma_idx.get(lemma, [])
+        if not wfs:
+            suggestions = [l for l in self.semcor.lexicon.suggest(lemma, limit=None)
+                           if l in self.semcor.lemma_idx][:SUGGESTIONS]
+            print("\nNo occurrences of %s" % lemma)
+            if suggestions:
+                print("Did you mean: %s" % ' '.join(suggestions))
+        return wfs
+
+    def show_lemmas(self, pattern):
+        """Print the lemmas that match a glob pattern or that start with the
+        input, with the number of occurrences in the loaded files."""
+        pattern = pattern.lower()
+        if is_pattern(pattern):
+            lemmas = self.semcor.lexicon.glob(pattern)
+        else:
+            lemmas = self.semcor.lexicon.prefix(pattern)
+        lemmas = [lemma for lemma in lemmas if lemma in self.semcor.lemma_idx]
+        print()
+        if not lemmas:
+            print("No lemmas for %s" % pattern)
+        for lemma in lemmas:
+            print("  %4d  %s" % (len(self.semcor.lemma_idx[lemma]), lemma))
+        print()
+
+    def show_query(self, text):
+        """Print the results of a query, or its plan if the query starts with
+        explain."""
+        print()
+        try:
+            if text.split()[0].lower() == 'explain':
+                print(self.semcor.explain(text))
+                print()
+                return
+            wfs = list(self.semcor.query(text))
+        except QueryError as e:
+            print("Error: %s\n" % e)
+            return
+        self.results = []
+        print(BOLD + BLUE, "%d results" % len(wfs), END, '\n', sep='')
+        if wfs:
+            pager = Pager(wfs, self.page_size, self.seed)
+            render = lambda wfs: self.semcor.concordance.lines(wfs, 50)
+            self.results.append((text, pager, render))
+            self.print_page(pager, render)
+        print()
+
+    def show_synsets(self, pattern):
+        """Print the synsets with a description that matches a glob pattern or
+        that starts with the input."""
+        if is_pattern(pattern):
+            positions = self.semcor.lexicon.glob_descriptions(pattern)
+        else:
+            positions = self.semcor.lexicon.prefix_descriptions(pattern)
+        print()
+        if not positions:
+            print("No synsets for %s" % pattern)
+        for position in positions:
+            synset = self.semcor.synsets.synsets[position]
+            print("%s %s %s" % (synset.ssid, synset, synset.btypes))
+        print()
 
     def show_lemma(self, lemma):
         # deprecated, see show senses
@@ -99,29 +229,42 @@ class Browser(object):
         print()
 
     def show_noun(self, lemma):
-        idx = index_lemmas(self.get_lemmas(lemma))
+        self.results = []
+        idx = self.sense_index(lemma, 'NN')
         for pos in idx:
             self.show_senses(idx, pos, 'NN')
         print()
 
     def show_verb(self, lemma):
-        idx = index_lemmas(self.get_lemmas(lemma))
+        self.results = []
+        idx = self.sense_index(lemma, 'VB')
         for pos in idx:
             self.show_senses(idx, pos, 'VB')
         print()
 
     def show_adjective(self, lemma):
-        idx = index_lemmas(self.get_lemmas(lemma))
+        self.results = []
+        idx = self.sense_index(lemma, 'JJ')
         for pos in idx:
             self.show_senses(idx, pos, 'JJ')
         print()
 
     def show_adverb(self, lemma):
-        idx = index_lemmas(self.get_lemmas(lemma))
+        self.results = []
+        idx = self.sense_index(lemma, 'RB')
         for pos in idx:
             self.show_senses(idx, pos, 'RB')
         print()
 
+    def sense_index(self, lemma, tag_prefix):
+        """Return the WordForms of the lemma indexed on part-of-speech and sense,
+        the index is empty if the summaries show that the lemma does not occur
+        with a tag that starts with tag_prefix."""
+        summaries = self.semcor.get_summaries()
+        if lemma.lower() in summaries and not summaries.has_pos(lemma.lower(), tag_prefix):
+            return {}
+        return index_lemmas(self.get_lemmas(lemma))
+
     def show_senses(self, idx, pos, tag_prefix):
         if pos.startswith(tag_prefix):
             for sense in idx[pos]:
@@ -136,50 +279,135 @@ class Browser(object):
                     btypes = synset.btypes if len(synset.btypes) < 12 else ''
                     print(synset, synset.btypes)
                     print('\n', GREEN, synset.gloss, END, '\n', sep='')
-                wfs = idx[pos][sense]
-                random.shuffle(wfs)
-                for wf in wfs[:10]:
-                    context = 50
-                    (left, kw, right) = wf.kwic(context)
-                    sid = wf.sent.fname + '-' + wf.sid
-                    line = kwic_line(left, kw, right, context)
-                    print("%s%-10s%s %s" % (GREY, sid, END, line))
+                pager = Pager(idx[pos][sense], self.page_size, self.seed)
+                render = lambda wfs: self.semcor.concordance.lines(wfs, 50)
+                self.results.append((str(first_wf), pager, render))
+                self.print_page(pager, render)
+
+    def print_page(self, pager, render):
+        for line in render(pager.next_page()):
+            print(line)
+        if pager.has_more():
+            print("%s[%d of %d, type m for more]%s" % (GREY, pager.cursor, len(pager), END))
+
+    def show_more(self):
+        """Print the next page of each section of the results of the last search
+        that has more results."""
+        sections = [section for section in self.results if section[1].has_more()]
+        if not sections:
+            print("\nNo more results\n")
+            return
+        for title, pager, render in sections:
+            print('\n', BOLD + BLUE, title, END, '\n', sep='')
+            self.print_page(pager, render)
+        print()
+
+    def set_page_size(self, size):
+        if not size.isdigit() or int(size) < 1:
+            print("Page size should be a positive integer")
+        else:
+            self.page_size = int(size)
+
+    def set_seed(self, seed):
+        if not seed.isdigit():
+            print("Seed should be a non-negative integer")
+        else:
+            self.seed = int(seed)
 
     def show_stats(self, lemma):
+        """Print the statistics for the lemma from the summaries, the occurrences
+        of the lemma are only used to print suggestions if there are none."""
         print()
-        lemmas = self.get_lemmas(lemma)
-        lemma_idx = index_lemmas(lemmas)
-        print('Occurrences:', len(lemmas), '\n')
-        for pos in lemma_idx:
+        lemma = lemma.lower()
+        summaries = self.semcor.get_summaries()
+        if lemma not in summaries:
+            self.get_lemmas(lemma)
+        print('Occurrences:', summaries.occurrences(lemma), '\n')
+        mfs = summaries.most_frequent_sense(lemma)
+        if mfs is not None:
+            print('Files: %d  Entropy: %.2f  Most frequent: { lexsn=%s }'
+                  % (summaries.spread(lemma), summaries.entropy(lemma), mfs[2]))
+            print('Basic types: %s\n' % ' '.join(summaries.btypes(lemma)))
+        senses = summaries.senses(lemma)
+        for pos, count in summaries.pos_counts(lemma):
             print(pos)
-            for sense in lemma_idx[pos]:
-                lexsn = "{ lexsn=%s }" % sense[1]
-                synset = lemma_idx[pos][sense][0].synset
-                occurrences = len(lemma_idx[pos][sense])
-                print_string = lexsn
-                if synset is not None:
-                    print_string = "%s %s" % (lexsn, synset)
-                print("  %3d  %s" % (occurrences, print_string))
+            for sense_pos, wnsn, lexsn, occurrences, synset, spread in senses:
+                if sense_pos == pos:
+                    print_string = "{ lexsn=%s }" % lexsn
+                    if synset >= 0:
+                        synset = self.semcor.synsets.synsets[synset]
+                        print_string = "%s %s" % (print_string, synset)
+                    print("  %3d  %s" % (occurrences, print_string))
         print()
 
-    def show_paragraph(self, sentence):
+    def find_sentence(self, sentence):
+        """Return the SemcorFile and the Sentence for a sentence identifier like
+        br-a11-28, print a message and return None if they cannot be found."""
         result = re.match(r"(.*)-(\d+)$", sentence)
         if result is None:
             print("Could not get file name and sentence number from input")
-            return
+            return None
         fname = result.group(1)
         sent = result.group(2)
         semcor_file = self.semcor.get_file(fname)
         if semcor_file is None:
             print("Could not find file %s" % fname)
-        else:
-            sentence = semcor_file.get_sentence(sent)
-            if sentence is None:
-                print("Could not find sentence %s" % sent)
+            return None
+        sentence = semcor_file.get_sentence(sent)
+        if sentence is None:
+            print("Could not find sentence %s" % sent)
+            return None
+        return semcor_file, sentence
+
+    def show_paragraph(self, sentence):
+        found = self.find_sentence(sentence)
+        if found is not None:
+            semcor_file, sentence = found
+            self.document_page = (semcor_file, sentence.para.sentences[0].number)
+            self.document_page_size = len(sentence.para.sentences)
             print()
-            paragraph = sentence.para.pp()
+            sentence.para.pp()
             print()
 
+    def show_context(self, user_input):
+        """Print a sentence and a window of sentences around it, the input is a
+        sentence identifier optionally followed by the window size."""
+        fields = user_input.split()
+        if len(fields) > 1 and not fields[1].isdigit():
+            print("Window size should be an integer")
+            return
+        window = int(fields[1]) if len(fields) > 1 else 2
+        found = self.find_sentence(fields[0])
+        if found is not None:
+            semcor_file, sentence = found
+            sentences = semcor_file.get_context(sentence, window)
+            self.document_page = (semcor_file, sentences[0].number)
+            self.document_page_size = 2 * window + 1
+            print()
+            for s in sentences:
+                if s is sentence:
+                    print(BOLD + '>' + END, end=' ')
+                s.pp()
+            print()
+
+    def show_document_page(self, direction):
+        """Print the next page of sentences if direction is 1 and the previous
+        page if direction is -1, relative to the sentences printed last."""
+        if self.document_page is None:
+            print("\nNo sentences printed yet, use the p or c command first\n")
+            return
+        semcor_file, first = self.document_page
+        first = max(0, first + direction * self.document_page_size)
+        sentences = semcor_file.sentences[first:first + self.document_page_size]
+        if not sentences:
+            print("\nEnd of document\n")
+            return
+        self.document_page = (semcor_file, first)
+        print()
+        for s in sentences:
+            s.pp()
+        print()
+
     def show_basic_types(self):
         btypes = self._get_btypes()
         for bt in sorted(btypes):
@@ -209,6 +437,7 @@ class Browser(object):
                    len(self.semcor.noun_idx.btypes_idx[pair]['ALL'])))
 
     def show_basic_type_pair(self, pair):
+        self.results = []
         print()
         print(pair)
         pair = tuple(pair.split('-')[:2])
@@ -217,17 +446,18 @@ class Browser(object):
             print("No results for %s-%s\n" % (pair[0], pair[1]))
             return
         for lemma in wfs_idx['LEMMAS'].keys():
+            # the list is already sorted on basic type
             wfs = wfs_idx['LEMMAS'][lemma]
-            wfs.sort(key=lambda x: x.synset.btypes)
-            for wf in wfs:
-                context = 40
-                (left, kw, right) = wf.kwic(context)
-                sid = wf.sent.fname + '-' + wf.sid
-                bt = wf.synset.btypes
-                line = kwic_line(left, kw, right, context)
-                print("%s%s%s %s%-10s%s %s" % (GREEN, bt, END, GREY, sid, END, line))
+            pager = Pager(wfs, self.page_size)
+            self.results.append(("%s (%s)" % (lemma, '-'.join(pair)), pager, self.btype_lines))
+            self.print_page(pager, self.btype_lines)
             print()
 
+    def btype_lines(self, wfs):
+        lines = self.semcor.concordance.lines(wfs, 40)
+        return ["%s%s%s %s" % (GREEN, wf.synset.btypes, END, line)
+                for wf, line in zip(wfs, lines)]
+
 def index_lemmas(lemmas):
     lemma_idx = {}
     for lemma in lemmas:
@@ -259,7 +489,17 @@ def print_help():
     print('v LEMMA    -  search for verb LEMMA')
     print('a LEMMA    -  search for adjective LEMMA')
     print('r LEMMA    -  search for adverb LEMMA')
+    print('query Q    -  search with query Q, for example pos=NN btype=act within sentence of lemma=say')
+    print('explain Q  -  show the plan and timing for query Q')
+    print('l PATTERN  -  list lemmas that start with PATTERN or match it with * ? [ ]')
+    print('ls PATTERN -  list synsets with a description that starts with or matches PATTERN')
     print('p SID      -  print paragraph with sentence SID')
+    print('c SID [N]  -  print sentence SID with N sentences before and after it')
+    print('>          -  print the next page of sentences from the last document')
+    print('<          -  print the previous page of sentences from the last document')
+    print('m          -  show more results for the last search')
+    print('ps N       -  show N results per page (default is 10)')
+    print('seed N     -  use N as the seed for selecting results randomly')
     print('bt         -  show list of basic types that occur in potentially interesting pairs')
     print('bt NAME    -  show potentially interesting pairs for the basic type')
     print('btp        -  show list of potentially interesting basic type pairs')
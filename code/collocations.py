@@ -0,0 +1,258 @@
+"""collocations.py
+
+Co-occurrence counts and association measures for lemmas, senses and basic
+types.
+
+Two word forms co-occur if they are in the same sentence and at most WINDOW
+elements apart, punctuation included. All co-occurrences are counted in one
+pass over the loaded files: each sentence is encoded once into rows of lemma,
+sense and basic type identifiers from the vocabularies, each co-occurring pair
+is turned into one integer, and the integers are counted all at once and stored
+in a symmetric SparseMatrix for each kind (see matrix.py). Lemmas are counted
+for all word forms with a lemma, senses and basic types for word forms with a
+sense and a synset. The matrices are saved with the compiled files, so they
+are counted once for each window, set of loaded files and synset table.
+Compiling Semcor removes the saved matrices.
+
+Associations for an item are computed from its row in the matrix, with the row
+sums as the marginal counts:
+
+   pmi   pointwise mutual information, log2 of observed over expected count
+   llr   Dunning's log-likelihood ratio
+
+Usage:
+
+>>> sc = Semcor()
+>>> collocations = load_collocations(sc, window=5)
+>>> collocations.top('lemma', 'jury', k=10, measure='llr')
+>>> collocations.top('sense', 'say%2:32:00::')
+>>> collocations.count('lemma', 'grand_jury', 'say')
+
+Usage from the command line:
+
+$ python collocations.py [-n MAXFILES] [-w WINDOW] [-k K] [--kind KIND] [--measure MEASURE] ITEM...
+
+Prints the top K associations for each item, the default is the top 10 lemmas
+by log-likelihood within a window of 5.
+
+"""
+
+from __future__ import print_function
+
+import sys, math, heapq, getopt, hashlib
+from array import array
+from collections import Counter
+
+import compiled
+from matrix import SparseMatrix
+
+
+KINDS = ('lemma', 'sense', 'btype')
+
+MEASURES = ('pmi', 'llr')
+
+WINDOW = 5
+
+
+class Collocations(object):
+
+    """Co-occurrence counts within a window.
+
+    Instance variables:
+
+    window : integer
+
+    matrices : dict (string -> SparseMatrix)
+       A symmetric matrix of co-occurrence counts for each kind, rows and
+       columns are identifiers from the vocabularies.
+
+    totals : dict (string -> array of integers)
+       The row sums of each matrix, the number of co-occurrences of an item
+       with any other item.
+
+    pairs : dict (string -> integer)
+       The total number of co-occurrences for each kind, counted in both
+       directions.
+
+    """
+
+    def __init__(self, semcor, window=WINDOW):
+        self.window = window
+        self.vocab = semcor.vocab
+        sizes = self.sizes()
+        counts = dict((kind, Counter()) for kind in KINDS)
+        for semcor_file in semcor.files:
+            for sentence in semcor_file.get_sentences():
+                for kind, ids in zip(KINDS, self.encode(sentence)):
+                    counts[kind].update(pair_keys(ids, window, sizes[kind]))
+        self.matrices = {}
+        self.totals = {}
+        self.pairs = {}
+        for kind in KINDS:
+            shape = (sizes[kind], sizes[kind])
+            matrix = SparseMatrix.from_flat_counts(counts[kind], shape)
+            self.matrices[kind] = matrix
+            self.totals[kind] = matrix.row_sums()
+            self.pairs[kind] = sum(self.totals[kind])
+
+    def __getstate__(self):
+        # the vocabularies are loaded with Semcor and are not saved here
+        state = self.__dict__.copy()
+        state['vocab'] = None
+        return state
+
+    def __str__(self):
+        sizes = ' '.join("%s=%d" % (kind, self.matrices[kind].nnz()) for kind in KINDS)
+        return "<Collocations window=%d %s>" % (self.window, sizes)
+
+    def sizes(self):
+        return {'lemma': len(self.vocab.lemmas), 'sense': len(self.vocab.senses),
+                'btype': len(self.vocab.btypes)}
+
+    def vocabulary(self, kind):
+        return {'lemma': self.vocab.lemmas, 'sense': self.vocab.senses,
+                'btype': self.vocab.btypes}[kind]
+
+    def encode(self, sentence):
+        """Return arrays with the lemma, sense and basic type identifiers of the
+        elements of the sentence, with -1 for missing values. This does what
+        Vocabularies.encode_form() does, but only for the three identifiers
+        needed here."""
+        lemma_ids = self.vocab.lemmas.ids
+        sense_ids = self.vocab.senses.ids
+        btype_ids = self.vocab.btypes.ids
+        lemmas, senses, btypes = array('i'), array('i'), array('i')
+        for element in sentence.elements:
+            if element.is_word_form():
+                lemmas.append(lemma_ids.get(element.lemma, -1))
+                synset = element.synset
+                if synset is not None and element.has_sense():
+                    senses.append(sense_ids.get(element.sense(), -1))
+                    btypes.append(btype_ids.get(synset.btypes, -1))
+                    continue
+            else:
+                lemmas.append(-1)
+            senses.append(-1)
+            btypes.append(-1)
+        return lemmas, senses, btypes
+
+    def identifier(self, kind, item):
+        """Return the identifier of an item of the kind, or None if the item is
+        unknown or was added to the vocabulary after the counts were made."""
+        identifier = self.vocabulary(kind).get(item)
+        if identifier is None or identifier >= self.matrices[kind].shape[0]:
+            return None
+        return identifier
+
+    def count(self, kind, item1, item2):
+        """Return how often two items of the kind co-occur."""
+        id1, id2 = self.identifier(kind, item1), self.identifier(kind, item2)
+        if id1 is None or id2 is None:
+            return 0
+        return self.matrices[kind].get(id1, id2)
+
+    def top(self, kind, item, k=10, measure='llr', min_count=2):
+        """Return the k items of the same kind with the strongest association
+        with item as a list of (item, count, score) triples, ordered on score.
+        Items that co-occur less than min_count times are skipped."""
+        if kind not in KINDS:
+            raise ValueError("kind should be one of %s" % (KINDS,))
+        if measure not in MEASURES:
+            raise ValueError("measure should be one of %s" % (MEASURES,))
+        identifier = self.identifier(kind, item)
+        if identifier is None:
+            return []
+        score = pmi if measure == 'pmi' else log_likelihood
+        totals = self.totals[kind]
+        total = totals[identifier]
+        pairs = self.pairs[kind]
+        scores = ((score(count, total, totals[other], pairs), count, other)
+                  for other, count in self.matrices[kind].row(identifier)
+                  if count >= min_count and other != identifier)
+        strings = self.vocabulary(kind)
+        return [(strings.string(other), count, value)
+                for value, count, other in heapq.nlargest(k, scores)]
+
+
+def pair_keys(ids, window, size):
+    """Return a list with an integer row * size + column for each pair of
+    positions in ids that are at most window apart and that both have an
+    identifier, in both directions."""
+    positions = [i for i, identifier in enumerate(ids) if identifier >= 0]
+    keys = []
+    for n, i in enumerate(positions):
+        row = ids[i] * size
+        for m in range(n + 1, len(positions)):
+            j = positions[m]
+            if j - i > window:
+                break
+            keys.append(row + ids[j])
+            keys.append(ids[j] * size + ids[i])
+    return keys
+
+
+def pmi(count, total1, total2, pairs):
+    return math.log(float(count) * pairs / (float(total1) * total2), 2)
+
+
+def log_likelihood(count, total1, total2, pairs):
+    """Dunning's log-likelihood ratio for the 2x2 table of co-occurrences of two
+    items. The score is negative if the items co-occur less than expected."""
+    k11 = count
+    k12 = total1 - count
+    k21 = total2 - count
+    k22 = pairs - total1 - total2 + count
+    rows = (k11 + k12, k21 + k22)
+    cols = (k11 + k21, k12 + k22)
+    score = 0.0
+    for k, row, col in ((k11, rows[0], cols[0]), (k12, rows[0], cols[1]),
+                        (k21, rows[1], cols[0]), (k22, rows[1], cols[1])):
+        if k > 0:
+            score += k * math.log(float(k) * pairs / (float(row) * col))
+    score *= 2
+    return score if count * pairs >= total1 * total2 else -score
+
+
+def cache_file(semcor, window):
+    # basic types and senses depend on the synsets the files were bound to
+    lines = [f.fname for f in semcor.files] + [semcor.synsets.fingerprint]
+    digest = hashlib.md5('\n'.join(lines).encode('utf8')).hexdigest()[:12]
+    return compiled.file_name("collocations-%d-%s" % (window, digest))
+
+
+def load_collocations(semcor, window=WINDOW):
+    """Return the Collocations for the loaded files of the Semcor instance, from
+    the compiled files if they were saved before."""
+    path = cache_file(semcor, window)
+    try:
+        collocations = compiled.read(path, 'collocations')
+        collocations.vocab = semcor.vocab
+        return collocations
+    except (IOError, compiled.CompiledFormatError):
+        pass
+    collocations = Collocations(semcor, window)
+    compiled.write(path, collocations, 'collocations')
+    return collocations
+
+
+if __name__ == '__main__':
+
+    options, args = getopt.gnu_getopt(sys.argv[1:], 'n:w:k:', ['kind=', 'measure='])
+    options = { name: value for (name, value) in options }
+    maxfiles = int(options.get('-n', 999))
+    window = int(options.get('-w', WINDOW))
+    k = int(options.get('-k', 10))
+    kind = options.get('--kind', 'lemma')
+    measure = options.get('--measure', 'llr')
+
+    if not args:
+        print(__doc__)
+    else:
+        from semcor import Semcor
+        semcor = Semcor(maxfiles)
+        collocations = load_collocations(semcor, window)
+        for item in args:
+            print("\n%s (%s, window %d)\n" % (item, measure, window))
+            for other, count, score in collocations.top(kind, item, k, measure):
+                print("  %8.2f  %5d  %s" % (score, count, other))
+        print()
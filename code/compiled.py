@@ -0,0 +1,241 @@
+"""compiled.py
+
+Reading and writing compiled Semcor artifacts.
+
+All compiled artifacts live in one directory that is shared by all Python
+interpreters. Each artifact starts with a magic line followed by a header and
+the pickled content. The header records the version of the compiled format, the
+kind of artifact and the pickle protocol used, which is checked when the
+artifact is loaded.
+
+Artifacts are pickled with protocol 4 if the interpreter supports it, which is
+the case for all versions of Python 3 that this code runs on, so any Python 3
+interpreter can read artifacts written by any other. Python 2.7 writes protocol
+2, which all interpreters can read.
+
+The content of an artifact can be compressed with zlib or lzma, the compression
+used is recorded in the header. The default compression for each kind of
+artifact is in COMPRESSION, see benchmark.py for how the defaults were chosen.
+
+Compiled files from earlier versions of this code were kept in a separate
+directory for each major Python version, these can be converted to the current
+format without recompiling the Semcor sources:
+
+$ python compiled.py --migrate
+
+"""
+
+from __future__ import print_function
+
+import io, os, sys, glob, pickle, zlib
+
+try:
+    import lzma
+except ImportError:
+    # not available on Python 2
+    lzma = None
+
+
+COMPILED = os.path.join('..', 'data', 'compiled')
+
+# Compiled files from before the versioned format, there was one directory for
+# each major Python version.
+LEGACY_DIRS = [os.path.join(COMPILED, '3'), os.path.join(COMPILED, '2')]
+
+# Version of the compiled format, this should be incremented whenever a change
+# to the code invalidates compiled artifacts.
+FORMAT_VERSION = 2
+
+PROTOCOL = min(4, pickle.HIGHEST_PROTOCOL)
+
+MAGIC = b'SEMCOR-COMPILED\n'
+
+# Compression for each kind of artifact, kinds not listed are not compressed.
+COMPRESSION = {'file': 'zlib'}
+
+# Compression levels used when writing artifacts.
+LEVELS = {'zlib': 6, 'lzma': 6}
+
+# Number of threads used for reading files in read_many().
+THREADS = 4
+
+
+class CompiledFormatError(Exception):
+
+    """Raised when a compiled artifact cannot be read by this code."""
+
+
+def file_name(name, extension='.pickle'):
+    """Return the path of the compiled artifact for name, which can be a path to
+    a Semcor source file in which case just the base name is used."""
+    return os.path.join(COMPILED, os.path.basename(name) + extension)
+
+
+def write(path, content, kind, compression='default', level=None):
+    """Write content to path as an artifact of the given kind. The compression
+    can be None, 'zlib' or 'lzma', by default the compression for the kind of
+    artifact in COMPRESSION is used. If no level is given the compression level
+    from LEVELS is used."""
+    if compression == 'default':
+        compression = COMPRESSION.get(kind)
+    header = {'format': FORMAT_VERSION, 'kind': kind, 'protocol': PROTOCOL,
+              'compression': compression}
+    with open(path, 'wb') as fh:
+        fh.write(MAGIC)
+        pickle.dump(header, fh, 2)
+        if compression is None:
+            pickle.dump(content, fh, PROTOCOL)
+        else:
+            data = pickle.dumps(content, PROTOCOL)
+            fh.write(compress(data, compression, level))
+
+
+def read(path, kind):
+    """Read the artifact in path and return its content. Raises an IOError if
+    the artifact does not exist and a CompiledFormatError if it cannot be used
+    by this code."""
+    with open(path, 'rb') as fh:
+        return load(fh, path, kind)
+
+
+def loads(data, path, kind):
+    """Return the content of an artifact from the bytes in data, which were read
+    from path."""
+    return load(io.BytesIO(data), path, kind)
+
+
+def load(fh, path, kind):
+    header = read_header(fh, path)
+    if header.get('kind') != kind:
+        raise CompiledFormatError("%s is a compiled %s, expected a compiled %s"
+                                  % (path, header.get('kind'), kind))
+    compression = header.get('compression')
+    if compression is None:
+        return pickle.load(fh)
+    return pickle.loads(decompress(fh.read(), compression))
+
+
+def read_bytes(path):
+    with open(path, 'rb') as fh:
+        return fh.read()
+
+
+def read_many(paths, kind, threads=THREADS):
+    """Yield the content of the artifacts in paths, in the order of paths. Files
+    are read by a pool of threads while the content of files that were already
+    read is unpickled in the calling thread, so reading and unpickling overlap.
+    With one thread the files are read and unpickled one after the other."""
+    if threads < 2:
+        for path in paths:
+            yield read(path, kind)
+        return
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(threads)
+    try:
+        for path, data in zip(paths, pool.imap(read_bytes, paths)):
+            yield loads(data, path, kind)
+    finally:
+        pool.terminate()
+
+
+def read_header(fh, path):
+    """Read and validate the header of the artifact open in fh."""
+    if fh.read(len(MAGIC)) != MAGIC:
+        raise CompiledFormatError("%s is not a compiled Semcor artifact, "
+                                  "it may be from an older version (%s)"
+                                  % (path, recompile_message()))
+    header = pickle.load(fh)
+    if header.get('format') != FORMAT_VERSION:
+        raise CompiledFormatError("%s has format version %s, expected version %s (%s)"
+                                  % (path, header.get('format'), FORMAT_VERSION,
+                                     recompile_message()))
+    if header.get('protocol', 0) > pickle.HIGHEST_PROTOCOL:
+        raise CompiledFormatError("%s uses pickle protocol %d which this Python "
+                                  "does not support (%s)"
+                                  % (path, header['protocol'], recompile_message()))
+    if header.get('compression') == 'lzma' and lzma is None:
+        raise CompiledFormatError("%s uses lzma compression which this Python "
+                                  "does not support (%s)" % (path, recompile_message()))
+    return header
+
+
+def compress(data, compression, level=None):
+    if level is None:
+        level = LEVELS[compression]
+    if compression == 'zlib':
+        return zlib.compress(data, level)
+    if compression == 'lzma':
+        if lzma is None:
+            raise CompiledFormatError("lzma compression is not available")
+        return lzma.compress(data, preset=level)
+    raise CompiledFormatError("unknown compression %s" % compression)
+
+
+def decompress(data, compression):
+    if compression == 'zlib':
+        return zlib.decompress(data)
+    if compression == 'lzma':
+        return lzma.decompress(data)
+    raise CompiledFormatError("unknown compression %s" % compression)
+
+
+def recompile_message():
+    return "recompile with 'python semcor.py --compile'"
+
+
+class LegacyUnpickler(pickle.Unpickler):
+
+    """Unpickler for compiled files from before the versioned format. Those were
+    often written by running semcor.py as a script so their classes were
+    recorded as belonging to the __main__ module."""
+
+    def find_class(self, module, name):
+        if module == '__main__':
+            module = 'semcor'
+        return pickle.Unpickler.find_class(self, module, name)
+
+
+def migrate():
+    """Convert the compiled files from the legacy directories into the current
+    format. When there are compiled files for the same source in more than one
+    legacy directory the first one found in LEGACY_DIRS is used."""
+    # importing here to avoid circular imports, semcor imports this module
+    import semcor
+    synsets = semcor.SynsetTable()
+    synsets.pickle()
+    done = set()
+    for legacy_dir in LEGACY_DIRS:
+        for legacy_file in sorted(glob.glob(os.path.join(legacy_dir, '*.pickle'))):
+            basename = os.path.basename(legacy_file)
+            if basename in done:
+                continue
+            with open(legacy_file, 'rb') as fh:
+                try:
+                    semcor_file = LegacyUnpickler(fh).load()
+                except Exception as e:
+                    print('Skipping %s (%s)' % (legacy_file, e))
+                    continue
+            if not getattr(semcor_file, 'sentences', None):
+                # files compiled before sentences were stored in document order
+                semcor_file.compile_sentences()
+            # files compiled before synsets were bound when compiling have a
+            # synset instead of a synset_id on their WordForms
+            semcor_file.synsets_fingerprint = None
+            for sentence in semcor_file.sentences:
+                for element in sentence.elements:
+                    if element.is_word_form():
+                        element.__dict__.pop('synset', None)
+                        element.synset_id = None
+            semcor_file.bind_synsets(synsets)
+            print('Migrating', legacy_file)
+            write(os.path.join(COMPILED, basename), semcor_file, 'file')
+            done.add(basename)
+    print('Migrated %d files' % len(done))
+
+
+if __name__ == '__main__':
+
+    if sys.argv[1:] == ['--migrate']:
+        migrate()
+    else:
+        print("Usage: python compiled.py --migrate")
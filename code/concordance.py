@@ -0,0 +1,107 @@
+"""concordance.py
+
+Creating KWIC (keyword in context) lines for WordForms.
+
+Sentences store their string and the character offsets of all their elements,
+these are created when Semcor is compiled (see SemcorFile.compile_offsets), so
+contexts that stay within a sentence are created by slicing the sentence
+string. For contexts that are allowed to cross sentence boundaries all
+sentences of a document are laid out in one string, this is done once per
+document, after which contexts are again created by slicing.
+
+Usage:
+
+>>> sc = Semcor()
+>>> wfs = sc.lemma_idx['walk']
+>>> sc.concordance.kwic(wfs[0], 50, cross_sentence=True)
+>>> for line in sc.concordance.lines(wfs, 50):
+...     print(line)
+
+"""
+
+import threading
+from array import array
+
+from ansi import GREY, END
+from utils import kwic_line
+
+
+class DocumentText(object):
+
+    """The text of a SemcorFile as one string.
+
+    Instance variables:
+
+    text : string
+       All sentences of the document separated by spaces.
+
+    starts : array of integers
+       The offset in text of each sentence, indexed on sentence number.
+
+    """
+
+    def __init__(self, semcor_file):
+        sentences = semcor_file.get_sentences()
+        self.text = ' '.join([s.string for s in sentences])
+        self.starts = array('i')
+        offset = 0
+        for s in sentences:
+            self.starts.append(offset)
+            offset += len(s.string) + 1
+
+    def kwic(self, wf, context):
+        """Return the left context, keyword and right context for the WordForm,
+        where contexts may include text from neighbouring sentences."""
+        start = self.starts[wf.sent.number] + wf.sent.offsets[wf.position]
+        end = start + len(wf.text)
+        left = self.text[max(0, start - 1 - context):max(0, start - 1)]
+        right = self.text[end + 1:end + 1 + context]
+        return (left, self.text[start:end], right)
+
+
+class Concordance(object):
+
+    """Creates KWIC lines for WordForms of a Semcor instance. Document texts are
+    created when first needed and then cached in the documents variable, which
+    is a dictionary indexed on file base names. Creating a document text is
+    guarded by a lock so the concordance can be used from several threads."""
+
+    def __init__(self, semcor):
+        self.semcor = semcor
+        self.documents = {}
+        self.lock = threading.Lock()
+
+    def document(self, fname):
+        """Return the DocumentText for the file base name."""
+        doc = self.documents.get(fname)
+        if doc is None:
+            with self.lock:
+                doc = self.documents.get(fname)
+                if doc is None:
+                    doc = DocumentText(self.semcor.get_file(fname))
+                    self.documents[fname] = doc
+        return doc
+
+    def kwic(self, wf, context=50, cross_sentence=False):
+        """Return a triple with left context, keyword and right context. If
+        cross_sentence is False then the contexts will not extend beyond the
+        sentence of the WordForm."""
+        if cross_sentence:
+            return self.document(wf.sent.fname).kwic(wf, context)
+        return wf.sent.kwic(wf.position, context)
+
+    def kwics(self, wfs, context=50, cross_sentence=False):
+        """Return the list of KWIC triples for a list of WordForms."""
+        if not cross_sentence:
+            return [wf.sent.kwic(wf.position, context) for wf in wfs]
+        return [self.document(wf.sent.fname).kwic(wf, context) for wf in wfs]
+
+    def lines(self, wfs, context=50, cross_sentence=False, sids=True):
+        """Return a list of printable KWIC lines for a list of WordForms, each
+        line is prefixed with the sentence identifier if sids is True."""
+        triples = self.kwics(wfs, context, cross_sentence)
+        lines = [kwic_line(left, kw, right, context) for left, kw, right in triples]
+        if sids:
+            lines = ["%s%-10s%s %s" % (GREY, wf.sent.fname + '-' + wf.sid, END, line)
+                     for wf, line in zip(wfs, lines)]
+        return lines
@@ -0,0 +1,409 @@
+"""database.py
+
+Semcor in an SQLite database.
+
+The compiled files can be written to a database with all paragraphs, sentences
+and tokens, together with the synsets and their basic types and the mappings
+from Semcor senses to synsets:
+
+$ python semcor.py --compile-sqlite (-n MAXFILES)
+
+This requires that the files were compiled first. The database is written to
+data/compiled/semcor.sqlite and has the following tables:
+
+   files       id, fname, basename, subcorpus
+   paragraphs  id, file, pid
+   sentences   id, file, paragraph, sid, number, string
+   tokens      id, file, sentence, position, kind, text, pos, lemma, wnsn,
+               lexsn, rdf, pn, synset, keys
+   synsets     id, ssid, cat, btypes, description, gloss
+   btypes      synset, btype
+   senses      lemma, sense, synset
+
+Tokens are all word forms and punctuations, kind is 'wf' or 'punc', and the
+synset of a token and the id of a synset are positions in the SynsetTable (see
+semcor.py). Tokens are numbered in corpus order.
+
+The database can be queried with any SQLite client, and SemcorDatabase answers
+some of the same queries as a Semcor instance without loading the corpus, which
+takes a few milliseconds instead of a few seconds:
+
+>>> db = SemcorDatabase()
+>>> db.lemma_idx['walk']
+>>> db.get_sentence('br-a01', '12')
+>>> db.get_synset_for_lemma('walk', '2:38:00::')
+>>> db.get_btype_pairs(min_lemmas=2)
+>>> db.get_btype_pair(('act', 'evt'))
+
+The Paragraphs, Sentences and WordForms returned are created from the database
+for each query and are not shared between queries.
+
+"""
+
+from __future__ import print_function
+
+import os, sqlite3
+
+import compiled
+from utils import Synset
+from objects import Paragraph, Sentence, WordForm, Punctuation
+
+
+DATABASE = compiled.file_name('semcor', '.sqlite')
+
+SCHEMA = """
+CREATE TABLE files (
+    id INTEGER PRIMARY KEY, fname TEXT, basename TEXT, subcorpus TEXT);
+CREATE TABLE paragraphs (
+    id INTEGER PRIMARY KEY, file INTEGER, pid TEXT);
+CREATE TABLE sentences (
+    id INTEGER PRIMARY KEY, file INTEGER, paragraph INTEGER, sid TEXT,
+    number INTEGER, string TEXT);
+CREATE TABLE tokens (
+    id INTEGER PRIMARY KEY, file INTEGER, sentence INTEGER, position INTEGER,
+    kind TEXT, text TEXT, pos TEXT, lemma TEXT, wnsn TEXT, lexsn TEXT, rdf TEXT,
+    pn TEXT, synset INTEGER, keys TEXT);
+CREATE TABLE synsets (
+    id INTEGER PRIMARY KEY, ssid TEXT, cat TEXT, btypes TEXT, description TEXT,
+    gloss TEXT);
+CREATE TABLE btypes (
+    synset INTEGER, btype TEXT);
+CREATE TABLE senses (
+    lemma TEXT, sense TEXT, synset INTEGER);
+"""
+
+# indexes are created after all rows are inserted, which is faster
+INDEXES = """
+CREATE UNIQUE INDEX files_basename ON files (basename);
+CREATE INDEX sentences_file_sid ON sentences (file, sid);
+CREATE INDEX tokens_sentence ON tokens (sentence);
+CREATE INDEX tokens_lemma ON tokens (lemma);
+CREATE INDEX tokens_synset ON tokens (synset);
+CREATE INDEX btypes_btype ON btypes (btype);
+CREATE INDEX senses_lemma ON senses (lemma);
+"""
+
+TOKEN_COLUMNS = ('id, file, sentence, position, kind, text, pos, lemma, wnsn, '
+                 'lexsn, rdf, pn, synset, keys')
+
+# Common nouns with a sense and a synset, grouped on lemma and file, where the
+# group has at least two different basic types, and all pairs of basic types in
+# those groups, leaving out basic types with spaces. This is what noun_idx on
+# Semcor has in its btypes_idx.
+BTYPE_PAIRS = """
+WITH nouns AS (
+    SELECT t.id, t.lemma, t.file, s.btypes FROM tokens t JOIN synsets s ON s.id = t.synset
+    WHERE t.pos IN ('NN', 'NNS') AND t.wnsn IS NOT NULL AND t.lexsn IS NOT NULL),
+groups AS (
+    SELECT lemma, file FROM nouns GROUP BY lemma, file HAVING COUNT(DISTINCT btypes) > 1),
+group_btypes AS (
+    SELECT DISTINCT n.lemma, n.file, n.btypes FROM nouns n JOIN groups g
+    ON n.lemma = g.lemma AND n.file = g.file WHERE instr(n.btypes, ' ') = 0),
+pairs AS (
+    SELECT a.btypes AS b1, b.btypes AS b2, a.lemma, a.file FROM group_btypes a
+    JOIN group_btypes b ON a.lemma = b.lemma AND a.file = b.file AND a.btypes < b.btypes)
+"""
+
+
+def compile_database(maxfiles=999, path=DATABASE):
+    """Write the compiled files and the compiled synsets to the database in path,
+    replacing the database if it exists."""
+    # imported here to avoid a circular import
+    from semcor import semcor_files, load_synset_table
+    if os.path.exists(path):
+        os.remove(path)
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+    synsets = load_synset_table()
+    connection.executemany(
+        "INSERT INTO synsets VALUES (?, ?, ?, ?, ?, ?)",
+        [(n, s.ssid, s.cat, s.btypes, s.description, s.gloss)
+         for n, s in enumerate(synsets.synsets)])
+    connection.executemany(
+        "INSERT INTO btypes VALUES (?, ?)",
+        [(n, btype) for n, s in enumerate(synsets.synsets) for btype in s.btypes.split()])
+    connection.executemany(
+        "INSERT INTO senses VALUES (?, ?, ?)",
+        [(lemma, sense, synsets.get_id(lemma, sense.split('%', 1)[1]))
+         for lemma in synsets.synset_idx for sense in synsets.synset_idx[lemma]])
+    paragraph_id = sentence_id = token_id = 0
+    for file_id, fname in enumerate(semcor_files()[:maxfiles]):
+        print('Adding', fname)
+        semcor_file = compiled.read(compiled.file_name(fname), 'file')
+        semcor_file.bind_synsets(synsets)
+        connection.execute("INSERT INTO files VALUES (?, ?, ?, ?)",
+                           (file_id, fname, os.path.basename(fname), fname.split(os.sep)[-3]))
+        paragraphs, sentences, tokens = [], [], []
+        for para in semcor_file.paragraphs:
+            paragraphs.append((paragraph_id, file_id, para.pid))
+            for sentence in para.sentences:
+                sentences.append((sentence_id, file_id, paragraph_id, sentence.sid,
+                                  sentence.number, sentence.as_string()))
+                for position, element in enumerate(sentence.elements):
+                    if element.is_word_form():
+                        tokens.append(
+                            (token_id, file_id, sentence_id, position, 'wf', element.text,
+                             element.pos, element.lemma, element.wnsn, element.lexsn,
+                             element.rdf, element.pn, element.synset_id, ' '.join(element.keys)))
+                    else:
+                        tokens.append(
+                            (token_id, file_id, sentence_id, position, 'punc', element.text,
+                             None, None, None, None, None, None, None, ''))
+                    token_id += 1
+                sentence_id += 1
+            paragraph_id += 1
+        connection.executemany("INSERT INTO paragraphs VALUES (?, ?, ?)", paragraphs)
+        connection.executemany("INSERT INTO sentences VALUES (?, ?, ?, ?, ?, ?)", sentences)
+        connection.executemany(
+            "INSERT INTO tokens VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", tokens)
+    print('Creating indexes')
+    connection.executescript(INDEXES)
+    connection.commit()
+    connection.close()
+
+
+class SynsetList(object):
+
+    """Read-only list of the synsets in the database, indexed on synset id. Used
+    as the synset table of the WordForms of a SemcorDatabase, synsets are read
+    when they are first needed."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.synsets = {}
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM synsets").fetchone()[0]
+
+    def __getitem__(self, synset_id):
+        synset = self.synsets.get(synset_id)
+        if synset is None:
+            row = self.connection.execute(
+                "SELECT ssid, cat, btypes, description, gloss FROM synsets WHERE id = ?",
+                (synset_id,)).fetchone()
+            if row is None:
+                raise IndexError(synset_id)
+            synset = self.synsets[synset_id] = make_synset(row)
+        return synset
+
+
+class LemmaIndex(object):
+
+    """Dictionary-like view on the lemmas of all tokens with a sense, with the
+    same keys and values as lemma_idx on Semcor."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __contains__(self, lemma):
+        return self.db.connection.execute(
+            "SELECT 1 FROM tokens WHERE lemma = ? AND wnsn IS NOT NULL "
+            "AND lexsn IS NOT NULL LIMIT 1", (lemma,)).fetchone() is not None
+
+    def __getitem__(self, lemma):
+        wfs = self.get(lemma)
+        if wfs is None:
+            raise KeyError(lemma)
+        return wfs
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def keys(self):
+        return [row[0] for row in self.db.connection.execute(
+            "SELECT DISTINCT lemma FROM tokens WHERE wnsn IS NOT NULL AND lexsn IS NOT NULL")]
+
+    def get(self, lemma, default=None):
+        ids = [row[0] for row in self.db.connection.execute(
+            "SELECT id FROM tokens WHERE lemma = ? AND wnsn IS NOT NULL "
+            "AND lexsn IS NOT NULL ORDER BY id", (lemma,))]
+        return self.db.get_word_forms(ids) if ids else default
+
+
+class SemcorDatabase(object):
+
+    """Answers queries on Semcor from the database created by compile_database().
+
+    Instance variables:
+
+    connection : sqlite3.Connection
+
+    lemma_idx : LemmaIndex
+       Works like the lemma_idx dictionary on Semcor.
+
+    synset_table : SynsetList
+       The synset table of the WordForms created from the database.
+
+    loaded : integer
+       The number of files in the database.
+
+    """
+
+    def __init__(self, path=DATABASE):
+        if not os.path.exists(path):
+            raise IOError("no database at %s, see database.py for how to create it" % path)
+        self.connection = sqlite3.connect(path)
+        self.lemma_idx = LemmaIndex(self)
+        self.loaded = self.connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        self.synset_table = SynsetList(self.connection)
+
+    def __str__(self):
+        return "<SemcorDatabase with %d files>" % self.loaded
+
+    def get_file(self, fname):
+        """Return a SemcorFile with all paragraphs, sentences and tokens of the file
+        with base name fname, or None if there is no such file."""
+        # imported here to avoid a circular import
+        from semcor import SemcorFile
+        row = self.connection.execute(
+            "SELECT id, fname FROM files WHERE basename = ?", (fname,)).fetchone()
+        if row is None:
+            return None
+        file_id, path = row
+        semcor_file = SemcorFile(path)
+        ids = [row[0] for row in self.connection.execute(
+            "SELECT id FROM sentences WHERE file = ? ORDER BY id", (file_id,))]
+        sentences = self._get_sentences(ids)
+        for sentence_id in ids:
+            sentence = sentences[sentence_id]
+            if not semcor_file.paragraphs or semcor_file.paragraphs[-1] is not sentence.para:
+                semcor_file.add_paragraph(sentence.para)
+        semcor_file.collect_forms()
+        semcor_file.index()
+        semcor_file.compile_sentences()
+        return semcor_file
+
+    def get_sentence(self, fname, sid):
+        """Return the sentence with identifier sid from the file with base name
+        fname, return None if there is no such sentence."""
+        row = self.connection.execute(
+            "SELECT s.id FROM sentences s JOIN files f ON s.file = f.id "
+            "WHERE f.basename = ? AND s.sid = ? ORDER BY s.id LIMIT 1", (fname, sid)).fetchone()
+        return None if row is None else self._get_sentences([row[0]])[row[0]]
+
+    def get_word_forms(self, ids):
+        """Return the WordForms for a list of token ids, each WordForm is in its
+        sentence and paragraph."""
+        rows = self._select_in("SELECT id, sentence, position FROM tokens WHERE id IN (%s)", ids)
+        positions = dict((row[0], (row[1], row[2])) for row in rows)
+        sentences = self._get_sentences(set(sentence for sentence, _ in positions.values()))
+        result = []
+        for token_id in ids:
+            sentence, position = positions[token_id]
+            result.append(sentences[sentence].elements[position])
+        return result
+
+    def get_synset_for_lemma(self, lemma, sense):
+        """Get the synset associated with the lemma and the sense, for example
+        'walk' and '2:38:00::'. Returns None if no such synset was found."""
+        row = self.connection.execute(
+            "SELECT s.ssid, s.cat, s.btypes, s.description, s.gloss "
+            "FROM senses m JOIN synsets s ON m.synset = s.id "
+            "WHERE m.lemma = ? AND m.sense = ?", (lemma, lemma + '%' + sense)).fetchone()
+        return None if row is None else make_synset(row)
+
+    def get_btype_pairs(self, min_lemmas=1, min_instances=1):
+        """Return a list of (btype_pair, lemmas, instances) triples for the pairs of
+        basic types of common nouns that co-occur with the same lemma in a
+        document, these are the pairs in the btypes_idx of noun_idx on Semcor."""
+        query = BTYPE_PAIRS + """
+            SELECT p.b1, p.b2, COUNT(DISTINCT p.lemma), COUNT(n.id) FROM pairs p
+            JOIN nouns n ON n.lemma = p.lemma AND n.file = p.file AND n.btypes IN (p.b1, p.b2)
+            GROUP BY p.b1, p.b2 ORDER BY p.b1, p.b2"""
+        return [((b1, b2), lemmas, instances)
+                for b1, b2, lemmas, instances in self.connection.execute(query)
+                if lemmas >= min_lemmas and instances >= min_instances]
+
+    def get_btype_pair(self, btype_pair):
+        """Return the WordForms for a pair of basic types in the same dictionary
+        as noun_idx.btypes_idx[btype_pair] on Semcor, which has all WordForms in
+        'ALL' and the WordForms for each lemma in 'LEMMAS'."""
+        query = BTYPE_PAIRS + """
+            SELECT n.id, n.lemma FROM pairs p
+            JOIN nouns n ON n.lemma = p.lemma AND n.file = p.file AND n.btypes IN (p.b1, p.b2)
+            WHERE p.b1 = ? AND p.b2 = ? ORDER BY n.id"""
+        rows = self.connection.execute(query, tuple(sorted(btype_pair))).fetchall()
+        wfs = self.get_word_forms([row[0] for row in rows])
+        result = {'ALL': wfs, 'LEMMAS': {}}
+        for (token_id, lemma), wf in zip(rows, wfs):
+            result['LEMMAS'].setdefault(lemma, []).append(wf)
+        return result
+
+    def _select_in(self, query, ids):
+        """Run a query with an IN clause over ids, in chunks so that the number of
+        parameters stays below the SQLite limit."""
+        ids = list(ids)
+        rows = []
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            rows.extend(self.connection.execute(
+                query % ', '.join('?' * len(chunk)), chunk).fetchall())
+        return rows
+
+    def _get_sentences(self, ids):
+        """Return a dictionary from sentence ids to Sentences with all their
+        elements, Sentences from the same paragraph share the Paragraph."""
+        sentences = {}
+        paragraphs = {}
+        rows = self._select_in(
+            "SELECT s.id, s.paragraph, s.sid, s.number, p.pid, f.fname FROM sentences s "
+            "JOIN paragraphs p ON s.paragraph = p.id JOIN files f ON s.file = f.id "
+            "WHERE s.id IN (%s) ORDER BY s.id", ids)
+        for sentence_id, paragraph_id, sid, number, pid, fname in rows:
+            para = paragraphs.get(paragraph_id)
+            if para is None:
+                para = paragraphs[paragraph_id] = Paragraph(pid)
+            sentence = Sentence.__new__(Sentence)
+            sentence.fname = os.path.basename(fname)
+            sentence.para = para
+            sentence.pid = pid
+            sentence.sid = sid
+            sentence.elements = []
+            sentence.number = number
+            para.add_sentence(sentence)
+            sentences[sentence_id] = sentence
+        rows = self._select_in(
+            "SELECT " + TOKEN_COLUMNS + " FROM tokens WHERE sentence IN (%s) ORDER BY id", ids)
+        for row in rows:
+            sentence = sentences[row[2]]
+            sentence.add_element(make_element(sentence, row, self.synset_table))
+        for sentence in sentences.values():
+            sentence.compile_offsets(sentence.number)
+        return sentences
+
+
+def make_synset(row):
+    """Create a Synset from the ssid, cat, btypes, description and gloss."""
+    return Synset([''] + list(row))
+
+
+def make_element(sentence, row, synset_table):
+    """Create a WordForm or a Punctuation from a row of the tokens table, word
+    forms look up their synsets in synset_table."""
+    (token_id, file_id, sentence_id, position, kind, text,
+     pos, lemma, wnsn, lexsn, rdf, pn, synset, keys) = row
+    if kind == 'punc':
+        element = Punctuation.__new__(Punctuation)
+        element.text = text
+        element.keys = tuple()
+        return element
+    wf = WordForm.__new__(WordForm)
+    wf.para = sentence.para
+    wf.sent = sentence
+    wf.position = position
+    wf.pid = sentence.pid
+    wf.sid = sentence.sid
+    wf.pos = pos
+    wf.rdf = rdf
+    wf.pn = pn
+    wf.lemma = lemma
+    wf.wnsn = wnsn
+    wf.lexsn = lexsn
+    wf.text = text
+    wf.synset_id = synset
+    wf.synset_table = synset_table
+    wf.keys = tuple(keys.split())
+    return wf
@@ -0,0 +1,295 @@
+"""evaluate.py
+
+Evaluating word sense disambiguation against the Semcor senses.
+
+Usage:
+
+$ python evaluate.py [-n MAXFILES] [-s FILES] [--by GROUPS] PREDICTIONS
+$ python evaluate.py [-n MAXFILES] [--by GROUPS] --mfs
+
+The predictions file has one prediction per line, either with a file name, a
+sentence identifier, a position in the sentence and a sense:
+
+br-a01  1  2  say%2:32:00::
+
+or with a sentence number, a position and a sense:
+
+1  2  say%2:32:00::
+
+Sentence numbers are those created by Semcor.create_sentence_index() and the -s
+option gives the file with the file names that the sentence index is created
+from. Positions start at 0 and are the same as WordForm.position. A sense can be
+given without the lemma, as in 2:32:00::, and lines starting with # are ignored.
+Predictions are matched to the gold senses on global token identifiers (see
+tokens.py). If a file has a sentence identifier more than once, the first form
+refers to the first of those sentences, sentence numbers are always unique.
+
+Precision, recall and F1 are printed for all predictions and for each group of
+tokens in GROUPS, which is a comma-separated list with one or more of pos, lemma,
+btype and subcorpus (the default is pos,subcorpus). With --mfs the scores for a
+baseline that assigns the most frequent sense of each lemma are printed, note
+that the most frequent senses are taken from the same files that are evaluated.
+
+Usage as an imported module:
+
+>>> sc = Semcor()
+>>> gold = GoldStandard(sc)
+>>> evaluation = Evaluation(gold)
+>>> evaluation.read('predictions.txt')
+>>> evaluation.report(['pos', 'lemma'])
+
+"""
+
+from __future__ import print_function
+
+import os, sys, getopt
+from array import array
+
+from semcor import Semcor
+from matrix import SenseMatrices
+from ansi import BOLD, END
+
+
+GROUPS = ('pos', 'lemma', 'btype', 'subcorpus')
+
+
+class GoldStandard(object):
+
+    """The gold senses of all word forms with a sense in a Semcor instance. Each
+    of these forms gets a token number, which is its position in the columns
+    below. All columns except for subcorpus use the identifiers from the
+    vocabularies of the Semcor instance, with -1 for missing values.
+
+    Instance variables:
+
+    token_idx : dict (int -> int)
+       Maps global token identifiers (see tokens.py) to tokens. Sentence
+       identifiers are not used as keys because they are not always unique in
+       a file.
+
+    senses, lemmas, pos, btypes, subcorpora : arrays of integers
+       The columns, with the gold sense and the values used for grouping.
+
+    subcorpus_names : list of strings
+       The names of the subcorpora, indexed on the values in subcorpora.
+
+    alternatives : dict (int -> set of strings)
+       Tokens with more than one gold sense, like 'man%1:18:00::;1:18:03::', are
+       mapped to the set of all their senses.
+
+    """
+
+    def __init__(self, semcor):
+        self.semcor = semcor
+        self.vocab = semcor.vocab
+        self.token_idx = {}
+        self.senses = array('i')
+        self.lemmas = array('i')
+        self.pos = array('i')
+        self.btypes = array('i')
+        self.subcorpora = array('i')
+        self.subcorpus_names = []
+        self.alternatives = {}
+        for semcor_file in semcor.files:
+            token_ids = semcor.token_ids(semcor_file.forms)
+            subcorpus = semcor_file.fname.split(os.sep)[-3]
+            if subcorpus not in self.subcorpus_names:
+                self.subcorpus_names.append(subcorpus)
+            subcorpus = self.subcorpus_names.index(subcorpus)
+            for wf, token_id in zip(semcor_file.forms, token_ids):
+                token = len(self.senses)
+                self.token_idx[token_id] = token
+                lemma, sense, synset, pos, btype = self.vocab.encode_form(wf)
+                self.senses.append(sense)
+                self.lemmas.append(lemma)
+                self.pos.append(pos)
+                self.btypes.append(btype)
+                self.subcorpora.append(subcorpus)
+                if ';' in wf.lexsn:
+                    self.alternatives[token] = set(
+                        [wf.lemma + '%' + lexsn for lexsn in wf.lexsn.split(';')])
+
+    def __len__(self):
+        return len(self.senses)
+
+    def token(self, fname, sentence, position):
+        """Return the token number for a file base name, a sentence identifier or
+        a sentence number in the file and a position, or None if there is no word
+        form with a sense there."""
+        return self.token_idx.get(self.semcor.get_token_id(fname, sentence, position))
+
+    def lemma(self, token):
+        lemma = self.lemmas[token]
+        return None if lemma < 0 else self.vocab.lemmas.string(lemma)
+
+    def is_correct(self, token, sense):
+        """Return True if sense, which is a string like 'say%2:32:00::', is a gold
+        sense of the token."""
+        gold = self.senses[token]
+        if gold >= 0 and self.vocab.senses.get(sense) == gold:
+            return True
+        return sense in self.alternatives.get(token, ())
+
+    def column(self, group):
+        """Return the column and a function that turns values in the column into
+        strings for one of the names in GROUPS."""
+        vocab = self.vocab
+        if group == 'pos':
+            return self.pos, lambda i: vocab.pos.string(i) if i >= 0 else 'None'
+        if group == 'lemma':
+            return self.lemmas, lambda i: vocab.lemmas.string(i) if i >= 0 else 'None'
+        if group == 'btype':
+            return self.btypes, lambda i: vocab.btypes.string(i) if i >= 0 else 'None'
+        if group == 'subcorpus':
+            return self.subcorpora, lambda i: self.subcorpus_names[i]
+        raise ValueError("unknown group %s, use one of %s" % (group, ', '.join(GROUPS)))
+
+
+class Evaluation(object):
+
+    """Predictions for the tokens of a GoldStandard and their scores.
+
+    Instance variables:
+
+    gold : GoldStandard
+
+    predicted, correct : arrays of booleans
+       Whether a token has a prediction and whether it is correct, if there is
+       more than one prediction for a token the last one is used.
+
+    unknown : int
+       The number of predictions for positions without a gold sense.
+
+    """
+
+    def __init__(self, gold):
+        self.gold = gold
+        self.predicted = array('b', [0]) * len(gold)
+        self.correct = array('b', [0]) * len(gold)
+        self.unknown = 0
+
+    def add(self, token, sense):
+        """Add a prediction for a token number. The sense may leave out the lemma,
+        in which case the lemma of the token is used."""
+        if '%' not in sense:
+            sense = "%s%%%s" % (self.gold.lemma(token), sense)
+        self.predicted[token] = 1
+        self.correct[token] = 1 if self.gold.is_correct(token, sense) else 0
+
+    def read(self, fname):
+        """Read the predictions in fname, see the module docstring for the format.
+        The file is read line by line so it can be arbitrarily large."""
+        semcor = self.gold.semcor
+        sent_idx = semcor.sent_idx
+        token_idx = self.gold.token_idx
+        gold_senses = self.gold.senses
+        sense_ids = self.gold.vocab.senses.ids
+        alternatives = self.gold.alternatives
+        predicted = self.predicted
+        correct = self.correct
+        with open(fname) as fh:
+            for line in fh:
+                fields = line.split()
+                if not fields or fields[0].startswith('#'):
+                    continue
+                if len(fields) == 4:
+                    token_id = semcor.get_token_id(fields[0], fields[1], int(fields[2]))
+                else:
+                    sentence = sent_idx.get(int(fields[0]))
+                    token_id = None if sentence is None else semcor.get_token_id(
+                        sentence.fname, sentence.number, int(fields[1]))
+                token = token_idx.get(token_id)
+                if token is None:
+                    self.unknown += 1
+                    continue
+                sense = fields[-1]
+                if '%' not in sense:
+                    sense = "%s%%%s" % (self.gold.lemma(token), sense)
+                # this does what add() does, but without the method calls
+                predicted[token] = 1
+                if sense_ids.get(sense, -1) == gold_senses[token] >= 0:
+                    correct[token] = 1
+                else:
+                    correct[token] = 1 if sense in alternatives.get(token, ()) else 0
+
+    def scores(self, group=None):
+        """Return a dictionary with precision, recall, F1 and counts. If group is
+        None the dictionary has just one key, 'ALL', otherwise there is a key for
+        each value of the group (see GoldStandard.column)."""
+        if group is None:
+            labels = array('i', [0]) * len(self.gold)
+            name = lambda i: 'ALL'
+        else:
+            labels, name = self.gold.column(group)
+        totals = {}
+        for label, predicted, correct in zip(labels, self.predicted, self.correct):
+            counts = totals.get(label)
+            if counts is None:
+                counts = totals[label] = [0, 0, 0]
+            counts[0] += 1
+            counts[1] += predicted
+            counts[2] += correct
+        return dict((name(label), score(*counts)) for label, counts in totals.items())
+
+    def report(self, groups=()):
+        print("\n%s%-20s %8s %8s %8s %8s %8s%s"
+              % (BOLD, 'GROUP', 'TOKENS', 'ANSWERED', 'P', 'R', 'F1', END))
+        print_scores(self.scores())
+        for group in groups:
+            print("\n%s%s%s" % (BOLD, group.upper(), END))
+            print_scores(self.scores(group))
+        if self.unknown:
+            print("\nPredictions without a gold sense: %d" % self.unknown)
+        print()
+
+
+def score(total, predicted, correct):
+    precision = correct / float(predicted) if predicted else 0.0
+    recall = correct / float(total) if total else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if correct else 0.0
+    return {'tokens': total, 'answered': predicted,
+            'precision': precision, 'recall': recall, 'f1': f1}
+
+
+def print_scores(scores):
+    for label in sorted(scores, key=lambda label: -scores[label]['tokens']):
+        s = scores[label]
+        print("%-20s %8d %8d %8.4f %8.4f %8.4f"
+              % (label, s['tokens'], s['answered'], s['precision'], s['recall'], s['f1']))
+
+
+def mfs_baseline(gold, matrices=None):
+    """Return an Evaluation where each token is assigned the most frequent sense
+    of its lemma. The most frequent senses are taken from the SenseMatrices given,
+    which are by default created from the Semcor instance of the gold standard."""
+    if matrices is None:
+        matrices = SenseMatrices(gold.semcor)
+    mfs = matrices.most_frequent_senses()
+    senses = gold.vocab.senses
+    evaluation = Evaluation(gold)
+    for token, lemma in enumerate(gold.lemmas):
+        if 0 <= lemma < len(mfs) and mfs[lemma] >= 0:
+            evaluation.add(token, senses.string(mfs[lemma]))
+    return evaluation
+
+
+if __name__ == '__main__':
+
+    options, args = getopt.gnu_getopt(sys.argv[1:], 'n:s:', ['by=', 'mfs'])
+    options = { name: value for (name, value) in options }
+    maxfiles = int(options.get('-n', 999))
+    groups = options.get('--by', 'pos,subcorpus').split(',')
+
+    if '--mfs' not in options and len(args) != 1:
+        print(__doc__)
+    else:
+        sc = Semcor(maxfiles)
+        if '-s' in options:
+            sc.create_sentence_index(options['-s'])
+        gold = GoldStandard(sc)
+        if '--mfs' in options:
+            evaluation = mfs_baseline(gold)
+        else:
+            evaluation = Evaluation(gold)
+            evaluation.read(args[0])
+        evaluation.report(groups)
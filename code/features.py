@@ -0,0 +1,206 @@
+"""features.py
+
+Extracting features for word sense disambiguation.
+
+For each word form with a sense the features are the token, lemma and
+part-of-speech identifiers of the word form and of the WIDTH elements on each
+side of it in the sentence, together with the gold sense identifier. All
+identifiers are from the compiled vocabularies (see vocab.py). Positions outside
+of the sentence and strings that are not in the vocabularies get -1.
+
+Features are extracted from the compiled files, one file at a time and in a pool
+of worker processes, so the corpus is never loaded as a whole.
+
+Usage:
+
+$ python features.py [-n MAXFILES] [-w WIDTH] [-j PROCESSES] [-s SHARDSIZE] DIRECTORY
+
+This writes shards with at most SHARDSIZE rows (default is 100000) to DIRECTORY,
+each shard is a set of .npy files that can be loaded with numpy.load(), possibly
+with mmap_mode='r':
+
+   shard-000.tokens.npy   int32 (rows, 2 * WIDTH + 1)
+   shard-000.lemmas.npy   int32 (rows, 2 * WIDTH + 1)
+   shard-000.pos.npy      int32 (rows, 2 * WIDTH + 1)
+   shard-000.senses.npy   int32 (rows,)
+   shard-000.keys.npy     int32 (rows, 3) file number, sentence number, position
+
+The file number is the position of the file in semcor.SEMCOR_FILES. The default
+width is 5 and the default number of processes is the number of CPUs.
+
+Usage as an imported module:
+
+>>> for batch in batches(semcor_files()[:10], width=5, batch_size=1024):
+...     tokens = to_numpy(batch, 'tokens')
+
+NumPy is not needed for extracting and writing features, only for to_numpy().
+
+"""
+
+from __future__ import print_function
+
+import os, sys, getopt, multiprocessing
+from array import array
+
+import compiled
+from semcor import semcor_files
+from vocab import load_vocabularies
+
+
+# all columns and the number of values per row, where None stands for the
+# width of the window
+COLUMNS = (('tokens', None), ('lemmas', None), ('pos', None),
+           ('senses', 1), ('keys', 3))
+
+# the vocabularies, loaded when they are first needed in a process
+_vocab = None
+
+
+def get_vocab():
+    global _vocab
+    if _vocab is None:
+        _vocab = load_vocabularies()
+    return _vocab
+
+
+def row_width(column, width):
+    size = dict(COLUMNS)[column]
+    return 2 * width + 1 if size is None else size
+
+
+def empty_features():
+    features = dict((column, array('i')) for column, size in COLUMNS)
+    features['rows'] = 0
+    return features
+
+
+def extract_file(job):
+    """Return the features for the compiled version of a Semcor file. The job is a
+    tuple with the position of the file in SEMCOR_FILES, the file name and the
+    width. The features are a dictionary with an array for each column, where
+    the rows are concatenated, and the number of rows."""
+    number, fname, width = job
+    vocab = get_vocab()
+    semcor_file = compiled.read(compiled.file_name(fname), 'file')
+    features = empty_features()
+    padding = array('i', [-1]) * width
+    for sentence in semcor_file.get_sentences():
+        tokens = padding + vocab.tokens.encode([e.text for e in sentence.elements]) + padding
+        lemmas = padding + vocab.lemmas.encode(
+            [e.lemma if e.is_word_form() else None for e in sentence.elements]) + padding
+        pos = padding + vocab.pos.encode(
+            [e.pos if e.is_word_form() else None for e in sentence.elements]) + padding
+        for element in sentence.elements:
+            if element.is_word_form() and element.has_sense():
+                # the position in the padded arrays is shifted by the width,
+                # so the window starts at the position of the element
+                start = element.position
+                end = start + 2 * width + 1
+                features['tokens'].extend(tokens[start:end])
+                features['lemmas'].extend(lemmas[start:end])
+                features['pos'].extend(pos[start:end])
+                features['senses'].append(vocab.senses.get(element.sense(), -1))
+                features['keys'].extend([number, sentence.number, element.position])
+                features['rows'] += 1
+    return features
+
+
+def iter_features(fnames, width=5, processes=None):
+    """Yield the features for each file in fnames, in the order of fnames. If
+    processes is 1 all work is done in this process, otherwise a pool of worker
+    processes is used."""
+    numbers = dict((fname, n) for n, fname in enumerate(semcor_files()))
+    jobs = [(numbers[fname], fname, width) for fname in fnames]
+    if processes == 1:
+        for job in jobs:
+            yield extract_file(job)
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            for features in pool.imap(extract_file, jobs):
+                yield features
+        finally:
+            pool.close()
+            pool.join()
+
+
+def batches(fnames, width=5, batch_size=1024, processes=None):
+    """Yield the features for the files in batches of batch_size rows, only the
+    last batch can be smaller."""
+    batch = empty_features()
+    for features in iter_features(fnames, width, processes):
+        start = 0
+        while start < features['rows']:
+            take = min(batch_size - batch['rows'], features['rows'] - start)
+            for column, size in COLUMNS:
+                n = row_width(column, width)
+                batch[column].extend(features[column][start * n:(start + take) * n])
+            batch['rows'] += take
+            start += take
+            if batch['rows'] == batch_size:
+                yield batch
+                batch = empty_features()
+    if batch['rows']:
+        yield batch
+
+
+def to_numpy(batch, column):
+    """Return a column of a batch as a two-dimensional NumPy array, or one
+    dimensional for the senses column. This requires NumPy."""
+    import numpy
+    values = numpy.frombuffer(batch[column], dtype=numpy.intc)
+    if column == 'senses':
+        return values
+    return values.reshape(batch['rows'], -1)
+
+
+def write_npy(path, values, shape):
+    """Write an array of integers to path in the NumPy .npy format."""
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    header = "{'descr': '<i%d', 'fortran_order': False, 'shape': %s, }" \
+             % (values.itemsize, str(tuple(shape)))
+    # the magic string, version, header length and header have to add up to
+    # a multiple of 64 bytes, with the header ending in a newline
+    padding = (64 - (10 + len(header) + 1) % 64) % 64
+    header = header + ' ' * padding + '\n'
+    with open(path, 'wb') as fh:
+        fh.write(b'\x93NUMPY\x01\x00')
+        fh.write(array('B', [len(header) % 256, len(header) // 256]).tobytes())
+        fh.write(header.encode('latin1'))
+        fh.write(values.tobytes())
+
+
+def write_shards(fnames, directory, width=5, shard_size=100000, processes=None):
+    """Write the features for fnames to directory in shards of shard_size rows and
+    return the number of shards written."""
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    shards = 0
+    for batch in batches(fnames, width, shard_size, processes):
+        for column, size in COLUMNS:
+            path = os.path.join(directory, "shard-%03d.%s.npy" % (shards, column))
+            if column == 'senses':
+                shape = (batch['rows'],)
+            else:
+                shape = (batch['rows'], row_width(column, width))
+            write_npy(path, batch[column], shape)
+        print("Wrote shard %d with %d rows" % (shards, batch['rows']))
+        shards += 1
+    return shards
+
+
+if __name__ == '__main__':
+
+    options, args = getopt.gnu_getopt(sys.argv[1:], 'n:w:j:s:')
+    options = { name: value for (name, value) in options }
+    maxfiles = int(options.get('-n', 999))
+    width = int(options.get('-w', 5))
+    processes = int(options['-j']) if '-j' in options else None
+    shard_size = int(options.get('-s', 100000))
+
+    if len(args) != 1:
+        print(__doc__)
+    else:
+        write_shards(semcor_files()[:maxfiles], args[0], width, shard_size, processes)
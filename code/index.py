@@ -41,6 +41,7 @@ class IndexedWordForms(object):
             self.lemma_fname_idx[lemma] = create_fname_index(wfs)
         self.fname_lemma_idx = invert_index(self.lemma_fname_idx)
         self.btypes_idx = {}
+        self.filtered = False
 
     def filter_lemmas_with_only_one_sense_per_document(self):
         """This filters lemma_fname_idx, keeping only those lemmas that have at
@@ -52,6 +53,7 @@ class IndexedWordForms(object):
         is, wfs and lemma_idx are not changed."""
         self.lemma_fname_idx = filter_lemma_fname_index(self.lemma_fname_idx)
         self.fname_lemma_idx = invert_index(self.lemma_fname_idx)
+        self.filtered = True
 
     def initialize_btypes_index(self):
         self.btypes_idx = BTypePairDictionary(self)
@@ -81,19 +83,80 @@ class IndexedWordForms(object):
     def print_btypes_index_summary(self):
         self.btypes_idx.print_summary()
 
+    def add_wordforms(self, wfs):
+        """Add WordForms from documents that are not in the index yet. All indexes
+        are updated, including the filtering and the btypes index if those were
+        done before. Lists of WordForms are extended so new WordForms come after
+        those already in the index."""
+        self.wfs.extend(wfs)
+        lemma_idx = create_lemma_index(wfs)
+        lemma_fname_idx = {}
+        for lemma, lemma_wfs in lemma_idx.items():
+            self.lemma_idx.setdefault(lemma, []).extend(lemma_wfs)
+            lemma_fname_idx[lemma] = create_fname_index(lemma_wfs)
+        if self.filtered:
+            lemma_fname_idx = filter_lemma_fname_index(lemma_fname_idx)
+        for lemma, fname_idx in lemma_fname_idx.items():
+            self.lemma_fname_idx.setdefault(lemma, {}).update(fname_idx)
+        for fname, lemma_idx in invert_index(lemma_fname_idx).items():
+            self.fname_lemma_idx.setdefault(fname, {}).update(lemma_idx)
+        if self.btypes_idx:
+            self.btypes_idx.add_index(lemma_fname_idx)
+
+    def freeze(self):
+        """Replace all lists of WordForms with tuples, after this the index cannot
+        be changed."""
+        self.wfs = tuple(self.wfs)
+        self.lemma_idx = freeze_index(self.lemma_idx)
+        self.lemma_fname_idx = dict((lemma, freeze_index(idx))
+                                    for lemma, idx in self.lemma_fname_idx.items())
+        self.fname_lemma_idx = invert_index(self.lemma_fname_idx)
+        if self.btypes_idx:
+            self.btypes_idx.freeze()
+
+    def remove_files(self, fnames):
+        """Remove all WordForms from the documents with base names in fnames, which
+        is a set."""
+        self.wfs = [wf for wf in self.wfs if wf.sent.fname not in fnames]
+        for lemma in list(self.lemma_idx):
+            wfs = [wf for wf in self.lemma_idx[lemma] if wf.sent.fname not in fnames]
+            if wfs:
+                self.lemma_idx[lemma] = wfs
+            else:
+                del self.lemma_idx[lemma]
+        for fname in fnames:
+            for lemma in self.fname_lemma_idx.pop(fname, {}):
+                del self.lemma_fname_idx[lemma][fname]
+                if not self.lemma_fname_idx[lemma]:
+                    del self.lemma_fname_idx[lemma]
+        if self.btypes_idx:
+            self.btypes_idx.remove_files(fnames)
+
 
 class BTypePairDictionary(object):
 
+    """Index from pairs of basic types to WordForms. For each pair there is a
+    dictionary with all WordForms under 'ALL' and an index from lemmas to
+    WordForms under 'LEMMAS'. The lists for the lemmas are sorted on basic type
+    when they are created, so they can be printed without sorting them."""
+
     def __init__(self, wordforms_idx):
         self.data = {}
-        for lemma in wordforms_idx.lemma_fname_idx:
-            for fname in wordforms_idx.lemma_fname_idx[lemma]:
-                wfs = wordforms_idx.lemma_fname_idx[lemma][fname]
+        self.add_index(wordforms_idx.lemma_fname_idx)
+
+    def add_index(self, lemma_fname_idx):
+        """Add the WordForms from an index of lemmas to file names to WordForms."""
+        for lemma in lemma_fname_idx:
+            for fname in lemma_fname_idx[lemma]:
+                wfs = lemma_fname_idx[lemma][fname]
                 btypes = set([wf.synset.btypes for wf in wfs])
                 btypes = tuple(sorted(bt for bt in btypes if not ' ' in bt))
                 btype_pairs = pairs(btypes)
                 for btype_pair in btype_pairs:
                     self.add_wordforms(lemma, btype_pair, wfs)
+        for entry in self.data.values():
+            for wfs in entry['LEMMAS'].values():
+                wfs.sort(key=lambda x: x.synset.btypes)
 
     def __getitem__(self, key):
         return self.data[key]
@@ -113,6 +176,26 @@ class BTypePairDictionary(object):
         self.data[btype_pair]['ALL'].extend(filterd_wfs)
         self.data[btype_pair]['LEMMAS'][lemma].extend(filterd_wfs)
 
+    def remove_files(self, fnames):
+        """Remove all WordForms from the documents with base names in fnames, which
+        is a set, and remove lemmas and pairs that have no WordForms left."""
+        for btype_pair in list(self.data):
+            entry = self.data[btype_pair]
+            entry['ALL'] = [wf for wf in entry['ALL'] if wf.sent.fname not in fnames]
+            for lemma in list(entry['LEMMAS']):
+                wfs = [wf for wf in entry['LEMMAS'][lemma] if wf.sent.fname not in fnames]
+                if wfs:
+                    entry['LEMMAS'][lemma] = wfs
+                else:
+                    del entry['LEMMAS'][lemma]
+            if not entry['LEMMAS']:
+                del self.data[btype_pair]
+
+    def freeze(self):
+        for entry in self.data.values():
+            entry['ALL'] = tuple(entry['ALL'])
+            entry['LEMMAS'] = freeze_index(entry['LEMMAS'])
+
     def print_summary(self):
         for btypes in sorted(self.data):
             wfs = self.data[btypes]['ALL']
@@ -131,9 +214,7 @@ class BTypePairDictionary(object):
                     break
             print("\n%s%s%s\n" % (ansi.BOLD, ' - '.join(btypes), ansi.END))
             for lemma in self.data[btypes]['LEMMAS']:
-                wfs = self.data[btypes]['LEMMAS'][lemma]
-                wfs.sort(key=lambda x: x.synset.btypes)
-                for wf in wfs:
+                for wf in self.data[btypes]['LEMMAS'][lemma]:
                     (left, kw, right) = wf.kwic(50)
                     line = utils.kwic_line(left, kw, right, 50)
                     print("   %s %s%s %s" % (ansi.GREEN, wf.synset.btypes, ansi.END, line))
@@ -157,6 +238,11 @@ def create_fname_index(wordforms):
     return idx
 
 
+def freeze_index(idx):
+    """Return a copy of an index with tuples instead of lists as values."""
+    return dict((key, tuple(values)) for key, values in idx.items())
+
+
 def invert_index(idx):
     """Returns a new index with the same values, but structured differently in that
     in the output top-level keys switch place with embedded keys. For example,
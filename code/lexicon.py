@@ -0,0 +1,259 @@
+"""lexicon.py
+
+Prefix, wildcard and fuzzy lookup of lemmas and synset descriptions.
+
+The lexicon has all lemmas from the mappings file and the vocabularies and the
+descriptions of all synsets, each in a sorted list. A sorted list is used as a
+compact trie: all strings with a given prefix are in one range of the list,
+which is found with a binary search. Lookups by prefix and by glob pattern only
+look at the range for the longest literal prefix of the query. Lookups by edit
+distance walk through the sorted strings as if walking depth-first through a
+trie, sharing the rows of the distance table between strings with a common
+prefix and skipping all strings with a prefix that is already too far from the
+query.
+
+The lexicon is created when compiling Semcor and saved with the compiled files,
+it is created from the synsets and vocabularies if it was not compiled.
+
+Usage:
+
+>>> sc = Semcor()
+>>> sc.lexicon.prefix('walk')
+>>> sc.lexicon.glob('*_jury')
+>>> sc.lexicon.fuzzy('wlak', 1)
+>>> sc.lexicon.glob_descriptions('walk*')
+
+Usage from the command line:
+
+$ python lexicon.py [-d] [-k DISTANCE] QUERY...
+
+Prints lemmas that match each query, or synsets with -d. A query with wildcards
+is a glob pattern, otherwise lemmas starting with the query and lemmas within
+DISTANCE edits from the query (default is 2) are printed.
+
+"""
+
+from __future__ import print_function
+
+import re, sys, getopt, fnmatch
+from array import array
+from bisect import bisect_left
+
+import compiled
+
+
+# characters that start a wildcard in glob patterns
+WILDCARDS = '*?['
+
+
+class Lexicon(object):
+
+    """Sorted lemmas and synset descriptions.
+
+    Instance variables:
+
+    lemmas : list of strings
+       All lemmas, sorted.
+
+    descriptions : list of strings
+       Lower-cased descriptions of all synsets, sorted. Synsets can share a
+       description so a description can occur more than once.
+
+    description_synsets : array of integers
+       For each description the position in the SynsetTable of its synset.
+
+    """
+
+    def __init__(self, synsets, vocab):
+        """Create the lexicon from a SynsetTable and Vocabularies."""
+        lemmas = set(synsets.synset_idx)
+        lemmas.update(vocab.lemmas.strings)
+        self.lemmas = sorted(lemmas)
+        pairs = sorted((synset.description.lower(), n)
+                       for n, synset in enumerate(synsets.synsets))
+        self.descriptions = [description for description, n in pairs]
+        self.description_synsets = array('i', [n for description, n in pairs])
+
+    def __str__(self):
+        return "<Lexicon lemmas=%d descriptions=%d>" \
+               % (len(self.lemmas), len(self.descriptions))
+
+    def __contains__(self, lemma):
+        i = bisect_left(self.lemmas, lemma)
+        return i < len(self.lemmas) and self.lemmas[i] == lemma
+
+    def prefix(self, prefix, limit=None):
+        """Return the lemmas that start with prefix, in sorted order."""
+        start, end = prefix_range(self.lemmas, prefix)
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.lemmas[start:end]
+
+    def glob(self, pattern, limit=None):
+        """Return the lemmas that match a glob pattern like 'walk*' or '*_jury',
+        in sorted order."""
+        return [self.lemmas[i] for i in glob_positions(self.lemmas, pattern, limit)]
+
+    def fuzzy(self, word, max_distance=2, limit=None):
+        """Return the lemmas that are at most max_distance edits away from word,
+        sorted on distance and then on lemma. An edit is an insertion, a deletion,
+        a substitution or a swap of two adjacent characters."""
+        matches = sorted(within_distance(self.lemmas, word, max_distance))
+        return [self.lemmas[i] for distance, i in matches[:limit]]
+
+    def suggest(self, word, max_distance=2, limit=10):
+        """Return lemmas for a word that is not a lemma, those that start with the
+        word followed by those that are close to the word."""
+        suggestions = self.prefix(word, limit)
+        for lemma in self.fuzzy(word, max_distance, limit):
+            if lemma not in suggestions:
+                suggestions.append(lemma)
+        return suggestions[:limit]
+
+    def prefix_descriptions(self, prefix, limit=None):
+        """Return the positions in the SynsetTable of synsets with a description
+        that starts with prefix."""
+        start, end = prefix_range(self.descriptions, prefix.lower())
+        if limit is not None:
+            end = min(end, start + limit)
+        return list(self.description_synsets[start:end])
+
+    def glob_descriptions(self, pattern, limit=None):
+        """Return the positions in the SynsetTable of synsets with a description
+        that matches a glob pattern."""
+        positions = glob_positions(self.descriptions, pattern.lower(), limit)
+        return [self.description_synsets[i] for i in positions]
+
+    def fuzzy_descriptions(self, description, max_distance=2, limit=None):
+        """Return the positions in the SynsetTable of synsets with a description
+        that is at most max_distance edits away from description, closest first."""
+        matches = sorted(within_distance(self.descriptions, description.lower(),
+                                         max_distance))
+        return [self.description_synsets[i] for distance, i in matches[:limit]]
+
+    def pickle(self):
+        compiled.write(compiled.file_name('lexicon'), self, 'lexicon')
+
+
+def load_lexicon(synsets, vocab):
+    """Return the compiled lexicon, or create it from the SynsetTable and the
+    Vocabularies if it was not compiled or was compiled with an older version
+    of the code."""
+    try:
+        return compiled.read(compiled.file_name('lexicon'), 'lexicon')
+    except (IOError, compiled.CompiledFormatError):
+        return Lexicon(synsets, vocab)
+
+
+def is_pattern(query):
+    return any(c in query for c in WILDCARDS)
+
+
+def successor(prefix):
+    """Return the smallest string that is larger than all strings that start with
+    prefix, which should not be empty."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def prefix_range(strings, prefix):
+    """Return the start and end of the range of a sorted list of strings with the
+    strings that start with prefix."""
+    if not prefix:
+        return 0, len(strings)
+    start = bisect_left(strings, prefix)
+    return start, bisect_left(strings, successor(prefix), start)
+
+
+def glob_positions(strings, pattern, limit=None):
+    """Return the positions of the strings in a sorted list that match a glob
+    pattern. Only the range of strings that start with the literal prefix of the
+    pattern is searched."""
+    literal = re.split(r'[*?[]', pattern, 1)[0]
+    start, end = prefix_range(strings, literal)
+    if literal == pattern:
+        # no wildcards, so it is an exact match
+        end = start + 1 if start < end and strings[start] == pattern else start
+    match = re.compile(fnmatch.translate(pattern)).match
+    positions = []
+    for i in range(start, end):
+        if match(strings[i]):
+            positions.append(i)
+            if len(positions) == limit:
+                break
+    return positions
+
+
+def within_distance(strings, word, max_distance):
+    """Return pairs of an edit distance and a position for all strings in a sorted
+    list that are at most max_distance edits away from word. The distance allows
+    swapping adjacent characters in addition to insertions, deletions and
+    substitutions."""
+    matches = []
+    columns = range(1, len(word) + 1)
+    # rows[d] is the row of the distance table for the first d characters of
+    # the previous string, rows are reused for the prefix that the next string
+    # has in common with it
+    rows = [list(range(len(word) + 1))]
+    previous = ''
+    i = 0
+    while i < len(strings):
+        string = strings[i]
+        common = 0
+        limit = min(len(previous), len(string))
+        while common < limit and previous[common] == string[common]:
+            common += 1
+        del rows[common + 1:]
+        for depth in range(common, len(string)):
+            char = string[depth]
+            above = rows[-1]
+            row = [depth + 1]
+            for j in columns:
+                cost = min(above[j] + 1, row[j - 1] + 1,
+                           above[j - 1] + (word[j - 1] != char))
+                if (depth and j > 1 and char == word[j - 2]
+                        and string[depth - 1] == word[j - 1]):
+                    cost = min(cost, rows[-2][j - 2] + 1)
+                row.append(cost)
+            rows.append(row)
+            if min(row) > max_distance:
+                # no string with this prefix can be close enough
+                previous = string[:depth + 1]
+                i = bisect_left(strings, successor(previous), i)
+                break
+        else:
+            if rows[-1][-1] <= max_distance:
+                matches.append((rows[-1][-1], i))
+            previous = string
+            i += 1
+    return matches
+
+
+if __name__ == '__main__':
+
+    from semcor import load_synset_table
+    from vocab import load_vocabularies
+
+    options, args = getopt.getopt(sys.argv[1:], 'dk:')
+    options = { name: value for (name, value) in options }
+    distance = int(options.get('-k', 2))
+
+    synsets = load_synset_table()
+    lexicon = load_lexicon(synsets, load_vocabularies())
+    for query in args:
+        print('\n%s' % query)
+        if '-d' in options:
+            if is_pattern(query):
+                positions = lexicon.glob_descriptions(query)
+            else:
+                positions = lexicon.prefix_descriptions(query)
+                positions += [p for p in lexicon.fuzzy_descriptions(query, distance)
+                              if p not in positions]
+            for position in positions:
+                synset = synsets.synsets[position]
+                print('  %s %s' % (synset.ssid, synset))
+        else:
+            if is_pattern(query):
+                lemmas = lexicon.glob(query)
+            else:
+                lemmas = lexicon.suggest(query, distance, None)
+            print('  ' + ' '.join(lemmas))
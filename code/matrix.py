@@ -0,0 +1,192 @@
+"""matrix.py
+
+Sparse count matrices over the integer identifiers from vocab.py.
+
+The matrices are created in one pass over all word forms with a sense, in which
+the identifiers of each form are collected in arrays, after which the arrays are
+turned into matrices in compressed sparse row format. Statistics like sense
+distributions and most frequent senses are then taken from rows of the matrices
+instead of from dictionaries of WordForms.
+
+Usage:
+
+>>> sc = Semcor()
+>>> matrices = SenseMatrices(sc)
+>>> lemma = sc.vocab.lemmas.get('walk')
+>>> matrices.lemma_sense.row(lemma)
+>>> matrices.most_frequent_senses()[lemma]
+
+If SciPy is installed the matrices can be converted with the to_scipy() method.
+
+"""
+
+from array import array
+from collections import Counter
+
+
+class SparseMatrix(object):
+
+    """Matrix of counts in compressed sparse row format, which is the same format
+    as used by scipy.sparse.csr_matrix.
+
+    Instance variables:
+
+    shape : tuple of two integers
+
+    indptr : array of integers
+       The entries for row i are at positions indptr[i] up to indptr[i+1] in the
+       indices and data arrays.
+
+    indices : array of integers
+       Column numbers of the entries, ordered within each row.
+
+    data : array of integers
+       The counts of the entries.
+
+    """
+
+    def __init__(self, shape, indptr, indices, data):
+        self.shape = shape
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+
+    @classmethod
+    def from_pairs(cls, rows, cols, shape):
+        """Create a matrix where each cell has the number of times its row and
+        column occur together in the rows and cols sequences. Pairs with a
+        negative row or column are skipped."""
+        counts = {}
+        for pair in zip(rows, cols):
+            if pair[0] >= 0 and pair[1] >= 0:
+                counts[pair] = counts.get(pair, 0) + 1
+        return cls.from_counts(counts, shape)
+
+    @classmethod
+    def from_counts(cls, counts, shape):
+        """Create a matrix from a dictionary with (row, column) keys."""
+        indptr = array('i', [0] * (shape[0] + 1))
+        indices = array('i')
+        data = array('i')
+        for (row, col) in sorted(counts):
+            indptr[row + 1] += 1
+            indices.append(col)
+            data.append(counts[(row, col)])
+        for i in range(shape[0]):
+            indptr[i + 1] += indptr[i]
+        return cls(shape, indptr, indices, data)
+
+    @classmethod
+    def from_flat_counts(cls, counts, shape):
+        """Create a matrix from a dictionary with keys row * shape[1] + column,
+        this is faster than from_counts() for a large number of entries."""
+        columns = shape[1]
+        keys = sorted(counts)
+        indices = array('i', [key % columns for key in keys])
+        data = array('i', [counts[key] for key in keys])
+        sizes = Counter([key // columns for key in keys])
+        indptr = array('i', [0] * (shape[0] + 1))
+        for i in range(shape[0]):
+            indptr[i + 1] = indptr[i] + sizes.get(i, 0)
+        return cls(shape, indptr, indices, data)
+
+    def __str__(self):
+        return "<SparseMatrix %dx%d with %d entries>" % (self.shape[0], self.shape[1], self.nnz())
+
+    def nnz(self):
+        return len(self.data)
+
+    def row(self, i):
+        """Return a list of (column, count) pairs for row i."""
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return list(zip(self.indices[start:end], self.data[start:end]))
+
+    def get(self, i, j):
+        for col, count in self.row(i):
+            if col == j:
+                return count
+        return 0
+
+    def row_sums(self):
+        return array('i', [sum(self.data[self.indptr[i]:self.indptr[i + 1]])
+                           for i in range(self.shape[0])])
+
+    def col_sums(self):
+        sums = array('i', [0] * self.shape[1])
+        for col, count in zip(self.indices, self.data):
+            sums[col] += count
+        return sums
+
+    def argmax_rows(self):
+        """Return an array with for each row the column with the highest count,
+        or -1 for empty rows. Ties are broken in favour of the lowest column."""
+        result = array('i', [-1] * self.shape[0])
+        for i in range(self.shape[0]):
+            start, end = self.indptr[i], self.indptr[i + 1]
+            if start < end:
+                best = max(range(start, end), key=lambda k: (self.data[k], -self.indices[k]))
+                result[i] = self.indices[best]
+        return result
+
+    def transpose(self):
+        rows = array('i')
+        for i in range(self.shape[0]):
+            rows.extend([i] * (self.indptr[i + 1] - self.indptr[i]))
+        counts = {}
+        for row, col, count in zip(rows, self.indices, self.data):
+            counts[(col, row)] = count
+        return SparseMatrix.from_counts(counts, (self.shape[1], self.shape[0]))
+
+    def to_scipy(self):
+        """Return the matrix as a scipy.sparse.csr_matrix, this requires SciPy."""
+        from scipy.sparse import csr_matrix
+        return csr_matrix((self.data, self.indices, self.indptr), shape=self.shape)
+
+
+class SenseMatrices(object):
+
+    """Count matrices for the loaded Semcor files. Rows and columns are the
+    identifiers from the vocabularies of the Semcor instance, except for the rows
+    of document_sense which are positions in the files list of Semcor.
+
+    document_sense : SparseMatrix
+       How often each sense occurs in each document.
+
+    lemma_sense : SparseMatrix
+       How often each lemma occurs with each sense.
+
+    sense_btype : SparseMatrix
+       How often each sense occurs with each basic type, since a sense has one
+       synset this is a count of occurrences of the sense in a single column.
+
+    """
+
+    def __init__(self, semcor):
+        vocab = semcor.vocab
+        docs, lemmas, senses, btypes = array('i'), array('i'), array('i'), array('i')
+        for doc, semcor_file in enumerate(semcor.files):
+            for wf in semcor_file.forms:
+                lemma, sense, synset, pos, btype = vocab.encode_form(wf)
+                docs.append(doc)
+                lemmas.append(lemma)
+                senses.append(sense)
+                btypes.append(btype)
+        n_senses = len(vocab.senses)
+        self.vocab = vocab
+        self.document_sense = SparseMatrix.from_pairs(docs, senses, (len(semcor.files), n_senses))
+        self.lemma_sense = SparseMatrix.from_pairs(lemmas, senses, (len(vocab.lemmas), n_senses))
+        self.sense_btype = SparseMatrix.from_pairs(senses, btypes, (n_senses, len(vocab.btypes)))
+
+    def sense_distribution(self, lemma):
+        """Return a list of (sense, count) pairs for the lemma, ordered on count."""
+        identifier = self.vocab.lemmas.get(lemma)
+        if identifier is None:
+            return []
+        pairs = [(self.vocab.senses.string(sense), count)
+                 for sense, count in self.lemma_sense.row(identifier)]
+        return sorted(pairs, key=lambda pair: -pair[1])
+
+    def most_frequent_senses(self):
+        """Return an array with the identifier of the most frequent sense for each
+        lemma identifier, -1 is used for lemmas that do not occur."""
+        return self.lemma_sense.argmax_rows()
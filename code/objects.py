@@ -5,6 +5,7 @@
 from __future__ import print_function
 
 import os
+from array import array
 
 from ansi import BOLD, BLUE, GREEN, GREY, END
 
@@ -55,6 +56,9 @@ class Sentence(SemcorObject):
         self.pid = para.pid     # <string>
         self.sid = sid          # <string>
         self.elements = []
+        self.number = None      # <int> position of the sentence in the document
+        self.string = None      # <string> tokens separated by spaces
+        self.offsets = None     # <array> character offsets of tokens in string
 
     def __str__(self):
         return "<Sentence %s:%s with %d wfs>" % (self.fname, self.sid, len(self.elements))
@@ -80,8 +84,32 @@ class Sentence(SemcorObject):
             if wf.is_word_form() and wf.has_sense():
                 forms.append(wf)
 
+    def compile_offsets(self, number):
+        """Store the sentence as a string and store the character offsets of all
+        elements in that string. This is done once when compiling so that KWIC
+        contexts can be created by slicing the string."""
+        self.number = number
+        self.string = ' '.join([t.text for t in self.elements])
+        self.offsets = array('i')
+        offset = 0
+        for t in self.elements:
+            self.offsets.append(offset)
+            offset += len(t.text) + 1
+
     def as_string(self):
+        if self.string is not None:
+            return self.string
         return ' '.join([t.text for t in self.elements])
+
+    def kwic(self, position, context):
+        """Return a triple with the left context, the element at position and the
+        right context, where the contexts have at most context characters. Uses
+        the offsets created at compile time."""
+        start = self.offsets[position]
+        end = start + len(self.elements[position].text)
+        left = self.string[max(0, start - 1 - context):max(0, start - 1)]
+        right = self.string[end + 1:end + 1 + context]
+        return (left, self.string[start:end], right)
     
     def pp(self, highlight=None):
         print("%s%s%s-%s%s: " % (GREY, GREEN, self.fname, self.sid, END), end='')
@@ -106,7 +134,12 @@ class WordForm(SemcorObject):
     Note that these word forms can have multiple tokens and those are not just
     for names, for example primary_election is a word form. Some word forms do
     not have senses associated with them, for them we just have POS and the
-    text."""
+    text.
+
+    The synset of a word form is stored as a position in a table of synsets,
+    each word form has the table it was bound to in its synset_table, which is
+    set when the file is loaded by Semcor or created from a shared corpus or a
+    database."""
 
     def __init__(self, para, sent, position, tag):
         self.para = para                  # instance of Paragraph
@@ -121,7 +154,7 @@ class WordForm(SemcorObject):
         self.wnsn = tag.get('wnsn')
         self.lexsn = tag.get('lexsn')
         self.text = tag.getText()
-        self.synset = None
+        self.synset_id = None
         self.keys = tuple(tag.__dict__['attrs'].keys())  # for statistics
 
     def __str__(self):
@@ -130,6 +163,12 @@ class WordForm(SemcorObject):
         else:
             return "<wf %s %s %s %s>" % (self.pos, self.lemma, self.wnsn, self.lexsn)
 
+    @property
+    def synset(self):
+        if self.synset_id is None:
+            return None
+        return self.synset_table[self.synset_id]
+
     def sense(self):
         return "%s%%%s" % (self.lemma, self.lexsn) if self.has_sense() else None
 
@@ -146,14 +185,7 @@ class WordForm(SemcorObject):
         return self.wnsn is not None and self.lexsn is not None
 
     def kwic(self, context):
-        kw = self.sent.elements[self.position].text
-        left = self.sent.elements[:self.position]
-        right = self.sent.elements[self.position+1:]
-        left = ' '.join([t.text for t in left])
-        right = ' '.join([t.text for t in right])
-        left = left[-context:]
-        right = right[:context]
-        return (left, kw, right)
+        return self.sent.kwic(self.position, context)
     
 
 class Punctuation(SemcorObject):
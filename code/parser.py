@@ -37,5 +37,6 @@ def parse_sentence(semcor_file, paragraph, s):
             pass
         else:
             print('WARNING, unexpected daughter:', dtr)
+            semcor_file.unexpected.append((sid, dtr.name))
             
 
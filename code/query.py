@@ -0,0 +1,506 @@
+"""query.py
+
+A small query language over the WordForms with a sense.
+
+A query is a list of terms that all have to match, optionally followed by a
+condition on other WordForms in the same sentence, paragraph or file:
+
+   pos=NN btype=act lemma~"^walk"
+   pos=NN btype=act within sentence of sense=say%2:32:00::
+   explain lemma=walk pos!=VB
+
+Terms have a field, an operator and a value, the value can be quoted:
+
+   field    lemma, pos, sense, synset, btype, file, text, wnsn, lexsn, and
+            deprel and head for the dependency relation and the lemma of the
+            head in the annotation layer loaded with Semcor.load_annotations()
+   =        the field has the value, for btype one of the basic types of the
+            synset is the value
+   !=       the field does not have the value
+   ~        the field matches the regular expression in the value
+
+The term 'and' between terms is allowed but not needed. A query that starts
+with 'explain' prints the plan with timing instead of the results.
+
+The planner estimates for each term how many WordForms it selects, using the
+lemma index of Semcor for lemmas and indexes for the other fields except text,
+wnsn and lexsn. Those indexes are created when a query needs them, that is, when
+the other terms of the query are not selective enough. Regular expressions on an
+indexed field are evaluated once for each value in the index. The term with the
+lowest estimate is used to get candidate WordForms and the other terms are
+checked on each candidate, those that select the fewest WordForms first. For
+queries with a within clause the inner query is run first and, if that gives
+fewer candidates, the WordForms in the sentences, paragraphs or files found are
+the candidates. Results are streamed in the order of the index used for the
+candidates.
+
+Usage:
+
+>>> sc = Semcor()
+>>> for wf in sc.query('pos=NN btype=act within sentence of lemma=say'):
+...     print(wf)
+>>> print(sc.explain('pos=NN btype=act within sentence of lemma=say'))
+
+Usage from the command line:
+
+$ python query.py [-n MAXFILES] [--explain] [--count] QUERY...
+$ python query.py [-n MAXFILES] [--explain] [--count] - < QUERIES
+
+Prints tab-separated results for each query, with the file, the sentence
+identifier, the position, the text, the part-of-speech, the sense and the
+synset. With '-' the queries are read from standard input, one per line.
+
+"""
+
+from __future__ import print_function
+
+import re, sys, time, getopt, threading
+from itertools import chain
+
+
+FIELDS = ('lemma', 'pos', 'sense', 'synset', 'btype', 'file', 'text', 'wnsn', 'lexsn',
+          'deprel', 'head')
+
+# fields that are taken from the annotation layer
+ANNOTATED = ('deprel', 'head')
+
+# fields that have an index, the lemma index is the one on Semcor and the
+# others are created when they are first needed
+INDEXED = ('lemma', 'pos', 'sense', 'synset', 'btype', 'file', 'deprel', 'head')
+
+SCOPES = ('sentence', 'paragraph', 'file')
+
+# an index that does not exist yet is only created when the best access path
+# without it would look at more than this fraction of all WordForms
+BUILD_FRACTION = 0.1
+
+TOKEN = re.compile(r'\s*(?:(?P<field>[a-z]+)\s*(?P<op>!=|=|~)\s*'
+                   r'(?P<value>"(?:[^"\\]|\\.)*"|[^\s"]+)|(?P<word>\S+))')
+
+
+class QueryError(Exception):
+
+    """Raised for queries that cannot be parsed."""
+
+
+class Term(object):
+
+    def __init__(self, field, op, value):
+        if field not in FIELDS:
+            raise QueryError("unknown field %s, use one of %s" % (field, ', '.join(FIELDS)))
+        self.field = field
+        self.op = op
+        self.value = value
+        self.regex = None
+        # set by the Plan, needed for fields from the annotation layer
+        self.semcor = None
+        if op == '~':
+            try:
+                self.regex = re.compile(value)
+            except re.error as e:
+                raise QueryError("bad regular expression %s: %s" % (value, e))
+
+    def __str__(self):
+        value = self.value
+        if not value or re.search(r'[\s"]', value):
+            value = '"%s"' % value.replace('\\', '\\\\').replace('"', '\\"')
+        return "%s%s%s" % (self.field, self.op, value)
+
+    def values(self, wf):
+        """Return the values of the field for the WordForm as a list."""
+        field = self.field
+        if field in ('synset', 'btype'):
+            synset = wf.synset
+            if synset is None:
+                return []
+            return [synset.ssid] if field == 'synset' else synset.btypes.split()
+        if field == 'sense':
+            return [wf.sense()]
+        if field == 'file':
+            return [wf.sent.fname]
+        if field in ANNOTATED:
+            layer = self.semcor.annotations
+            token = self.semcor.token_id(wf)
+            if field == 'deprel':
+                return [layer.get_deprel(token)]
+            return [layer.head_lemma(token, self.semcor)]
+        return [getattr(wf, field)]
+
+    def matches(self, wf):
+        values = self.values(wf)
+        if self.op == '=':
+            return self.value in values
+        if self.op == '!=':
+            return self.value not in values
+        return any(v is not None and self.regex.search(v) for v in values)
+
+    def keys(self, index):
+        """Return the keys of the index that the term selects, or None if the
+        index cannot be used for the term."""
+        if self.op == '=':
+            return [self.value] if self.value in index else []
+        if self.op == '~':
+            return [key for key in index if self.regex.search(key)]
+        return None
+
+
+class Query(object):
+
+    """A parsed query.
+
+    Instance variables:
+
+    terms : list of Terms
+
+    scope : string or None
+       One of SCOPES for a query with a within clause.
+
+    inner : Query or None
+       The query after 'of' in the within clause.
+
+    explain : boolean
+
+    """
+
+    def __init__(self, terms, scope=None, inner=None, explain=False):
+        self.terms = terms
+        self.scope = scope
+        self.inner = inner
+        self.explain = explain
+
+    def __str__(self):
+        text = ' '.join(str(term) for term in self.terms)
+        if self.scope is not None:
+            text += " within %s of %s" % (self.scope, self.inner)
+        return text
+
+
+def parse(text):
+    """Parse the query text and return a Query, raises a QueryError if the text
+    is not a query."""
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        position = match.end()
+        if match.group('word') is not None:
+            tokens.append(match.group('word').lower())
+        else:
+            value = match.group('value')
+            if value.startswith('"'):
+                value = re.sub(r'\\(.)', r'\1', value[1:-1])
+            tokens.append(Term(match.group('field'), match.group('op'), value))
+    explain = bool(tokens) and tokens[0] == 'explain'
+    if explain:
+        tokens.pop(0)
+    query = _parse_terms(tokens, text)
+    query.explain = explain
+    return query
+
+
+def _parse_terms(tokens, text):
+    terms = []
+    while tokens and tokens[0] != 'within':
+        token = tokens.pop(0)
+        if isinstance(token, Term):
+            terms.append(token)
+        elif token != 'and':
+            raise QueryError("unexpected %s in %s" % (token, text))
+    if not terms:
+        raise QueryError("no terms in %s" % text)
+    if not tokens:
+        return Query(terms)
+    if len(tokens) < 3 or tokens[1] not in SCOPES or tokens[2] != 'of':
+        raise QueryError("expected 'within SCOPE of' with SCOPE one of %s"
+                         % ', '.join(SCOPES))
+    return Query(terms, tokens[1], _parse_terms(tokens[3:], text))
+
+
+class QueryIndex(object):
+
+    """The indexes and statistics used by the planner.
+
+    Instance variables:
+
+    semcor : Semcor
+
+    postings : dict (string -> dict (string -> list of WordForms))
+       The index for each field in INDEXED that was used so far.
+
+    build_times : dict (string -> float)
+       The seconds it took to create each index in postings.
+
+    forms : integer
+       The number of WordForms with a sense.
+
+    scope_sizes : dict (string -> float)
+       The average number of WordForms with a sense for each scope.
+
+    """
+
+    def __init__(self, semcor):
+        self.semcor = semcor
+        self.lock = threading.Lock()
+        self.postings = {'lemma': semcor.lemma_idx,
+                         'file': dict((fname, f.forms) for fname, f in semcor.file_idx.items())}
+        self.build_times = {}
+        self.forms = sum(len(f.forms) for f in semcor.files)
+        sentences = sum(len(f.sentences) for f in semcor.files)
+        paragraphs = sum(len(f.paragraphs) for f in semcor.files)
+        self.scope_sizes = {
+            'sentence': self.forms / float(max(1, sentences)),
+            'paragraph': self.forms / float(max(1, paragraphs)),
+            'file': self.forms / float(max(1, len(semcor.files)))}
+
+    def has(self, field):
+        return field in self.postings
+
+    def get(self, field):
+        """Return the index for the field, create it if needed. Indexes are
+        created while holding a lock, so queries can run in several threads."""
+        if field not in self.postings:
+            with self.lock:
+                if field not in self.postings:
+                    self._create(field)
+        return self.postings[field]
+
+    def _create(self, field):
+        t0 = time.time()
+        term = Term(field, '=', '')
+        term.semcor = self.semcor
+        index = {}
+        for semcor_file in self.semcor.files:
+            for wf in semcor_file.forms:
+                for value in term.values(wf):
+                    if value is not None:
+                        index.setdefault(value, []).append(wf)
+        self.build_times[field] = time.time() - t0
+        self.postings[field] = index
+
+    def all_forms(self):
+        return chain.from_iterable(f.forms for f in self.semcor.files)
+
+
+class Plan(object):
+
+    """The plan for a Query.
+
+    Instance variables:
+
+    query : Query
+
+    access : tuple
+       How candidates are found, ('index', term, keys) for a term on an indexed
+       field, ('within', scope) for the WordForms in the scopes found by the
+       inner plan and ('scan',) for all WordForms.
+
+    estimate : integer
+       The estimated number of candidates.
+
+    alternatives : list of pairs
+       The other access paths that were considered, with their estimates.
+
+    filters : list of pairs
+       The terms checked on each candidate with their estimates, in the order
+       in which they are checked.
+
+    inner : Plan or None
+       The plan for the inner query.
+
+    """
+
+    def __init__(self, query, index):
+        t0 = time.time()
+        self.query = query
+        self.index = index
+        for term in query.terms:
+            if term.field in ANNOTATED and index.semcor.annotations is None:
+                raise QueryError("field %s needs an annotation layer, none is loaded"
+                                 % term.field)
+            term.semcor = index.semcor
+        self.inner = Plan(query.inner, index) if query.inner is not None else None
+        paths = [(index.forms, ('scan',))]
+        if self.inner is not None:
+            estimate = int(self.inner.estimate * index.scope_sizes[query.scope])
+            paths.append((estimate, ('within', query.scope)))
+        estimates = {}
+        # terms with an index that exists are estimated first, an index that
+        # does not exist yet is only created if the best access path so far
+        # would look at more than a fraction BUILD_FRACTION of all WordForms
+        terms = sorted(query.terms, key=lambda term: not index.has(term.field))
+        for term in terms:
+            best = min(path[0] for path in paths)
+            if index.has(term.field) or (term.field in INDEXED
+                                         and best > index.forms * BUILD_FRACTION):
+                postings = index.get(term.field)
+                keys = term.keys(postings)
+                if keys is None:
+                    estimates[term] = index.forms - len(postings.get(term.value, []))
+                else:
+                    estimates[term] = sum(len(postings[key]) for key in keys)
+                    paths.append((estimates[term], ('index', term, keys)))
+            else:
+                estimates[term] = index.forms // 2
+        paths.sort(key=lambda path: path[0])
+        self.estimate, self.access = paths[0]
+        self.alternatives = [(path[1], path[0]) for path in paths[1:]]
+        chosen = self.access[1] if self.access[0] == 'index' else None
+        self.filters = sorted([(term, estimates[term]) for term in query.terms
+                               if term is not chosen], key=lambda pair: pair[1])
+        self.planning_time = time.time() - t0
+        self.candidates = 0
+        self.results = 0
+
+    def execute(self):
+        """Yield the WordForms that match the query."""
+        containers = None
+        if self.inner is not None:
+            key = scope_function(self.query.scope)
+            containers = set(key(wf) for wf in self.inner.execute())
+        filters = [term.matches for term, estimate in self.filters]
+        if containers is not None and self.access[0] != 'within':
+            filters.append(lambda wf: key(wf) in containers)
+        self.candidates = self.results = 0
+        for wf in self.candidates_iter(containers):
+            self.candidates += 1
+            for matches in filters:
+                if not matches(wf):
+                    break
+            else:
+                self.results += 1
+                yield wf
+
+    def candidates_iter(self, containers):
+        kind = self.access[0]
+        if kind == 'index':
+            postings = self.index.get(self.access[1].field)
+            return chain.from_iterable(postings[key] for key in self.access[2])
+        if kind == 'within':
+            return scope_forms(self.query.scope, containers, self.index.semcor)
+        return self.index.all_forms()
+
+    def explain(self, indent=''):
+        """Return the plan as a list of lines, this should be called after the
+        plan was executed to include the number of candidates and results."""
+        lines = []
+        if self.inner is not None:
+            lines.append("%swithin %s of:" % (indent, self.query.scope))
+            lines.extend(self.inner.explain(indent + '    '))
+        lines.append("%scandidates: %s  (estimate %d, actual %d)"
+                     % (indent, describe(self.access), self.estimate, self.candidates))
+        for access, estimate in self.alternatives:
+            lines.append("%s   rejected: %s  (estimate %d)" % (indent, describe(access), estimate))
+        for term, estimate in self.filters:
+            lines.append("%scheck: %s  (estimate %d)" % (indent, term, estimate))
+        if self.inner is not None and self.access[0] != 'within':
+            lines.append("%scheck: in %s of inner results" % (indent, self.query.scope))
+        lines.append("%sresults: %d" % (indent, self.results))
+        return lines
+
+
+def describe(access):
+    if access[0] == 'index':
+        term, keys = access[1], access[2]
+        if term.op == '=':
+            return "index %s" % term
+        return "index %s (%d keys)" % (term, len(keys))
+    if access[0] == 'within':
+        return "word forms in %ss of inner results" % access[1]
+    return "all word forms"
+
+
+def scope_function(scope):
+    """Return a function from a WordForm to its sentence, paragraph or file."""
+    if scope == 'sentence':
+        return lambda wf: wf.sent
+    if scope == 'paragraph':
+        return lambda wf: wf.para
+    return lambda wf: wf.sent.fname
+
+
+def document_order(scope, semcor):
+    """Return a function that gives the position of a sentence, paragraph or file
+    in the loaded corpus, to be used as a sort key."""
+    if scope == 'sentence':
+        return semcor.sentence_number
+    if scope == 'paragraph':
+        return lambda para: semcor.sentence_number(para.sentences[0])
+    return lambda fname: semcor.token_table.positions[fname]
+
+
+def scope_forms(scope, containers, semcor):
+    """Yield the WordForms with a sense in the containers, in document order."""
+    containers = sorted(containers, key=document_order(scope, semcor))
+    if scope == 'file':
+        for fname in containers:
+            for wf in semcor.file_idx[fname].forms:
+                yield wf
+        return
+    for container in containers:
+        sentences = [container] if scope == 'sentence' else container.sentences
+        for sentence in sentences:
+            for element in sentence.elements:
+                if element.is_word_form() and element.has_sense():
+                    yield element
+
+
+def run(semcor, text):
+    """Return the Plan for the query text, the plan can be executed with
+    Plan.execute()."""
+    query = text if isinstance(text, Query) else parse(text)
+    return Plan(query, semcor.get_query_index())
+
+
+def explain(semcor, text):
+    """Plan and execute the query and return the plan and the timing as a
+    string."""
+    index = semcor.get_query_index()
+    existing = set(index.build_times)
+    plan = run(semcor, text)
+    t0 = time.time()
+    for wf in plan.execute():
+        pass
+    execution_time = time.time() - t0
+    lines = ["query: %s" % plan.query]
+    lines.extend(plan.explain())
+    built = ', '.join("%s %.3fs" % (field, seconds) for field, seconds
+                      in sorted(index.build_times.items()) if field not in existing)
+    lines.append("indexes created: %s" % (built or 'none'))
+    lines.append("planning: %.3fs  execution: %.3fs" % (plan.planning_time, execution_time))
+    return '\n'.join(lines)
+
+
+def result_line(wf):
+    synset = wf.synset
+    return '\t'.join([wf.sent.fname, wf.sid, str(wf.position), wf.text, wf.pos,
+                      wf.sense(), '-' if synset is None else synset.ssid])
+
+
+if __name__ == '__main__':
+
+    options, args = getopt.gnu_getopt(sys.argv[1:], 'n:', ['explain', 'count'])
+    options = { name: value for (name, value) in options }
+    maxfiles = int(options.get('-n', 999))
+
+    if not args:
+        print(__doc__)
+        sys.exit()
+    queries = args if args != ['-'] else [line for line in sys.stdin if line.strip()]
+    # the queries are parsed before loading so errors are reported right away
+    try:
+        parsed = [parse(text) for text in queries]
+    except QueryError as e:
+        sys.exit("Error: %s" % e)
+
+    from semcor import Semcor
+    semcor = Semcor(maxfiles)
+    for query in parsed:
+        if query.explain or '--explain' in options:
+            print(explain(semcor, query))
+        elif '--count' in options:
+            print("%d\t%s" % (sum(1 for wf in run(semcor, query).execute()), query))
+        else:
+            for wf in run(semcor, query).execute():
+                print(result_line(wf))
+        print()
@@ -0,0 +1,99 @@
+"""sampling.py
+
+Sampling and paging for lists of WordForms.
+
+Lists of WordForms in the indexes can be very long for frequent lemmas like "be"
+or "say", and they are shared by all code that uses the indexes. The classes
+here take a random sample or a page of results without copying the list and
+without changing it.
+
+Usage:
+
+>>> sample = Sample(sc.lemma_idx['say'], seed=42)
+>>> sample.get(0, 10)
+>>> pager = Pager(sc.lemma_idx['say'], page_size=10, seed=42)
+>>> pager.next_page()
+>>> pager.next_page()
+
+Samples with the same seed over the same list are always the same and the first
+n elements of a sample are the same no matter how many elements are drawn.
+
+"""
+
+import random
+
+
+class Sample(object):
+
+    """A random ordering of a list, created lazily with a Fisher-Yates shuffle
+    that only stores the positions that were drawn and the positions that were
+    swapped, so getting the first k elements of the ordering takes time and
+    space proportional to k and not to the length of the list.
+
+    Instance variables:
+
+    items : list
+       The list that is sampled, it is never changed.
+
+    order : list of integers
+       Positions in items in the order in which they were drawn.
+
+    """
+
+    def __init__(self, items, seed=0):
+        self.items = items
+        self.order = []
+        self._random = random.Random(seed)
+        self._swapped = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def _draw(self, n):
+        """Extend the ordering until it has n positions or until all positions
+        have been drawn."""
+        size = len(self.items)
+        while len(self.order) < min(n, size):
+            i = len(self.order)
+            j = i + self._random.randrange(size - i)
+            self.order.append(self._swapped.get(j, j))
+            self._swapped[j] = self._swapped.pop(i, i)
+
+    def get(self, start, end):
+        """Return the elements from start up to end in the random ordering."""
+        self._draw(end)
+        return [self.items[i] for i in self.order[start:end]]
+
+
+class Pager(object):
+
+    """A cursor over a list that hands out pages of the list, either in the order
+    of the list or, when a seed is given, in a random but reproducible order.
+
+    Instance variables:
+
+    items : list or Sample
+    page_size : integer
+    cursor : integer
+       The position of the first element of the next page.
+
+    """
+
+    def __init__(self, items, page_size=10, seed=None):
+        self.items = items if seed is None else Sample(items, seed)
+        self.page_size = page_size
+        self.cursor = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def has_more(self):
+        return self.cursor < len(self.items)
+
+    def next_page(self):
+        """Return the next page and move the cursor to the page after it."""
+        start = self.cursor
+        self.cursor = min(len(self.items), start + self.page_size)
+        if isinstance(self.items, Sample):
+            return self.items.get(start, self.cursor)
+        return self.items[start:self.cursor]
@@ -19,7 +19,16 @@ Basic usage as an imported module:
 >>> sc = Semcor(10)
 
 The argument sets a limit to the number of files to load, without it all files
-are loaded.
+are loaded. Files can be added to or removed from a loaded instance, which
+updates all indexes without reloading the other files:
+
+>>> sc.add_files(['br-e22', 'br-j03'])
+>>> sc.remove_files(['br-a01'])
+
+An instance that is shared by several threads should be frozen, which makes
+the indexes read-only:
+
+>>> sc.freeze()
 
 If sources have not yet been compiled you first need to do this:
 
@@ -36,15 +45,31 @@ $ python semcor.py --export-nouns FILENAME
 
 Exports all nouns with their synset and basic types to FILENAME.
 
+$ python semcor.py --compile-sqlite (-n MAXFILES)
+
+Writes the compiled files to an SQLite database, see database.py.
+
+Compiled files are shared by all Python versions, see compiled.py for the
+format and for how to convert files compiled by earlier versions of this code.
+
 """
 
 from __future__ import print_function
 
-import os, sys, bs4, pickle, time, glob, getopt
+import os, gc, sys, time, glob, getopt, hashlib
+from array import array
 
-import parser
-from utils import pickle_file_name, Synset, keep_time
+import compiled
+from utils import Synset, keep_time
+from objects import Paragraph, Sentence, WordForm, Punctuation
 from index import create_lemma_index, IndexedWordForms
+from concordance import Concordance
+from vocab import load_vocabularies
+from lexicon import Lexicon, load_lexicon
+import query
+from tokens import TokenTable, load_token_table
+from summaries import SenseCounts, LemmaSummaries, load_summaries
+import annotations
 
 
 SEMCOR = '../data/semcor3.0'
@@ -52,23 +77,59 @@ SEMCOR = '../data/semcor3.0'
 # The files are all the files in the brown1 and brown2 subcorpora of semcor. The
 # brownv subcorpus, which has verbs only, is not included. Files are sorted in
 # lexicographic order with the subcorpus as part of the path so brown1/br-j03
-# will precede brown2/br-e22.
-SEMCOR_FILES = sorted(glob.glob(os.path.join(SEMCOR, 'brown[12]/tagfiles/*')))
+# will precede brown2/br-e22. The list is created by semcor_files() when it is
+# first needed, SEMCOR_FILES can still be imported from this module.
+_semcor_files = None
 
 # Mappings to wordnet synsets
 MAPPINGS = '../data/corelex/corelex-3.1-semcor_lemma2synset.txt'
 
 
+def semcor_files():
+    """Return the list of Semcor files, the directory is searched only once."""
+    global _semcor_files
+    if _semcor_files is None:
+        _semcor_files = sorted(glob.glob(os.path.join(SEMCOR, 'brown[12]/tagfiles/*')))
+    return _semcor_files
+
+
+def __getattr__(name):
+    # for SEMCOR_FILES, this works with Python 3.7 and later
+    if name == 'SEMCOR_FILES':
+        return semcor_files()
+    raise AttributeError("module %s has no attribute %s" % (__name__, name))
+
+
 @keep_time
 def compile_semcor(maxfiles=999):
     """Compile semcor files, default is to compile all files but maxfiles can be
     used to restrict the number. Compiling a file means reading it, creating a
-    SemcorFile instance for it and saving it to disk as a pickle file. Loading
+    SemcorFile instance for it and saving it to disk as a pickle file in the
+    directory for compiled files, which is shared by all Python versions. Loading
     from compiled sources with Python 2 is about 2-3 times faster then loading
     and parsing semcor source files, on Python 3 the speed up is a factor 10
-    larger, although it takes a bit longer to compile."""
+    larger, although it takes a bit longer to compile. The synsets from the
+    mappings file are compiled into a SynsetTable and each WordForm is bound to
+    its synset in that table. The vocabularies are extended with the strings
+    from the compiled files and the lexicon is created from the synsets and the
+    vocabularies. The token table gives all tokens and sentences of the
+    compiled files a global identifier (see tokens.py) and the sense summaries
+    of all lemmas are counted (see summaries.py). The files are checked
+    for annotation problems while they are compiled, the issues found are
+    stored in the report of validate.py. Collocations saved by collocations.py
+    are removed since they were counted from the files compiled before."""
+    # the parser is imported here because it needs BeautifulSoup, which takes
+    # longer to import than all other modules together
+    import parser
+    import validate
+    synsets = SynsetTable()
+    synsets.pickle()
+    vocab = load_vocabularies()
+    tokens = TokenTable()
+    sense_counts = SenseCounts()
+    entries = {}
     count = 0
-    for fname in SEMCOR_FILES:
+    for fname in semcor_files():
         count += 1
         if count > maxfiles:
             break
@@ -77,7 +138,120 @@ def compile_semcor(maxfiles=999):
         parser.parse(semcor_file)
         semcor_file.collect_forms()
         semcor_file.index()
+        semcor_file.compile_sentences()
+        semcor_file.bind_synsets(synsets)
         semcor_file.pickle()
+        vocab.add_file(semcor_file)
+        tokens.add_file(semcor_file)
+        sense_counts.add_file(semcor_file)
+        entries[fname] = validate.make_entry(semcor_file, synsets)
+    vocab.pickle()
+    tokens.pickle()
+    Lexicon(synsets, vocab).pickle()
+    LemmaSummaries(sense_counts, synsets).pickle()
+    validate.update_report(entries, synsets)
+    # collocations counted from the files compiled before are out of date
+    for path in glob.glob(compiled.file_name('collocations-*')):
+        os.remove(path)
+    print("Found %d issues in %d files, run validate.py for a report"
+          % (sum(len(e['issues']) for e in entries.values()), len(entries)))
+
+
+def read_mappings():
+    """Read the mappings from lemmas and senses to synsets from the MAPPINGS file
+    and return them as a dictionary, see the synset_idx variable on Semcor for a
+    description of the dictionary."""
+    synset_idx = {}
+    with open(MAPPINGS) as fh:
+        content = fh.read().split(os.linesep + os.linesep)
+        for lemma_data in content:
+            lines = lemma_data.split(os.linesep)
+            lemma = lines.pop(0)
+            synset_idx[lemma] = {}
+            for i in range(0, len(lines), 6):
+                sense = lines[i].strip()
+                ss = Synset(lines[i:i+6])
+                synset_idx[lemma][sense] = ss
+    return synset_idx
+
+
+def mappings_fingerprint():
+    """Return a digest of the content of the MAPPINGS file, used to check whether
+    the compiled synsets are still valid. The content is used rather than the
+    modification time so that a fresh clone or a copy of the compiled files is
+    not taken to be out of date."""
+    with open(MAPPINGS, 'rb') as fh:
+        return hashlib.md5(fh.read()).hexdigest()
+
+
+def load_synset_table():
+    """Return the compiled SynsetTable, or a SynsetTable created from MAPPINGS if
+    the compiled table does not exist or if the mappings file has changed since
+    it was compiled."""
+    try:
+        synsets = compiled.read(compiled.file_name('synsets'), 'synsets')
+        if synsets.fingerprint == mappings_fingerprint():
+            return synsets
+        print("Warning: %s changed since compiling, recompile to speed up loading"
+              % MAPPINGS)
+    except IOError:
+        print("Warning: no compiled synsets, recompile to speed up loading")
+    return SynsetTable()
+
+
+class SynsetTable(object):
+
+    """The synsets from the MAPPINGS file. WordForms refer to their synset with
+    the position of the synset in this table, these positions are assigned when
+    the table is created and they are stored on the WordForms when compiling.
+
+    Instance variables:
+
+    fingerprint : string
+       Digest of the content of the MAPPINGS file that the table was created
+       from.
+
+    synsets : list of Synsets
+
+    synset_idx : dict (string -> dict (string -> Synset))
+       Same as the synset_idx variable on Semcor, the Synset instances are the
+       ones in the synsets list.
+
+    id_idx : dict (string -> dict (string -> int))
+       Like synset_idx, but with the position in the synsets list as values.
+       This is only needed for binding WordForms and it is not pickled.
+
+    """
+
+    def __init__(self):
+        self.fingerprint = mappings_fingerprint()
+        self.synset_idx = read_mappings()
+        self.synsets = [self.synset_idx[lemma][sense] for lemma, sense in self._senses()]
+        self.id_idx = None
+
+    def _senses(self):
+        """Return all lemma-sense pairs in the order of the synsets list."""
+        return [(lemma, sense)
+                for lemma in sorted(self.synset_idx)
+                for sense in sorted(self.synset_idx[lemma])]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['id_idx'] = None
+        return state
+
+    def get_id(self, lemma, sense):
+        """Return the position in the table of the synset for the lemma and the
+        sense, where the sense is a lexical sense like '2:38:00::', return None if
+        there is no such synset."""
+        if self.id_idx is None:
+            self.id_idx = {}
+            for number, (lemma_, sense_) in enumerate(self._senses()):
+                self.id_idx.setdefault(lemma_, {})[sense_] = number
+        return self.id_idx.get(lemma, {}).get(lemma + '%' + sense)
+
+    def pickle(self):
+        compiled.write(compiled.file_name('synsets'), self, 'synsets')
 
 
 class Semcor(object):
@@ -125,11 +299,48 @@ class Semcor(object):
        a concatenation of the lemma, the percentage sign and the lexical sense.
        The content for this index is read from the MAPPINGS file.
 
+    synsets : SynsetTable
+       The table of all synsets that the synset attribute of WordForms is taken
+       from, this is loaded from the compiled synsets.
+
+    vocab : Vocabularies
+       Integer identifiers for lemmas, senses, synsets, part-of-speech tags and
+       basic types, loaded from the compiled vocabularies (see vocab.py).
+
+    lexicon : Lexicon
+       Sorted lemmas and synset descriptions for lookups by prefix, glob pattern
+       and edit distance (see lexicon.py).
+
+    query_index : QueryIndex or None
+       The indexes used for queries, created by the first query and dropped
+       when files are added or removed (see query.py).
+
+    summaries : LemmaSummaries or None
+       The sense distribution of each lemma in the loaded files, created by
+       get_summaries() and dropped when files are added or removed (see
+       summaries.py).
+
+    token_table : TokenTable
+       The first global token identifier and sentence number of each compiled
+       file, used by token(), tokens(), token_id() and sentence().
+
+    annotations : AnnotationLayer or None
+       Annotations from an external tool aligned to the tokens, loaded with
+       load_annotations() (see annotations.py).
+
+    frozen : boolean
+       True after freeze() was called, a frozen instance has tuples instead of
+       lists in its indexes and files cannot be added or removed.
+
     noun_idx : IndexedWordForms
        An IndexedWordForms instance with all nominals, but including a WordForm
        only if the document that the WordForm occurs in has another WordForm
        with the same lemma but a different sense.
 
+    concordance : Concordance
+       Creates KWIC lines for WordForms, using the character offsets that were
+       stored with the sentences at compile time.
+
     """
 
     # TODO: that noun_idx is a bit weird since it has the weird restriction of
@@ -150,36 +361,60 @@ class Semcor(object):
         self._load_common_nouns_indexed_on_basic_types()
 
     def _initialize_attributes(self):
-        self.fnames = SEMCOR_FILES
-        self.fcount = len(SEMCOR_FILES)
+        self.fnames = semcor_files()
+        self.fcount = len(self.fnames)
         self.files = []
         self.loaded = 0
         self.lemma_idx = {}
         self.file_idx = {}
         self.sent_idx = {}
         self.synset_idx = {}
+        self.synsets = None
+        self.vocab = None
+        self.lexicon = None
+        self.query_index = None
+        self.summaries = None
+        self.token_table = None
+        self.annotations = None
+        self.frozen = False
         self.noun_idx = None
+        self.concordance = Concordance(self)
 
     def _load(self, maxfiles=999):
         """Load the compiled semcor files, but no more than specified by
-        maxfiles. The default is to load all files."""
+        maxfiles. The default is to load all files. Files are read by a pool of
+        threads and each file is added to the indexes as soon as it is loaded.
+        The garbage collector is switched off while loading, otherwise it would
+        repeatedly go through all objects loaded so far."""
         t0 = time.time()
         self.files = []
-        self.loaded = self.fcount if maxfiles > self.fcount else maxfiles
-        print('Loading compiled files...')
-        for fname in self.fnames[:maxfiles]:
-            pickle_file = pickle_file_name(fname)
-            with open(pickle_file, 'rb') as fh:
-                self.files.append(pickle.load(fh))
-        t1 = time.time()
-        self._index()
+        self.lemma_idx = {}
+        self.file_idx = {}
+        paths = [compiled.file_name(fname) for fname in self.fnames[:maxfiles]]
+        self.loaded = len(paths)
+        # progress is only shown on a terminal, not when output is redirected
+        progress = sys.stdout.isatty()
+        if not progress:
+            print('Loading compiled files...', end='')
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for count, semcor_file in enumerate(compiled.read_many(paths, 'file'), 1):
+                self.files.append(semcor_file)
+                self._index_file(semcor_file)
+                if progress:
+                    print("\rLoading compiled files... %d/%d" % (count, len(paths)), end='')
+                    sys.stdout.flush()
+            self._index_tokens()
+            t1 = time.time()
+            self._load_mappings()
+        finally:
+            if gc_enabled:
+                gc.enable()
         t2 = time.time()
-        self._load_mappings()
-        t3 = time.time()
-        print("\nTime elapsed:")
-        print("   loading files:    %4.2f seconds" % (t1 - t0))
-        print("   indexing files:   %4.2f seconds" % (t2 - t1))
-        print("   loading mappings: %4.2f seconds" % (t3 - t2))
+        print("\n\nTime elapsed:")
+        print("   loading and indexing files: %4.2f seconds" % (t1 - t0))
+        print("   loading mappings:           %4.2f seconds" % (t2 - t1))
         print()
 
     def _load_common_nouns_indexed_on_basic_types(self):
@@ -195,30 +430,194 @@ class Semcor(object):
         self.lemma_idx = {}
         self.file_idx = {}
         for semcor_file in self.files:
-            self.file_idx[os.path.basename(semcor_file.fname)] = semcor_file
-            for form in semcor_file.forms:
-                self.lemma_idx.setdefault(form.lemma,[]).append(form)
+            self._index_file(semcor_file)
+
+    def _index_file(self, semcor_file):
+        """Add the forms of a file to the indexes."""
+        self.file_idx[os.path.basename(semcor_file.fname)] = semcor_file
+        for form in semcor_file.forms:
+            self.lemma_idx.setdefault(form.lemma,[]).append(form)
+
+    def freeze(self):
+        """Make the instance read-only so that it can be shared by threads that
+        run queries. All lists of files, sentences and WordForms in the indexes
+        are replaced with tuples and the query indexes are set up, after this
+        files cannot be added or removed. Returns the instance."""
+        if self.frozen:
+            return self
+        self.files = tuple(self.files)
+        for semcor_file in self.files:
+            semcor_file.freeze()
+        self.lemma_idx = dict((lemma, tuple(wfs)) for lemma, wfs in self.lemma_idx.items())
+        self.noun_idx.freeze()
+        self.query_index = None
+        self.get_query_index()
+        self.get_summaries()
+        self.frozen = True
+        return self
+
+    def _check_not_frozen(self):
+        if self.frozen:
+            raise RuntimeError("files cannot be added to or removed from a frozen Semcor")
+
+    def add_files(self, fnames):
+        """Load the compiled files for fnames, which can be paths from SEMCOR_FILES
+        or base names, and add them to the files and indexes. Files that are
+        already loaded are skipped. The files list and the lists in lemma_idx
+        stay in the order of SEMCOR_FILES. The sentence index is not updated,
+        use create_sentence_index() for that."""
+        self._check_not_frozen()
+        paths = [compiled.file_name(path) for path in self._paths(fnames)
+                 if os.path.basename(path) not in self.file_idx]
+        order = dict((os.path.basename(path), n) for n, path in enumerate(self.fnames))
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            lemmas = set()
+            nouns = []
+            for semcor_file in compiled.read_many(paths, 'file'):
+                semcor_file.bind_synsets(self.synsets)
+                self.files.append(semcor_file)
+                self._index_file(semcor_file)
+                lemmas.update(semcor_file.lemma_idx)
+                nouns.extend(semcor_file.get_common_nouns())
+            self.files.sort(key=lambda f: order[os.path.basename(f.fname)])
+            for lemma in lemmas:
+                self.lemma_idx[lemma].sort(
+                    key=lambda wf: (order[wf.sent.fname], wf.sent.number, wf.position))
+            self.noun_idx.add_wordforms(nouns)
+            self.query_index = None
+            self.summaries = None
+            self._index_tokens()
+        finally:
+            if gc_enabled:
+                gc.enable()
+        self.loaded = len(self.files)
+
+    def remove_files(self, fnames):
+        """Remove the files for fnames, which can be paths or base names, from the
+        files and indexes. Files that are not loaded are skipped."""
+        self._check_not_frozen()
+        removed = set(os.path.basename(path) for path in self._paths(fnames))
+        removed.intersection_update(self.file_idx)
+        if not removed:
+            return
+        lemmas = set()
+        for fname in removed:
+            lemmas.update(self.file_idx.pop(fname).lemma_idx)
+            self.concordance.documents.pop(fname, None)
+        self.files = [f for f in self.files if os.path.basename(f.fname) not in removed]
+        for lemma in lemmas:
+            wfs = [wf for wf in self.lemma_idx[lemma] if wf.sent.fname not in removed]
+            if wfs:
+                self.lemma_idx[lemma] = wfs
+            else:
+                del self.lemma_idx[lemma]
+        self.noun_idx.remove_files(removed)
+        self.query_index = None
+        self.summaries = None
+        self._index_tokens()
+        self.loaded = len(self.files)
+
+    def _paths(self, fnames):
+        """Return the paths in SEMCOR_FILES for file names that can be paths or
+        base names, raises a ValueError for unknown names."""
+        paths = dict((os.path.basename(path), path) for path in self.fnames)
+        try:
+            return [paths[os.path.basename(fname)] for fname in fnames]
+        except KeyError as e:
+            raise ValueError("unknown Semcor file %s" % e.args[0])
 
     def _load_mappings(self):
-        """Load the mappings from lemmas and senses to synsets."""
-        # TODO: consider compiling these mappings using pickle
-        self.synset_idx = {}
-        with open(MAPPINGS) as fh:
-            content = fh.read().split(os.linesep + os.linesep)
-            for lemma_data in content:
-                lines = lemma_data.split(os.linesep)
-                lemma = lines.pop(0)
-                self.synset_idx[lemma] = {}
-                for i in range(0, len(lines), 6):
-                    sense = lines[i].strip()
-                    ss = Synset(lines[i:i+6])
-                    self.synset_idx[lemma][sense] = ss
-        self._add_synsets_to_wordforms()
-
-    def _add_synsets_to_wordforms(self):
-        for lemma in self.lemma_idx:
-            for wf in self.lemma_idx[lemma]:
-                wf.synset = self.get_synset_for_lemma(lemma, wf.lexsn)
+        """Load the mappings from lemmas and senses to synsets and bind the
+        WordForms of the loaded files to the SynsetTable."""
+        self.synsets = load_synset_table()
+        self.synset_idx = self.synsets.synset_idx
+        self.vocab = load_vocabularies()
+        self.lexicon = load_lexicon(self.synsets, self.vocab)
+        for semcor_file in self.files:
+            semcor_file.bind_synsets(self.synsets)
+
+    def _index_tokens(self):
+        """Create the list of all tokens indexed on global token identifiers and
+        the list of Sentences indexed on global sentence number, with None for
+        tokens and sentences in files that are not loaded."""
+        if self.token_table is None or not all(map(self.token_table.covers, self.files)):
+            self.token_table = load_token_table(self.files, self.fnames)
+        table = self.token_table
+        self._tokens = [None] * table.token_starts[-1]
+        self._sentences = [None] * table.sentence_starts[-1]
+        for semcor_file in self.files:
+            n = table.positions[os.path.basename(semcor_file.fname)]
+            token = table.token_starts[n]
+            first = table.sentence_starts[n]
+            for sentence in semcor_file.get_sentences():
+                number = first + sentence.number
+                size = len(sentence.elements)
+                self._sentences[number] = sentence
+                self._tokens[token:token + size] = sentence.elements
+                token += size
+
+    def load_annotations(self, name):
+        """Load the annotation layer saved under name, it is used by queries
+        with the deprel and head fields."""
+        if self.frozen:
+            raise RuntimeError("annotations cannot be loaded into a frozen Semcor")
+        self.annotations = annotations.load_layer(name, self.token_table)
+        self.query_index = None
+
+    def token(self, identifier):
+        """Return the WordForm or Punctuation with the global token identifier,
+        or None if it is in a file that is not loaded."""
+        return self._tokens[identifier]
+
+    def tokens(self, identifiers):
+        """Return a list with the WordForm or Punctuation for each identifier in a
+        sequence of global token identifiers, with None for tokens in files that
+        are not loaded."""
+        return list(map(self._tokens.__getitem__, identifiers))
+
+    def token_id(self, wf):
+        """Return the global token identifier of a WordForm."""
+        return self.get_token_id(wf.sent.fname, wf.sent.number, wf.position)
+
+    def token_ids(self, wfs):
+        """Return an array with the global token identifiers of the WordForms."""
+        positions = self.token_table.positions
+        sentence_starts = self.token_table.sentence_starts
+        starts = self.token_table.sentence_tokens
+        return array('i', [starts[sentence_starts[positions[wf.sent.fname]] + wf.sent.number]
+                           + wf.position for wf in wfs])
+
+    def get_token_id(self, fname, sentence, position):
+        """Return the global token identifier for the element at position in a
+        sentence of the file with base name fname. The sentence is either its
+        number in the file or its sentence identifier, which is a string. Returns
+        None if the file is not loaded or the sentence or position does not
+        exist."""
+        semcor_file = self.file_idx.get(fname)
+        if semcor_file is None:
+            return None
+        if not isinstance(sentence, int):
+            sentence = semcor_file.sid_idx.get(sentence)
+            if sentence is None:
+                return None
+        if not 0 <= sentence < len(semcor_file.sentences) \
+           or not 0 <= position < len(semcor_file.sentences[sentence].elements):
+            return None
+        table = self.token_table
+        n = table.positions[fname]
+        return table.sentence_tokens[table.sentence_starts[n] + sentence] + position
+
+    def sentence(self, number):
+        """Return the Sentence with the global sentence number, or None if it is in
+        a file that is not loaded."""
+        return self._sentences[number]
+
+    def sentence_number(self, sentence):
+        """Return the global number of a Sentence."""
+        n = self.token_table.positions[sentence.fname]
+        return self.token_table.sentence_starts[n] + sentence.number
 
     def __str__(self):
         return "<Semcor instance with %d files>" % self.loaded
@@ -242,12 +641,47 @@ class Semcor(object):
     def get_file(self, fname):
         return self.file_idx.get(fname)
 
+    def get_sentence(self, fname, sid):
+        """Return the sentence with identifier sid from the file with base name
+        fname, return None if there is no such sentence."""
+        semcor_file = self.file_idx.get(fname)
+        return None if semcor_file is None else semcor_file.get_sentence(sid)
+
+    def get_context(self, fname, sid, n=2):
+        """Return the sentence with identifier sid from the file with base name
+        fname, together with up to n sentences on each side. Returns an empty
+        list if the sentence does not exist."""
+        sentence = self.get_sentence(fname, sid)
+        if sentence is None:
+            return []
+        return self.file_idx[fname].get_context(sentence, n)
+
     def get_synset_for_lemma(self, lemma, sense):
         """Get the synset associated with the lemma and the sense. An example
         lemma-sense combination is 'walk' with '2:38:00::'. Returns None if no
         such synset was found."""
         return self.synset_idx.get(lemma, {}).get(lemma + '%' + sense)
 
+    def get_query_index(self):
+        if self.query_index is None:
+            self.query_index = query.QueryIndex(self)
+        return self.query_index
+
+    def get_summaries(self):
+        """Return the LemmaSummaries for the loaded files."""
+        if self.summaries is None:
+            self.summaries = load_summaries(self)
+        return self.summaries
+
+    def query(self, text):
+        """Return an iterator over the WordForms that match the query text, see
+        query.py for the query language. Raises a QueryError for bad queries."""
+        return query.run(self, text).execute()
+
+    def explain(self, text):
+        """Run the query and return its plan and timing as a string."""
+        return query.explain(self, text)
+
     def get_senses(self):
         senses = set()
         for scfile in self.files:
@@ -297,6 +731,14 @@ class SemcorFile(object):
 
     paragraphs : list of Paragraphs
 
+    sentences : list of Sentences
+       All sentences in document order, the index of a sentence in this list is
+       the same as the number attribute on the sentence.
+
+    sid_idx : dict { string -> int }
+       Dictionary indexed on sentence identifiers where the value is the index
+       of the sentence in the sentences list.
+
     forms : list of WordForms
        All the WordForms in the document that have a sense.
 
@@ -304,13 +746,24 @@ class SemcorFile(object):
        Dictionary indexed on lemmas where the value is a list of WordForms that
        are associated with the lemma.
 
+    synsets_fingerprint : string
+       The fingerprint of the SynsetTable that the WordForms were bound to.
+
+    unexpected : list of pairs
+       The sentence identifier and the tag name of each element in a sentence
+       that is not a wf or punc tag, these elements are skipped by the parser.
+
     """
 
     def __init__(self, fname):
         self.fname = fname
         self.paragraphs = []
+        self.sentences = []
+        self.sid_idx = {}
         self.forms = []
         self.lemma_idx = {}
+        self.synsets_fingerprint = None
+        self.unexpected = []
 
     def __str__(self):
         # just print the subcorpus and the basename
@@ -318,6 +771,131 @@ class SemcorFile(object):
         basename = os.path.basename(self.fname)
         return "<SemcoreFile %s %s>" % (subcorpus, basename)
 
+    def __getstate__(self):
+        """Return the state for pickling. The document is stored as flat columns,
+        with the paragraphs and sentences as numbers of sentences and elements
+        and with all strings in a table, so pickling does not need to go
+        through the references between paragraphs, sentences and elements. The
+        references, the forms and the indexes are created again when the file
+        is unpickled."""
+        strings = {None: -1}
+        def string(s):
+            identifier = strings.get(s)
+            if identifier is None:
+                identifier = strings[s] = len(strings) - 1
+            return identifier
+        pids, paragraph_sizes = array('i'), array('i')
+        sids, sentence_sizes = array('i'), array('i')
+        kinds, elements, synsets = array('b'), array('i'), array('i')
+        for para in self.paragraphs:
+            pids.append(string(para.pid))
+            paragraph_sizes.append(len(para.sentences))
+            for sentence in para.sentences:
+                sids.append(string(sentence.sid))
+                sentence_sizes.append(len(sentence.elements))
+                for e in sentence.elements:
+                    if e.is_word_form():
+                        kinds.append(1)
+                        elements.extend([string(e.text), string(e.pos), string(e.rdf),
+                                         string(e.pn), string(e.lemma), string(e.wnsn),
+                                         string(e.lexsn), string(' '.join(e.keys))])
+                        synsets.append(-1 if e.synset_id is None else e.synset_id)
+                    else:
+                        kinds.append(0)
+                        elements.append(string(e.text))
+        table = [None] * (len(strings) - 1)
+        for s, identifier in strings.items():
+            if identifier >= 0:
+                table[identifier] = s
+        return {'fname': self.fname, 'synsets_fingerprint': self.synsets_fingerprint,
+                'strings': table, 'pids': pids, 'paragraph_sizes': paragraph_sizes,
+                'sids': sids, 'sentence_sizes': sentence_sizes, 'kinds': kinds,
+                'elements': elements, 'synsets': synsets,
+                'unexpected': list(self.unexpected)}
+
+    def __setstate__(self, state):
+        if 'strings' not in state:
+            # pickled before the flat state was introduced
+            self.unexpected = []
+            self.__dict__.update(state)
+            return
+        self.fname = state['fname']
+        self.synsets_fingerprint = state['synsets_fingerprint']
+        # files compiled before unexpected elements were kept have none
+        self.unexpected = state.get('unexpected', [])
+        self.paragraphs = []
+        self.sentences = []
+        self.sid_idx = {}
+        self.forms = []
+        self.lemma_idx = {}
+        strings = state['strings'] + [None]
+        values = [strings[i] for i in state['elements']]
+        keys = dict((s, tuple(s.split())) for s in strings if s is not None)
+        synsets = state['synsets']
+        kinds = state['kinds']
+        sids = state['sids']
+        sentence_sizes = state['sentence_sizes']
+        fname = os.path.basename(self.fname)
+        forms = self.forms
+        lemma_idx = self.lemma_idx
+        # the forms, the indexes and the offsets are created in the same loop as
+        # the elements, which is faster than collect_forms(), index() and
+        # compile_sentences(), v, w and k are positions in values, synsets and
+        # kinds
+        v = w = k = 0
+        number = 0
+        for pid, paragraph_size in zip(state['pids'], state['paragraph_sizes']):
+            para = Paragraph(strings[pid])
+            self.paragraphs.append(para)
+            for _ in range(paragraph_size):
+                sentence = Sentence.__new__(Sentence)
+                sid = strings[sids[number]]
+                elements = []
+                offsets = array('i')
+                offset = 0
+                for position in range(sentence_sizes[number]):
+                    text = values[v]
+                    offsets.append(offset)
+                    offset += len(text) + 1
+                    if kinds[k]:
+                        wf = WordForm.__new__(WordForm)
+                        synset_id = synsets[w]
+                        wf.__dict__ = {
+                            'para': para, 'sent': sentence, 'position': position,
+                            'pid': para.pid, 'sid': sid, 'text': text,
+                            'pos': values[v + 1], 'rdf': values[v + 2], 'pn': values[v + 3],
+                            'lemma': values[v + 4], 'wnsn': values[v + 5],
+                            'lexsn': values[v + 6], 'keys': keys[values[v + 7]],
+                            'synset_id': None if synset_id < 0 else synset_id}
+                        elements.append(wf)
+                        if values[v + 5] is not None and values[v + 6] is not None:
+                            forms.append(wf)
+                            lemma_idx.setdefault(values[v + 4], []).append(wf)
+                        v += 8
+                        w += 1
+                    else:
+                        punctuation = Punctuation.__new__(Punctuation)
+                        punctuation.__dict__ = {'text': text, 'keys': ()}
+                        elements.append(punctuation)
+                        v += 1
+                    k += 1
+                sentence.__dict__ = {
+                    'fname': fname, 'para': para, 'pid': para.pid, 'sid': sid,
+                    'elements': elements, 'number': number, 'offsets': offsets,
+                    'string': ' '.join([e.text for e in elements])}
+                para.sentences.append(sentence)
+                self.sentences.append(sentence)
+                self.sid_idx.setdefault(sid, number)
+                number += 1
+
+    def freeze(self):
+        """Replace the lists of paragraphs, sentences and forms and the lists in
+        lemma_idx with tuples."""
+        self.paragraphs = tuple(self.paragraphs)
+        self.sentences = tuple(self.sentences)
+        self.forms = tuple(self.forms)
+        self.lemma_idx = dict((lemma, tuple(wfs)) for lemma, wfs in self.lemma_idx.items())
+
     def add_paragraph(self, para):
         self.paragraphs.append(para)
 
@@ -337,28 +915,63 @@ class SemcorFile(object):
         self.lemma_idx = {}
         for form in self.forms:
             self.lemma_idx.setdefault(form.lemma,[]).append(form)
-    
+
+    def compile_sentences(self):
+        """Create the list of sentences in document order and the index from
+        sentence identifiers into that list. Also store the string and token
+        offsets for each sentence, these are used for KWIC lines."""
+        self.sentences = []
+        self.sid_idx = {}
+        for para in self.paragraphs:
+            self.sentences.extend(para.sentences)
+        for number, sentence in enumerate(self.sentences):
+            self.sid_idx.setdefault(sentence.sid, number)
+            sentence.compile_offsets(number)
+
+    def bind_synsets(self, synsets):
+        """Let each WordForm look up its synset in the SynsetTable. The positions
+        of the synsets were stored when compiling, they are only computed again
+        if the file was compiled with a different table."""
+        rebind = self.synsets_fingerprint != synsets.fingerprint
+        for form in self.forms:
+            if rebind:
+                form.synset_id = synsets.get_id(form.lemma, form.lexsn)
+            form.synset_table = synsets.synsets
+        self.synsets_fingerprint = synsets.fingerprint
+
     def pickle(self):
         """Pickle the file and save it in data/compiled."""
-        pickle_file = pickle_file_name(self.fname)
-        with open(pickle_file, 'wb') as fh:
-            pickle.dump(self, fh)
+        compiled.write(compiled.file_name(self.fname), self, 'file')
 
     def get_sentence(self, sent_id):
         """Return the sentence with sid equal to sent_id or return None if no such
         sentence exists."""
-        for par in self.paragraphs:
-            for sentence in par.sentences:
-                if sentence.sid == sent_id:
-                    return sentence
-        return None
+        number = self.sid_idx.get(sent_id)
+        return None if number is None else self.sentences[number]
 
     def get_sentences(self):
         """Return a list of all sentences in the document."""
-        sentences = []
-        for para in self.paragraphs:
-            sentences.extend(para.sentences)
-        return sentences
+        return self.sentences
+
+    def get_previous_sentence(self, sentence):
+        """Return the sentence before the given sentence or None if the sentence
+        is the first one in the document."""
+        if sentence.number == 0:
+            return None
+        return self.sentences[sentence.number - 1]
+
+    def get_next_sentence(self, sentence):
+        """Return the sentence after the given sentence or None if the sentence
+        is the last one in the document."""
+        if sentence.number + 1 >= len(self.sentences):
+            return None
+        return self.sentences[sentence.number + 1]
+
+    def get_context(self, sentence, n=2):
+        """Return a list with the sentence and up to n sentences on each side of
+        it. The list is a slice of the sentences in document order."""
+        start = max(0, sentence.number - n)
+        return self.sentences[start:sentence.number + n + 1]
 
     def get_nominals(self):
         """Return a list of all nominals in the document."""
@@ -371,12 +984,18 @@ class SemcorFile(object):
 
 if __name__ == '__main__':
 
-    options, args = getopt.getopt(sys.argv[1:], 'n:', ['compile', 'export-nouns='])
+    options, args = getopt.getopt(sys.argv[1:], 'n:', ['compile', 'compile-sqlite', 'export-nouns='])
     options = { name: value for (name, value) in options }
     maxfiles = int(options.get('-n', 999))
 
     if '--compile' in options:
-        compile_semcor(maxfiles)
+        # use the imported module, otherwise the classes of the pickled objects
+        # are recorded as belonging to __main__ and other scripts cannot load them
+        import semcor
+        semcor.compile_semcor(maxfiles)
+    elif '--compile-sqlite' in options:
+        import database
+        database.compile_database(maxfiles)
     else:
         sc = Semcor(maxfiles)
         if '--export-nouns' in options:
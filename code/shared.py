@@ -0,0 +1,530 @@
+"""shared.py
+
+Semcor in shared memory, for worker processes that all need the corpus.
+
+One process loads Semcor and copies it into a shared memory block as columns of
+integers, with one column for each attribute of the tokens, sentences and files
+and with an index from lemmas to tokens. All strings are in one sorted string
+table and columns refer to strings by their position in that table. Worker
+processes attach to the block by its name and get a SharedCorpus that answers
+the same queries as Semcor, reading the columns in place:
+
+>>> sc = Semcor()
+>>> corpus = SharedCorpus.create(sc)
+>>> pool = multiprocessing.Pool(4, initializer=attach_worker, initargs=(corpus.name,))
+
+In the workers:
+
+>>> corpus = worker_corpus()
+>>> corpus.lemma_idx['walk']
+>>> corpus.get_sentence('br-a01', '12')
+>>> corpus.get_synset_for_lemma('walk', '2:38:00::')
+
+The process that created the corpus should call unlink() when all workers are
+done, and workers should be started by that process. Attaching takes a few
+milliseconds and the memory of the block is shared by all processes.
+Paragraphs, Sentences and WordForms are created for each query and are not
+shared between queries. This requires Python 3.8 or later.
+
+$ python shared.py [-n MAXFILES] [-j PROCESSES] LEMMA...
+
+Loads Semcor, puts it in shared memory and prints the number of WordForms and
+sentences for each lemma, computed in a pool of worker processes.
+
+"""
+
+from __future__ import print_function
+
+import os, sys, json, time, struct, getopt, multiprocessing
+from array import array
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # not available before Python 3.8
+    shared_memory = None
+
+from utils import Synset
+from objects import Paragraph, Sentence, WordForm, Punctuation
+
+
+# token attributes that refer to the string table, -1 is used for None
+STRING_ATTRIBUTES = ('text', 'pos', 'lemma', 'wnsn', 'lexsn', 'rdf', 'pn')
+
+SYNSET_ATTRIBUTES = ('ssid', 'cat', 'btypes', 'description', 'gloss')
+
+# Columns are aligned on this number of bytes in the shared memory block.
+ALIGNMENT = 8
+
+
+class StringTable(object):
+
+    """Sorted strings stored as UTF-8 in one buffer, the identifier of a string is
+    its position in the sorted order.
+
+    offsets : sequence of integers
+       String i is in data[offsets[i]:offsets[i+1]].
+
+    data : bytes or memoryview
+
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    @classmethod
+    def from_strings(cls, strings):
+        strings = sorted(strings)
+        offsets = array('i', [0])
+        data = bytearray()
+        for string in strings:
+            data.extend(string.encode('utf8'))
+            offsets.append(len(data))
+        return cls(offsets, bytes(data))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def string(self, identifier):
+        if identifier < 0:
+            return None
+        return bytes(self.data[self.offsets[identifier]:self.offsets[identifier + 1]]).decode('utf8')
+
+    def get(self, string):
+        """Return the identifier of the string, or None if it is not in the table.
+        This is a binary search over the sorted strings."""
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self.string(middle) < string:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self) and self.string(low) == string:
+            return low
+        return None
+
+
+def build_columns(semcor):
+    """Return a dictionary of arrays with the columns for the files of a Semcor
+    instance, including the offsets and the data of the string table."""
+    synsets = semcor.synsets
+    strings = set()
+    for semcor_file in semcor.files:
+        strings.add(semcor_file.fname)
+        for sentence in semcor_file.get_sentences():
+            strings.add(sentence.sid)
+            strings.add(sentence.pid)
+            for element in sentence.elements:
+                strings.add(element.text)
+                strings.add(' '.join(element.keys))
+                if element.is_word_form():
+                    for attr in STRING_ATTRIBUTES:
+                        strings.add(getattr(element, attr))
+    for synset in synsets.synsets:
+        for attr in SYNSET_ATTRIBUTES:
+            strings.add(getattr(synset, attr))
+    for lemma in synsets.synset_idx:
+        strings.update(synsets.synset_idx[lemma])
+    strings.discard(None)
+    table = StringTable.from_strings(strings)
+    ids = dict((table.string(i), i) for i in range(len(table)))
+    ids[None] = -1
+
+    columns = dict((name, array('i')) for name in (
+        'file_fname', 'file_sentences', 'sent_sid', 'sent_pid', 'sent_para',
+        'sent_tokens', 'tok_kind', 'tok_keys', 'tok_synset', 'lemma_ptr',
+        'lemma_tokens', 'sense_keys', 'sense_synsets')
+                   + tuple('tok_' + attr for attr in STRING_ATTRIBUTES)
+                   + tuple('syn_' + attr for attr in SYNSET_ATTRIBUTES))
+    postings = {}
+    paragraphs = 0
+    for semcor_file in semcor.files:
+        columns['file_fname'].append(ids[semcor_file.fname])
+        columns['file_sentences'].append(len(columns['sent_sid']))
+        last_para = None
+        for sentence in semcor_file.get_sentences():
+            if sentence.para is not last_para:
+                last_para = sentence.para
+                paragraphs += 1
+            columns['sent_sid'].append(ids[sentence.sid])
+            columns['sent_pid'].append(ids[sentence.pid])
+            columns['sent_para'].append(paragraphs)
+            columns['sent_tokens'].append(len(columns['tok_kind']))
+            for element in sentence.elements:
+                token = len(columns['tok_kind'])
+                columns['tok_keys'].append(ids[' '.join(element.keys)])
+                if element.is_word_form():
+                    columns['tok_kind'].append(1)
+                    for attr in STRING_ATTRIBUTES:
+                        columns['tok_' + attr].append(ids[getattr(element, attr)])
+                    synset_id = element.synset_id
+                    columns['tok_synset'].append(-1 if synset_id is None else synset_id)
+                    if element.has_sense():
+                        postings.setdefault(ids[element.lemma], array('i')).append(token)
+                else:
+                    columns['tok_kind'].append(0)
+                    columns['tok_text'].append(ids[element.text])
+                    for attr in STRING_ATTRIBUTES[1:]:
+                        columns['tok_' + attr].append(-1)
+                    columns['tok_synset'].append(-1)
+    columns['file_sentences'].append(len(columns['sent_sid']))
+    columns['sent_tokens'].append(len(columns['tok_kind']))
+    # postings for lemmas in compressed sparse row format, indexed on string id
+    columns['lemma_ptr'].append(0)
+    for identifier in range(len(table)):
+        columns['lemma_tokens'].extend(postings.get(identifier, ()))
+        columns['lemma_ptr'].append(len(columns['lemma_tokens']))
+    for synset in synsets.synsets:
+        for attr in SYNSET_ATTRIBUTES:
+            columns['syn_' + attr].append(ids[getattr(synset, attr)])
+    senses = sorted((ids[sense], synsets.get_id(lemma, sense.split('%', 1)[1]))
+                    for lemma in synsets.synset_idx for sense in synsets.synset_idx[lemma])
+    for sense, synset_id in senses:
+        columns['sense_keys'].append(sense)
+        columns['sense_synsets'].append(synset_id)
+    columns['string_offsets'] = table.offsets
+    columns['string_data'] = array('B', table.data)
+    return columns
+
+
+class SharedSynsetList(object):
+
+    """Read-only list of synsets that creates Synsets from the shared columns,
+    used as the synset table of the WordForms created by a SharedCorpus."""
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+
+    def __len__(self):
+        return len(self.corpus.columns['syn_ssid'])
+
+    def __getitem__(self, synset_id):
+        return self.corpus.get_synset(synset_id)
+
+
+class SharedLemmaIndex(object):
+
+    """Dictionary-like view on the lemma postings, with the same keys and values
+    as lemma_idx on Semcor."""
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+
+    def _postings(self, lemma):
+        identifier = self.corpus.strings.get(lemma)
+        if identifier is None:
+            return None
+        ptr = self.corpus.columns['lemma_ptr']
+        start, end = ptr[identifier], ptr[identifier + 1]
+        return self.corpus.columns['lemma_tokens'][start:end] if start < end else None
+
+    def __contains__(self, lemma):
+        return self._postings(lemma) is not None
+
+    def __getitem__(self, lemma):
+        wfs = self.get(lemma)
+        if wfs is None:
+            raise KeyError(lemma)
+        return wfs
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def keys(self):
+        ptr = self.corpus.columns['lemma_ptr']
+        return [self.corpus.strings.string(i)
+                for i in range(len(ptr) - 1) if ptr[i] < ptr[i + 1]]
+
+    def get(self, lemma, default=None):
+        tokens = self._postings(lemma)
+        return default if tokens is None else self.corpus.get_word_forms(tokens)
+
+
+class SharedCorpus(object):
+
+    """The columns of a corpus in a shared memory block.
+
+    Instance variables:
+
+    name : string
+       The name of the shared memory block, used by workers to attach.
+
+    columns : dict (string -> memoryview)
+       Read-only integer views on the columns in the block.
+
+    strings : StringTable
+
+    lemma_idx : SharedLemmaIndex
+       Works like the lemma_idx dictionary on Semcor.
+
+    synset_table : SharedSynsetList
+       The synset table of the WordForms created from the corpus.
+
+    loaded : integer
+       The number of files in the corpus.
+
+    """
+
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.name = shm.name
+        self.owner = owner
+        buf = shm.buf.toreadonly()
+        length = struct.unpack_from('<Q', buf, 0)[0]
+        header = json.loads(bytes(buf[8:8 + length]).decode('utf8'))
+        self.columns = {}
+        for name, (offset, size, typecode) in header.items():
+            self.columns[name] = buf[offset:offset + size].cast(typecode)
+        self.strings = StringTable(self.columns['string_offsets'], self.columns['string_data'])
+        self.lemma_idx = SharedLemmaIndex(self)
+        self.loaded = len(self.columns['file_fname'])
+        self.synset_table = SharedSynsetList(self)
+        self._buf = buf
+
+    @classmethod
+    def create(cls, semcor, name=None):
+        """Copy the files of a loaded Semcor instance into a new shared memory
+        block and return the SharedCorpus for it."""
+        if shared_memory is None:
+            raise RuntimeError("shared memory requires Python 3.8 or later")
+        columns = build_columns(semcor)
+        header = {}
+        offset = 0
+        for column_name in sorted(columns):
+            column = columns[column_name]
+            size = len(column) * column.itemsize
+            header[column_name] = [offset, size, column.typecode]
+            offset += size + (-size % ALIGNMENT)
+        # column offsets in the final header are larger than in this one, leave
+        # room for their extra digits
+        header_bytes = json.dumps(header).encode('utf8')
+        start = 8 + len(header_bytes) + 16 * len(header)
+        start += -start % ALIGNMENT
+        for column_name in header:
+            header[column_name][0] += start
+        header_bytes = json.dumps(header).encode('utf8')
+        shm = shared_memory.SharedMemory(name=name, create=True, size=start + max(offset, 1))
+        struct.pack_into('<Q', shm.buf, 0, len(header_bytes))
+        shm.buf[8:8 + len(header_bytes)] = header_bytes
+        for column_name, (column_offset, size, typecode) in header.items():
+            shm.buf[column_offset:column_offset + size] = columns[column_name].tobytes()
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        """Return the SharedCorpus for the shared memory block with the given name."""
+        if shared_memory is None:
+            raise RuntimeError("shared memory requires Python 3.8 or later")
+        try:
+            # the block belongs to the process that created it, the resource
+            # tracker of this process should not remove it (Python 3.13)
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # before Python 3.13 the block is registered with the resource
+            # tracker, which is shared with the creating process for workers
+            # started by it, so the block is still removed just once
+            shm = shared_memory.SharedMemory(name=name)
+        return cls(shm)
+
+    def __str__(self):
+        return "<SharedCorpus %s with %d files, %d bytes>" % (self.name, self.loaded, self.shm.size)
+
+    def close(self):
+        """Release the views on the block and close it in this process."""
+        for column in self.columns.values():
+            column.release()
+        self.columns = {}
+        self._buf.release()
+        self.shm.close()
+
+    def unlink(self):
+        """Close and remove the block, this should be done by the process that
+        created it after all workers are done."""
+        self.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def get_file(self, fname):
+        """Return a SemcorFile with all paragraphs, sentences and tokens of the file
+        with base name fname, or None if there is no such file."""
+        # imported here to avoid a circular import
+        from semcor import SemcorFile
+        for number, identifier in enumerate(self.columns['file_fname']):
+            path = self.strings.string(identifier)
+            if os.path.basename(path) == fname:
+                break
+        else:
+            return None
+        semcor_file = SemcorFile(path)
+        start, end = self.columns['file_sentences'][number:number + 2]
+        sentences = self._get_sentences(range(start, end))
+        for number in range(start, end):
+            sentence = sentences[number]
+            if not semcor_file.paragraphs or semcor_file.paragraphs[-1] is not sentence.para:
+                semcor_file.add_paragraph(sentence.para)
+        semcor_file.collect_forms()
+        semcor_file.index()
+        semcor_file.compile_sentences()
+        return semcor_file
+
+    def get_sentence(self, fname, sid):
+        """Return the sentence with identifier sid from the file with base name
+        fname, return None if there is no such sentence."""
+        identifier = self.strings.get(sid)
+        if identifier is None:
+            return None
+        file_sentences = self.columns['file_sentences']
+        sent_sid = self.columns['sent_sid']
+        for number, path in enumerate(self.columns['file_fname']):
+            if os.path.basename(self.strings.string(path)) == fname:
+                for sentence in range(file_sentences[number], file_sentences[number + 1]):
+                    if sent_sid[sentence] == identifier:
+                        return self._get_sentences([sentence])[sentence]
+        return None
+
+    def get_word_forms(self, tokens):
+        """Return the WordForms for a sequence of token numbers, each WordForm is in
+        its sentence and paragraph."""
+        sentence_numbers = [self._token_sentence(token) for token in tokens]
+        sentences = self._get_sentences(sorted(set(sentence_numbers)))
+        sent_tokens = self.columns['sent_tokens']
+        return [sentences[number].elements[token - sent_tokens[number]]
+                for token, number in zip(tokens, sentence_numbers)]
+
+    def get_synset(self, synset_id):
+        return Synset([''] + [self.strings.string(self.columns['syn_' + attr][synset_id])
+                              for attr in SYNSET_ATTRIBUTES])
+
+    def get_synset_for_lemma(self, lemma, sense):
+        """Get the synset associated with the lemma and the sense, for example
+        'walk' and '2:38:00::'. Returns None if no such synset was found."""
+        identifier = self.strings.get(lemma + '%' + sense)
+        if identifier is None:
+            return None
+        keys = self.columns['sense_keys']
+        low, high = 0, len(keys)
+        while low < high:
+            middle = (low + high) // 2
+            if keys[middle] < identifier:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(keys) and keys[low] == identifier:
+            return self.get_synset(self.columns['sense_synsets'][low])
+        return None
+
+    def _token_sentence(self, token):
+        """Return the number of the sentence of a token, using binary search over the
+        first tokens of the sentences."""
+        sent_tokens = self.columns['sent_tokens']
+        low, high = 0, len(sent_tokens) - 1
+        while high - low > 1:
+            middle = (low + high) // 2
+            if sent_tokens[middle] <= token:
+                low = middle
+            else:
+                high = middle
+        return low
+
+    def _get_sentences(self, numbers):
+        """Return a dictionary from sentence numbers to Sentences with all their
+        elements, Sentences from the same paragraph share the Paragraph."""
+        columns = self.columns
+        string = self.strings.string
+        file_sentences = columns['file_sentences']
+        sent_tokens = columns['sent_tokens']
+        paragraphs = {}
+        sentences = {}
+        file_number = 0
+        for number in numbers:
+            while file_sentences[file_number + 1] <= number:
+                file_number += 1
+            para = paragraphs.get(columns['sent_para'][number])
+            if para is None:
+                para = paragraphs[columns['sent_para'][number]] = \
+                    Paragraph(string(columns['sent_pid'][number]))
+            sentence = Sentence.__new__(Sentence)
+            sentence.fname = os.path.basename(string(columns['file_fname'][file_number]))
+            sentence.para = para
+            sentence.pid = para.pid
+            sentence.sid = string(columns['sent_sid'][number])
+            sentence.elements = []
+            para.add_sentence(sentence)
+            for token in range(sent_tokens[number], sent_tokens[number + 1]):
+                sentence.add_element(self._make_element(sentence, token))
+            sentence.compile_offsets(number - file_sentences[file_number])
+            sentences[number] = sentence
+        return sentences
+
+    def _make_element(self, sentence, token):
+        columns = self.columns
+        string = self.strings.string
+        if not columns['tok_kind'][token]:
+            element = Punctuation.__new__(Punctuation)
+            element.text = string(columns['tok_text'][token])
+            element.keys = tuple()
+            return element
+        wf = WordForm.__new__(WordForm)
+        wf.para = sentence.para
+        wf.sent = sentence
+        wf.position = len(sentence.elements)
+        wf.pid = sentence.pid
+        wf.sid = sentence.sid
+        for attr in STRING_ATTRIBUTES:
+            setattr(wf, attr, string(columns['tok_' + attr][token]))
+        synset_id = columns['tok_synset'][token]
+        wf.synset_id = None if synset_id < 0 else synset_id
+        wf.synset_table = self.synset_table
+        wf.keys = tuple(string(columns['tok_keys'][token]).split())
+        return wf
+
+
+# the corpus of a worker process, set by attach_worker()
+_corpus = None
+
+
+def attach_worker(name):
+    """Attach the worker process to the shared corpus, to be used as the
+    initializer of a multiprocessing.Pool."""
+    global _corpus
+    _corpus = SharedCorpus.attach(name)
+
+
+def worker_corpus():
+    return _corpus
+
+
+def count_lemma(lemma):
+    wfs = worker_corpus().lemma_idx.get(lemma, [])
+    return lemma, len(wfs), len(set((wf.sent.fname, wf.sid) for wf in wfs))
+
+
+if __name__ == '__main__':
+
+    options, args = getopt.gnu_getopt(sys.argv[1:], 'n:j:')
+    options = { name: value for (name, value) in options }
+    maxfiles = int(options.get('-n', 999))
+    processes = int(options['-j']) if '-j' in options else None
+
+    if not args:
+        print(__doc__)
+    else:
+        from semcor import Semcor
+        corpus = SharedCorpus.create(Semcor(maxfiles))
+        print(corpus)
+        t0 = time.time()
+        pool = multiprocessing.Pool(processes, initializer=attach_worker,
+                                    initargs=(corpus.name,))
+        try:
+            for lemma, forms, sentences in pool.imap(count_lemma, args):
+                print("%-20s %6d forms in %6d sentences" % (lemma, forms, sentences))
+        finally:
+            pool.close()
+            pool.join()
+            corpus.unlink()
+        print("Time elapsed is %.2f seconds" % (time.time() - t0))
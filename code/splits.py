@@ -0,0 +1,203 @@
+"""splits.py
+
+Document-level train/test splits and folds for cross-validation.
+
+Files are assigned to folds randomly, but reproducibly given a seed, and the
+assignment can be stratified so that each fold gets a similar mix of files:
+
+   genre       the genre letter in the file name, br-j03 has genre j
+   subcorpus   brown1 or brown2
+   senses      the number of sense-tagged word forms in the file, in quartiles
+   None        no stratification
+
+Fold assignments are cached in the directory with compiled files so repeated
+experiments with the same files, number of folds, seed and stratification start
+without recomputing them.
+
+Usage:
+
+>>> folds = get_folds(semcor_files(), k=5, seed=42, stratify='genre')
+>>> for train, test in folds:
+...     for wf in iter_forms(test):
+...         pass
+
+The train and test lists are file names from SEMCOR_FILES. The iter_forms()
+function reads WordForms from the compiled files one file at a time, or takes
+them from a loaded Semcor instance if one is given, so the forms are not copied.
+
+$ python splits.py [-k FOLDS] [--seed SEED] [--stratify NAME]
+
+Prints the fold assignment for all files.
+
+"""
+
+from __future__ import print_function
+
+import os, sys, json, random, getopt, hashlib
+
+import compiled
+from semcor import semcor_files
+
+
+STRATIFICATIONS = ('genre', 'subcorpus', 'senses', None)
+
+
+def genre(fname):
+    """Return the genre letter from a file name like brown1/tagfiles/br-j03."""
+    return os.path.basename(fname)[3]
+
+
+def subcorpus(fname):
+    return fname.split(os.sep)[-3]
+
+
+def sense_count(fname):
+    """Return the number of sense-tagged forms in the source file. Counting is done
+    on the source so it does not need compiled files."""
+    with open(fname) as fh:
+        return fh.read().count(' lexsn=')
+
+
+def sense_quartiles(fnames):
+    """Return a dictionary with for each file name a number from 0 to 3 for the
+    quartile of its number of sense-tagged forms."""
+    ranked = sorted(fnames, key=lambda fname: (sense_count(fname), fname))
+    return dict((fname, 4 * rank // len(ranked)) for rank, fname in enumerate(ranked))
+
+
+def strata_function(stratify, fnames):
+    if stratify == 'senses':
+        return sense_quartiles(fnames).get
+    return {'genre': genre, 'subcorpus': subcorpus, None: lambda fname: None}[stratify]
+
+
+class Folds(object):
+
+    """Assignment of files to folds.
+
+    Instance variables:
+
+    fnames : list of strings
+       File names in the order of SEMCOR_FILES.
+
+    k : integer
+       The number of folds.
+
+    assignment : dict (string -> int)
+       The fold for each file name.
+
+    """
+
+    def __init__(self, fnames, k=5, seed=0, stratify='genre'):
+        if stratify not in STRATIFICATIONS:
+            raise ValueError("stratify should be one of %s" % (STRATIFICATIONS,))
+        self.fnames = list(fnames)
+        self.k = k
+        self.seed = seed
+        self.stratify = stratify
+        self.assignment = {}
+        strata = {}
+        stratum_function = strata_function(stratify, self.fnames)
+        for fname in self.fnames:
+            strata.setdefault(stratum_function(fname), []).append(fname)
+        rng = random.Random(seed)
+        # files are dealt out to the folds like cards, continuing with the next
+        # fold when moving to the next stratum, so folds differ at most one file
+        # in size
+        fold = 0
+        for stratum in sorted(strata, key=str):
+            fnames = sorted(strata[stratum])
+            rng.shuffle(fnames)
+            for fname in fnames:
+                self.assignment[fname] = fold
+                fold = (fold + 1) % k
+
+    def __iter__(self):
+        for fold in range(self.k):
+            yield self.train_files(fold), self.test_files(fold)
+
+    def __str__(self):
+        return "<Folds k=%d seed=%s stratify=%s files=%d>" \
+               % (self.k, self.seed, self.stratify, len(self.fnames))
+
+    def test_files(self, fold):
+        return [f for f in self.fnames if self.assignment[f] == fold]
+
+    def train_files(self, fold):
+        return [f for f in self.fnames if self.assignment[f] != fold]
+
+    def save(self, path):
+        with open(path, 'w') as fh:
+            json.dump({'k': self.k, 'seed': self.seed, 'stratify': self.stratify,
+                       'fnames': self.fnames, 'assignment': self.assignment}, fh)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as fh:
+            data = json.load(fh)
+        folds = cls.__new__(cls)
+        for key in ('k', 'seed', 'stratify', 'fnames', 'assignment'):
+            setattr(folds, key, data[key])
+        return folds
+
+
+def cache_file(fnames, k, seed, stratify):
+    digest = hashlib.md5('\n'.join(fnames).encode('utf8')).hexdigest()[:12]
+    return compiled.file_name("folds-%d-%s-%s-%s" % (k, seed, stratify, digest), '.json')
+
+
+def get_folds(fnames=None, k=5, seed=0, stratify='genre'):
+    """Return the Folds for the file names, from the cache if possible. The
+    default is to use all files."""
+    if fnames is None:
+        fnames = semcor_files()
+    path = cache_file(fnames, k, seed, stratify)
+    if os.path.exists(path):
+        return Folds.load(path)
+    folds = Folds(fnames, k, seed, stratify)
+    folds.save(path)
+    return folds
+
+
+def train_test_split(fnames=None, test_fraction=0.2, seed=0, stratify='genre'):
+    """Return lists of training files and test files. This uses the first of
+    round(1 / test_fraction) folds as the test set."""
+    k = max(2, int(round(1 / test_fraction)))
+    folds = get_folds(fnames, k, seed, stratify)
+    return folds.train_files(0), folds.test_files(0)
+
+
+def iter_forms(fnames, semcor=None):
+    """Yield the WordForms with a sense in the files. If a Semcor instance is given
+    the forms are taken from there, otherwise they are read from the compiled
+    files, one file at a time. Files that are not loaded in the Semcor instance
+    are also read from the compiled files, their WordForms are bound to the
+    synsets of the instance."""
+    for fname in fnames:
+        semcor_file = None
+        if semcor is not None:
+            semcor_file = semcor.get_file(os.path.basename(fname))
+        if semcor_file is None:
+            semcor_file = compiled.read(compiled.file_name(fname), 'file')
+            if semcor is not None:
+                semcor_file.bind_synsets(semcor.synsets)
+        for wf in semcor_file.forms:
+            yield wf
+
+
+if __name__ == '__main__':
+
+    options, args = getopt.getopt(sys.argv[1:], 'k:', ['seed=', 'stratify='])
+    options = { name: value for (name, value) in options }
+    k = int(options.get('-k', 5))
+    seed = int(options.get('--seed', 0))
+    stratify = options.get('--stratify', 'genre')
+    stratify = None if stratify == 'None' else stratify
+
+    folds = get_folds(semcor_files(), k, seed, stratify)
+    print(folds)
+    for fold in range(folds.k):
+        test = folds.test_files(fold)
+        genres = ''.join(sorted(genre(f) for f in test))
+        print("\nfold %d: %d files, genres %s" % (fold, len(test), genres))
+        print('  ' + ' '.join(os.path.basename(f) for f in test))
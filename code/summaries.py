@@ -0,0 +1,371 @@
+"""summaries.py
+
+Sense distributions of lemmas, precomputed so that statistics for a lemma do
+not have to go through its occurrences.
+
+For each lemma the summary has the senses that occur with the lemma, where a
+sense is a part-of-speech with a wnsn and a lexsn as in Browser.show_stats(),
+with the number of occurrences of each sense, its synset and the number of
+files it occurs in. For the lemma as a whole there is the number of occurrences,
+the number of files it occurs in, the most frequent sense, the entropy in bits
+of the distribution over its senses and the basic types of its noun synsets in
+the mappings file. Only WordForms with a sense are counted, as in lemma_idx.
+
+All values are stored in arrays of integers, with strings in a Vocabulary, and
+the senses of a lemma are a range of rows in the sense columns, so the summaries
+for all lemmas of the corpus take less than two megabytes. Lookups by lemma take
+constant time. Summaries for all compiled files are created when compiling and
+saved with the compiled files, summaries for a subset of the files are created
+when they are first needed.
+
+Usage:
+
+>>> sc = Semcor()
+>>> summaries = sc.get_summaries()
+>>> summaries.occurrences('jury')
+>>> summaries.senses('jury')
+>>> summaries.most_frequent_sense('jury')
+>>> summaries.entropy('jury')
+>>> summaries.spread('jury')
+>>> summaries.pos_counts('run')
+>>> summaries.btypes('jury')
+
+Usage from the command line:
+
+$ python summaries.py [-n MAXFILES] [-k K] [--sort FIELD] [LEMMA...]
+
+Prints the summaries for the lemmas or, without lemmas, the K lemmas with the
+highest value for FIELD, which is one of senses, entropy, spread and
+occurrences (default is entropy, K defaults to 20).
+
+"""
+
+from __future__ import print_function
+
+import os, sys, math, heapq, getopt
+from array import array
+
+import compiled
+from vocab import Vocabulary
+
+
+SORT_FIELDS = ('senses', 'entropy', 'spread', 'occurrences')
+
+
+class SenseCounts(object):
+
+    """Occurrences of the senses of each lemma, collected one file at a time
+    and turned into LemmaSummaries.
+
+    Instance variables:
+
+    fnames : list of strings
+       The base names of the files that were added, in the order they were
+       added.
+
+    senses : dict (string -> dict (tuple -> list))
+       For each lemma a dictionary from a triple of part-of-speech, wnsn and
+       lexsn to a list with the count, the synset position, the number of
+       files and the number of the last file.
+
+    order : dict (string -> list of tuples)
+       For each lemma the triples in the order of their first occurrence.
+
+    spread : dict (string -> list)
+       For each lemma a list with the number of files and the number of the
+       last file.
+
+    """
+
+    def __init__(self, semcor_files=()):
+        self.fnames = []
+        self.senses = {}
+        self.order = {}
+        self.spread = {}
+        for semcor_file in semcor_files:
+            self.add_file(semcor_file)
+
+    def add_file(self, semcor_file):
+        number = len(self.fnames)
+        self.fnames.append(os.path.basename(semcor_file.fname))
+        for wf in semcor_file.forms:
+            senses = self.senses.get(wf.lemma)
+            if senses is None:
+                senses = self.senses[wf.lemma] = {}
+                self.order[wf.lemma] = []
+                self.spread[wf.lemma] = [0, -1]
+            key = (wf.pos, wf.wnsn, wf.lexsn)
+            counts = senses.get(key)
+            if counts is None:
+                synset = -1 if wf.synset_id is None else wf.synset_id
+                counts = senses[key] = [0, synset, 0, -1]
+                self.order[wf.lemma].append(key)
+            counts[0] += 1
+            if counts[3] != number:
+                counts[2] += 1
+                counts[3] = number
+            spread = self.spread[wf.lemma]
+            if spread[1] != number:
+                spread[0] += 1
+                spread[1] = number
+
+
+class LemmaSummaries(object):
+
+    """Per-lemma sense summaries in a compact table.
+
+    Instance variables:
+
+    fnames : list of strings
+       The base names of the files that were counted.
+
+    synsets_fingerprint : string
+       The fingerprint of the SynsetTable that synset positions and basic types
+       were taken from.
+
+    lemmas : list of strings
+       The lemmas in sorted order, the position of a lemma is its row.
+
+    rows : dict (string -> int)
+       The row of each lemma, not pickled.
+
+    strings : Vocabulary
+       The parts-of-speech, wnsn and lexsn values and basic types.
+
+    lemma_counts, lemma_spread, lemma_mfs, lemma_btypes : arrays of integers
+       Indexed on lemma row, the number of occurrences, the number of files,
+       the sense row of the most frequent sense and the string identifier of
+       the space-separated basic types.
+
+    lemma_entropy : array of floats
+       Indexed on lemma row, the entropy of the sense distribution in bits.
+
+    sense_starts : array of integers
+       The first sense row of each lemma, with one extra element for the number
+       of sense rows.
+
+    sense_pos, sense_wnsn, sense_lexsn : arrays of integers
+       Indexed on sense row, string identifiers, -1 for missing values.
+
+    sense_counts, sense_synsets, sense_spread : arrays of integers
+       Indexed on sense row, the number of occurrences, the position of the
+       synset in the SynsetTable (-1 for none) and the number of files.
+
+    """
+
+    def __init__(self, counts, synsets):
+        """Create the summaries from SenseCounts, with the basic types taken
+        from the SynsetTable."""
+        self.fnames = list(counts.fnames)
+        self.synsets_fingerprint = synsets.fingerprint
+        self.lemmas = sorted(counts.senses)
+        self.strings = Vocabulary()
+        self.lemma_counts = array('i')
+        self.lemma_spread = array('i')
+        self.lemma_mfs = array('i')
+        self.lemma_btypes = array('i')
+        self.lemma_entropy = array('d')
+        self.sense_starts = array('i', [0])
+        self.sense_pos = array('i')
+        self.sense_wnsn = array('i')
+        self.sense_lexsn = array('i')
+        self.sense_counts = array('i')
+        self.sense_synsets = array('i')
+        self.sense_spread = array('i')
+        for lemma in self.lemmas:
+            self._add_lemma(lemma, counts, synsets)
+        self.rows = dict((lemma, n) for n, lemma in enumerate(self.lemmas))
+
+    def _add_lemma(self, lemma, counts, synsets):
+        start = len(self.sense_counts)
+        for key in counts.order[lemma]:
+            count, synset, spread, _ = counts.senses[lemma][key]
+            pos, wnsn, lexsn = key
+            self.sense_pos.append(self.string_id(pos))
+            self.sense_wnsn.append(self.string_id(wnsn))
+            self.sense_lexsn.append(self.string_id(lexsn))
+            self.sense_counts.append(count)
+            self.sense_synsets.append(synset)
+            self.sense_spread.append(spread)
+        end = len(self.sense_counts)
+        self.sense_starts.append(end)
+        sense_counts = self.sense_counts[start:end]
+        self.lemma_counts.append(sum(sense_counts))
+        self.lemma_spread.append(counts.spread[lemma][0])
+        self.lemma_mfs.append(start + sense_counts.index(max(sense_counts)))
+        self.lemma_entropy.append(entropy(sense_counts))
+        btypes = set()
+        for synset in synsets.synset_idx.get(lemma, {}).values():
+            if synset.cat == 'noun':
+                btypes.update(synset.btypes.split())
+        self.lemma_btypes.append(self.strings.add(' '.join(sorted(btypes))))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['rows']
+        return state
+
+    def __setstate__(self, state):
+        # summaries saved before the fingerprint was added are created again
+        self.synsets_fingerprint = None
+        self.__dict__.update(state)
+        self.rows = dict((lemma, n) for n, lemma in enumerate(self.lemmas))
+
+    def __str__(self):
+        return "<LemmaSummaries files=%d lemmas=%d senses=%d>" \
+               % (len(self.fnames), len(self.lemmas), len(self.sense_counts))
+
+    def __contains__(self, lemma):
+        return lemma in self.rows
+
+    def __len__(self):
+        return len(self.lemmas)
+
+    def string_id(self, string):
+        return -1 if string is None else self.strings.add(string)
+
+    def string(self, identifier):
+        return None if identifier < 0 else self.strings.string(identifier)
+
+    def covers(self, semcor_files):
+        """Return True if the summaries were made for exactly these files."""
+        return sorted(self.fnames) == sorted(os.path.basename(f.fname) for f in semcor_files)
+
+    def sense_rows(self, lemma):
+        row = self.rows.get(lemma)
+        if row is None:
+            return range(0)
+        return range(self.sense_starts[row], self.sense_starts[row + 1])
+
+    def sense(self, row):
+        """Return a tuple with the part-of-speech, wnsn, lexsn, count, synset
+        position and number of files for a sense row."""
+        return (self.string(self.sense_pos[row]), self.string(self.sense_wnsn[row]),
+                self.string(self.sense_lexsn[row]), self.sense_counts[row],
+                self.sense_synsets[row], self.sense_spread[row])
+
+    def senses(self, lemma):
+        """Return the senses of the lemma as tuples like those of sense(), in the
+        order of their first occurrence."""
+        return [self.sense(row) for row in self.sense_rows(lemma)]
+
+    def pos_counts(self, lemma):
+        """Return a list of pairs of a part-of-speech and its number of
+        occurrences with the lemma, in the order of their first occurrence."""
+        counts = []
+        positions = {}
+        for row in self.sense_rows(lemma):
+            pos = self.string(self.sense_pos[row])
+            if pos not in positions:
+                positions[pos] = len(counts)
+                counts.append([pos, 0])
+            counts[positions[pos]][1] += self.sense_counts[row]
+        return [tuple(pair) for pair in counts]
+
+    def has_pos(self, lemma, tag_prefix):
+        """Return True if the lemma occurs with a tag that starts with tag_prefix."""
+        return any(self.string(self.sense_pos[row]).startswith(tag_prefix)
+                   for row in self.sense_rows(lemma))
+
+    def occurrences(self, lemma):
+        row = self.rows.get(lemma)
+        return 0 if row is None else self.lemma_counts[row]
+
+    def spread(self, lemma):
+        """Return the number of files that the lemma occurs in."""
+        row = self.rows.get(lemma)
+        return 0 if row is None else self.lemma_spread[row]
+
+    def most_frequent_sense(self, lemma):
+        """Return the most frequent sense of the lemma as a tuple like those of
+        sense(), or None if the lemma does not occur. Ties go to the sense that
+        occurs first."""
+        row = self.rows.get(lemma)
+        return None if row is None else self.sense(self.lemma_mfs[row])
+
+    def entropy(self, lemma):
+        row = self.rows.get(lemma)
+        return 0.0 if row is None else self.lemma_entropy[row]
+
+    def btypes(self, lemma):
+        """Return the basic types of the noun synsets of the lemma as a list."""
+        row = self.rows.get(lemma)
+        return [] if row is None else self.string(self.lemma_btypes[row]).split()
+
+    def top(self, field='entropy', k=20):
+        """Return the k lemmas with the highest value for a field in SORT_FIELDS
+        as pairs of the value and the lemma."""
+        if field not in SORT_FIELDS:
+            raise ValueError("field should be one of %s" % (SORT_FIELDS,))
+        starts = self.sense_starts
+        values = {'senses': [starts[n + 1] - starts[n] for n in range(len(self.lemmas))],
+                  'entropy': self.lemma_entropy, 'spread': self.lemma_spread,
+                  'occurrences': self.lemma_counts}[field]
+        return heapq.nsmallest(k, zip(values, self.lemmas),
+                               key=lambda pair: (-pair[0], pair[1]))
+
+    def pickle(self):
+        compiled.write(compiled.file_name('summaries'), self, 'summaries')
+
+
+def entropy(counts):
+    """Return the entropy in bits of a distribution given as counts."""
+    total = float(sum(counts))
+    # max() avoids a negative zero for a single sense
+    return max(0.0, -sum(c / total * math.log(c / total, 2) for c in counts if c))
+
+
+def load_summaries(semcor):
+    """Return the summaries for the loaded files of the Semcor instance, these
+    are the compiled summaries if all compiled files are loaded and the synset
+    table did not change since compiling."""
+    try:
+        summaries = compiled.read(compiled.file_name('summaries'), 'summaries')
+        if summaries.covers(semcor.files) \
+           and summaries.synsets_fingerprint == semcor.synsets.fingerprint:
+            return summaries
+    except (IOError, compiled.CompiledFormatError):
+        pass
+    summaries = LemmaSummaries(SenseCounts(semcor.files), semcor.synsets)
+    if len(semcor.files) == semcor.fcount:
+        summaries.pickle()
+    return summaries
+
+
+def summary_lines(summaries, lemma, synsets):
+    """Return lines with the summary of the lemma, the synsets are taken from
+    the SynsetTable."""
+    mfs = summaries.most_frequent_sense(lemma)
+    if mfs is None:
+        return ["%s does not occur" % lemma]
+    lines = ["%s  occurrences=%d  senses=%d  files=%d  entropy=%.2f  mfs=%s"
+             % (lemma, summaries.occurrences(lemma), len(summaries.sense_rows(lemma)),
+                summaries.spread(lemma), summaries.entropy(lemma), mfs[2])]
+    lines.append("btypes: %s" % ' '.join(summaries.btypes(lemma)))
+    for pos, wnsn, lexsn, count, synset, spread in summaries.senses(lemma):
+        description = synsets.synsets[synset] if synset >= 0 else ''
+        lines.append("  %-4s %5d %4d  { lexsn=%s } %s" % (pos, count, spread, lexsn, description))
+    return lines
+
+
+if __name__ == '__main__':
+
+    options, args = getopt.getopt(sys.argv[1:], 'n:k:', ['sort='])
+    options = { name: value for (name, value) in options }
+    maxfiles = int(options.get('-n', 999))
+    k = int(options.get('-k', 20))
+    field = options.get('--sort', 'entropy')
+
+    from semcor import Semcor
+    semcor = Semcor(maxfiles)
+    summaries = semcor.get_summaries()
+    print(summaries)
+    if args:
+        for lemma in args:
+            print('\n' + '\n'.join(summary_lines(summaries, lemma, semcor.synsets)))
+    else:
+        print("\nTop %d lemmas on %s\n" % (k, field))
+        line = "  %8.2f  %s" if field == 'entropy' else "  %8d  %s"
+        for value, lemma in summaries.top(field, k):
+            print(line % (value, lemma))
+    print()
@@ -0,0 +1,135 @@
+"""tokens.py
+
+Global identifiers for tokens and sentences.
+
+Every element of every sentence, word forms and punctuation, has a token
+identifier, and every sentence has a global sentence number. Both count up
+through all files in the order of SEMCOR_FILES, so the first token of a file is
+the token after the last token of the file before it. The token table with the
+first token and the first sentence of each file is created when compiling and
+saved with the compiled files, so identifiers are the same no matter which files
+are loaded.
+
+Semcor uses the table to resolve identifiers in constant time:
+
+>>> sc = Semcor()
+>>> wf = sc.token(1234)
+>>> sc.token_id(wf)
+1234
+>>> sc.tokens(range(1000, 2000))
+>>> sc.get_token_id('br-a01', '13', 2)
+>>> sc.sentence(42)
+
+"""
+
+from __future__ import print_function
+
+import os
+from array import array
+
+import compiled
+
+
+class TokenTable(object):
+
+    """The first token and the first sentence of each file.
+
+    Instance variables:
+
+    fnames : list of strings
+       Base names of the files in the order of SEMCOR_FILES.
+
+    token_starts : array of integers
+       The identifier of the first token of each file, with one extra element
+       for the total number of tokens.
+
+    sentence_starts : array of integers
+       The global number of the first sentence of each file, with one extra
+       element for the total number of sentences.
+
+    sentence_tokens : array of integers
+       The identifier of the first token of each sentence, indexed on global
+       sentence number, with one extra element for the total number of tokens.
+
+    positions : dict (string -> int)
+       The position of each file base name in fnames, not pickled.
+
+    """
+
+    def __init__(self, semcor_files=()):
+        """Create the table from SemcorFiles in the order of SEMCOR_FILES, which
+        can be any iterable."""
+        self.fnames = []
+        self.token_starts = array('i', [0])
+        self.sentence_starts = array('i', [0])
+        self.sentence_tokens = array('i', [0])
+        self.positions = {}
+        for semcor_file in semcor_files:
+            self.add_file(semcor_file)
+
+    def add_file(self, semcor_file):
+        """Add the file after the files that are in the table."""
+        sentences = semcor_file.get_sentences()
+        self.positions[os.path.basename(semcor_file.fname)] = len(self.fnames)
+        self.fnames.append(os.path.basename(semcor_file.fname))
+        for sentence in sentences:
+            self.sentence_tokens.append(self.sentence_tokens[-1] + len(sentence.elements))
+        self.token_starts.append(self.sentence_tokens[-1])
+        self.sentence_starts.append(self.sentence_starts[-1] + len(sentences))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['positions']
+        return state
+
+    def __setstate__(self, state):
+        # tables saved before sentence_tokens was added do not cover any file
+        # and are created again
+        self.sentence_tokens = None
+        self.__dict__.update(state)
+        self.positions = dict((fname, n) for n, fname in enumerate(self.fnames))
+
+    def __str__(self):
+        return "<TokenTable files=%d sentences=%d tokens=%d>" \
+               % (len(self.fnames), self.sentence_starts[-1], self.token_starts[-1])
+
+    def covers(self, semcor_file):
+        """Return True if the table has the file with its number of tokens."""
+        n = self.positions.get(os.path.basename(semcor_file.fname))
+        if n is None or self.sentence_tokens is None:
+            return False
+        sentences = semcor_file.get_sentences()
+        return (self.sentence_starts[n + 1] - self.sentence_starts[n] == len(sentences)
+                and self.token_starts[n + 1] - self.token_starts[n]
+                == sum(len(s.elements) for s in sentences))
+
+    def sentence_size(self, number):
+        """Return the number of tokens in the sentence with the global number."""
+        return self.sentence_tokens[number + 1] - self.sentence_tokens[number]
+
+    def pickle(self):
+        compiled.write(compiled.file_name('tokens'), self, 'tokens')
+
+
+def load_token_table(loaded_files, fnames):
+    """Return the compiled token table if it has all the loaded SemcorFiles. If
+    it does not, a new table is created for the files in fnames, which are the
+    paths in SEMCOR_FILES that were compiled, reading the compiled files that
+    are not loaded, and the new table is saved."""
+    try:
+        table = compiled.read(compiled.file_name('tokens'), 'tokens')
+        if all(table.covers(semcor_file) for semcor_file in loaded_files):
+            return table
+        print("Warning: compiled token table does not match the compiled files, updating it")
+    except (IOError, compiled.CompiledFormatError):
+        print("Warning: no compiled token table, creating it")
+    loaded = dict((os.path.basename(f.fname), f) for f in loaded_files)
+    paths = [path for path in fnames if os.path.exists(compiled.file_name(path))]
+    others = compiled.read_many([compiled.file_name(path) for path in paths
+                                 if os.path.basename(path) not in loaded], 'file')
+    # the files that are not loaded are read one after the other, in the
+    # order of SEMCOR_FILES, and dropped after they were counted
+    files = (loaded.get(os.path.basename(path)) or next(others) for path in paths)
+    table = TokenTable(files)
+    table.pickle()
+    return table
@@ -8,14 +8,6 @@ import os, sys, time
 import ansi
 
 
-def pickle_file_name(fname):
-    """Generate the name for the pickle file. We maintain different pickle files
-    depending on the Python version."""
-    return os.path.join('..', 'data', 'compiled',
-                        str(sys.version_info.major),
-                        os.path.basename(fname) + '.pickle')
-
-
 def read_input():
     """Utility method that hides differences between python 2 and 3."""
     return raw_input() if sys.version_info.major == 2 else input()
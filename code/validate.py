@@ -0,0 +1,354 @@
+"""validate.py
+
+Consistency checks on the structure and the annotations of all Semcor files,
+including the verb-only files in brownv.
+
+Each file is checked on its own and the results are collected in a report with
+a list of issues for each file. An issue has a check, a sentence identifier, a
+position in the sentence (None for issues with a paragraph or a sentence) and
+a detail string. The checks are:
+
+   unexpected-element    a sentence has an element that is not a wf or punc tag
+   duplicate-pid         a paragraph number that occurred before in the file
+   duplicate-sid         a sentence number that occurred before in the file
+   empty-sentence        a sentence without elements
+   incomplete-sense      a wnsn attribute without a lexsn attribute or the
+                         other way around
+   sense-without-lemma   a sense on a word form without a lemma
+   multi-valued-wnsn     more than one wnsn value, as in wnsn=1;2
+   multi-valued-lexsn    more than one lexsn value
+   malformed-wnsn        a wnsn value that is not a number
+   malformed-lexsn       a lexsn value that is not like 2:32:00:: or
+                         5:00:00:clearheaded:00
+   pos-mismatch          the synset type in lexsn does not fit the tag, like
+                         a noun sense on a verb
+   missing-synset        a sense that has no synset in the mappings file
+   proper-name-mismatch  a pn attribute where lemma, pn and rdf differ
+   rdf-without-pn        an rdf attribute on a word form that is not a proper
+                         name, these are the weird rdfs of analyze.py
+
+Files from SEMCOR_FILES are read from the compiled files and the other files
+are parsed, files are checked by a pool of worker processes. The report is
+saved in the directory for compiled files with a fingerprint of each file, so
+files that did not change since the last run are not checked again. Compiling
+Semcor checks the files while they are parsed and updates the report, so after
+compiling only the brownv files are left to be checked. Unexpected elements are
+only found in files compiled with this version of the code.
+
+Usage:
+
+>>> report = validate()
+>>> print(report.summary())
+>>> report.counts()['brown1']['multi-valued-wnsn']
+>>> for path, issue in report.issues('missing-synset'):
+...     print(path, issue)
+
+Usage from the command line:
+
+$ python validate.py [-j PROCESSES] [-e EXAMPLES] [--force] [--json] [SUBCORPUS...]
+
+Checks the files in the subcorpora, brown1, brown2 and brownv by default, and
+prints the number of issues for each check and subcorpus with EXAMPLES examples
+for each check (default is 3). With --force all files are checked again and
+with --json the report is printed as JSON. The -j option sets the number of
+processes, the default is the number of CPUs.
+
+"""
+
+from __future__ import print_function
+
+import os, re, sys, glob, json, time, getopt, multiprocessing
+from collections import Counter
+
+import compiled
+from semcor import SEMCOR, SemcorFile, load_synset_table, semcor_files
+
+
+SUBCORPORA = ('brown1', 'brown2', 'brownv')
+
+CHECKS = ('unexpected-element', 'duplicate-pid', 'duplicate-sid', 'empty-sentence',
+          'incomplete-sense', 'sense-without-lemma', 'multi-valued-wnsn',
+          'multi-valued-lexsn', 'malformed-wnsn', 'malformed-lexsn', 'pos-mismatch',
+          'missing-synset', 'proper-name-mismatch', 'rdf-without-pn')
+
+# the version of the checks, reports made with another version are discarded
+VERSION = 1
+
+REPORT = compiled.file_name('validation', '.json')
+
+LEXSN = re.compile(r'^[1-5]:\d\d:\d\d:[^:;]*:(\d\d)?$')
+
+# the tag prefixes that fit the synset type at the start of a lexsn, satellite
+# adjectives are type 5
+SYNSET_TAGS = {'1': ('NN',), '2': ('VB', 'MD'), '3': ('JJ',), '4': ('RB', 'WRB'),
+               '5': ('JJ',)}
+
+# the synset table of a worker process, set by init_worker()
+_synsets = None
+
+
+class ValidationReport(object):
+
+    """The issues found in the Semcor files.
+
+    Instance variables:
+
+    entries : dict (string -> dict)
+       For each path of a Semcor source file a dictionary with the fingerprint
+       of the file, the number of sentences and word forms and the issues as
+       lists of a check, a sentence identifier, a position and a detail.
+
+    synsets_fingerprint : string
+       The fingerprint of the SynsetTable used for the missing-synset check.
+
+    seconds : float
+       How long the last run took.
+
+    """
+
+    def __init__(self, synsets_fingerprint):
+        self.entries = {}
+        self.synsets_fingerprint = synsets_fingerprint
+        self.seconds = 0.0
+
+    def __str__(self):
+        return "<ValidationReport files=%d issues=%d>" \
+               % (len(self.entries), sum(len(e['issues']) for e in self.entries.values()))
+
+    def is_current(self, path):
+        """Return True if the report has an entry for the file at path that was
+        made after the file last changed."""
+        entry = self.entries.get(path)
+        return entry is not None and entry['fingerprint'] == fingerprint(path)
+
+    def issues(self, check=None):
+        """Yield pairs of a path and an issue, for all issues or for those of one
+        check, ordered on path."""
+        for path in sorted(self.entries):
+            for issue in self.entries[path]['issues']:
+                if check is None or issue[0] == check:
+                    yield path, issue
+
+    def counts(self):
+        """Return a dictionary with a Counter of checks for each subcorpus."""
+        counts = {}
+        for path, issue in self.issues():
+            counts.setdefault(subcorpus(path), Counter())[issue[0]] += 1
+        return counts
+
+    def summary(self, examples=3):
+        """Return a table with the number of issues for each check and each
+        subcorpus, followed by examples of each check."""
+        counts = self.counts()
+        subcorpora = sorted(set(subcorpus(path) for path in self.entries))
+        files = Counter(subcorpus(path) for path in self.entries)
+        lines = ["%-22s" % '' + ''.join("%9s" % s for s in subcorpora),
+                 "%-22s" % 'files' + ''.join("%9d" % files[s] for s in subcorpora)]
+        for check in CHECKS:
+            lines.append("%-22s" % check + ''.join("%9d" % counts.get(s, Counter())[check]
+                                                  for s in subcorpora))
+        for check in CHECKS:
+            found = [(path, issue) for path, issue in self.issues(check)][:examples]
+            if found:
+                lines.append("\n%s\n" % check)
+                for path, (_, sid, position, detail) in found:
+                    where = sid if position is None else "%s:%s" % (sid, position)
+                    lines.append("   %s %s %s" % (short_name(path), where, detail))
+        lines.append("\nReport for %d files, the last run took %.2f seconds"
+                     % (len(self.entries), self.seconds))
+        return '\n'.join(lines)
+
+    def as_json(self):
+        return {'version': VERSION, 'synsets_fingerprint': self.synsets_fingerprint,
+                'seconds': self.seconds, 'entries': self.entries}
+
+    def save(self, path=REPORT):
+        with open(path, 'w') as fh:
+            json.dump(self.as_json(), fh)
+
+    @classmethod
+    def load(cls, synsets_fingerprint, path=REPORT):
+        """Return the report saved at path, or an empty report if there is none
+        or if it was made with other checks or other synsets."""
+        report = cls(synsets_fingerprint)
+        try:
+            with open(path) as fh:
+                data = json.load(fh)
+        except (IOError, ValueError):
+            return report
+        if data.get('version') == VERSION \
+           and data.get('synsets_fingerprint') == report.synsets_fingerprint:
+            report.entries = data['entries']
+        return report
+
+
+def source_files(subcorpora=SUBCORPORA):
+    """Return the paths of the source files in the subcorpora."""
+    paths = []
+    for name in subcorpora:
+        paths.extend(glob.glob(os.path.join(SEMCOR, name, 'tagfiles', '*')))
+    return sorted(paths)
+
+
+def subcorpus(path):
+    return path.split(os.sep)[-3]
+
+
+def short_name(path):
+    return "%s/%s" % (subcorpus(path), os.path.basename(path))
+
+
+def uses_compiled(path):
+    """Return True if the file at path is checked from its compiled file, that is
+    when it is in SEMCOR_FILES and was compiled after it last changed."""
+    compiled_path = compiled.file_name(path)
+    return (path in semcor_files() and os.path.exists(compiled_path)
+            and os.path.getmtime(compiled_path) >= os.path.getmtime(path))
+
+
+def fingerprint(path):
+    """Return the size and modification time of the source file and the
+    modification time of the compiled file if it is used."""
+    stat = os.stat(path)
+    compiled_time = None
+    if uses_compiled(path):
+        compiled_time = int(os.path.getmtime(compiled.file_name(path)))
+    return [stat.st_size, int(stat.st_mtime), compiled_time]
+
+
+def check_file(semcor_file, synsets):
+    """Return a list with the issues in the SemcorFile, using the SynsetTable for
+    the missing-synset check."""
+    issues = []
+    for sid, name in semcor_file.unexpected:
+        issues.append(['unexpected-element', sid, None, name])
+    pids = set()
+    sids = set()
+    for para in semcor_file.paragraphs:
+        if para.pid in pids:
+            issues.append(['duplicate-pid', None, None, para.pid])
+        pids.add(para.pid)
+        for sentence in para.sentences:
+            if sentence.sid in sids:
+                issues.append(['duplicate-sid', sentence.sid, None, "paragraph %s" % para.pid])
+            sids.add(sentence.sid)
+            if not sentence.elements:
+                issues.append(['empty-sentence', sentence.sid, None, ''])
+            for position, element in enumerate(sentence.elements):
+                if element.is_word_form():
+                    for check, detail in check_word_form(element, synsets):
+                        issues.append([check, sentence.sid, position, detail])
+    return issues
+
+
+def check_word_form(wf, synsets):
+    """Return a list of pairs of a check and a detail for the issues with the
+    attributes of the WordForm."""
+    issues = []
+    if wf.pn is not None and not wf.lemma == wf.pn == wf.rdf:
+        issues.append(('proper-name-mismatch', "lemma=%s pn=%s rdf=%s" % (wf.lemma, wf.pn, wf.rdf)))
+    if wf.rdf is not None and wf.pn is None:
+        issues.append(('rdf-without-pn', "rdf=%s %s" % (wf.rdf, wf.text)))
+    if wf.wnsn is None and wf.lexsn is None:
+        return issues
+    detail = "%s wnsn=%s lexsn=%s" % (wf.lemma, wf.wnsn, wf.lexsn)
+    if wf.wnsn is None or wf.lexsn is None:
+        issues.append(('incomplete-sense', detail))
+        return issues
+    if wf.lemma is None:
+        issues.append(('sense-without-lemma', detail))
+    wnsns = wf.wnsn.split(';')
+    lexsns = wf.lexsn.split(';')
+    if len(wnsns) > 1:
+        issues.append(('multi-valued-wnsn', detail))
+    if len(lexsns) > 1:
+        issues.append(('multi-valued-lexsn', detail))
+    if not all(wnsn.isdigit() for wnsn in wnsns):
+        issues.append(('malformed-wnsn', detail))
+    if not all(LEXSN.match(lexsn) for lexsn in lexsns):
+        issues.append(('malformed-lexsn', detail))
+        return issues
+    if not any(wf.pos.startswith(SYNSET_TAGS[lexsn[0]]) for lexsn in lexsns):
+        issues.append(('pos-mismatch', "%s %s" % (wf.pos, detail)))
+    # multi-valued senses are reported above and are not looked up
+    if wf.lemma is not None and len(lexsns) == 1 \
+       and synsets.get_id(wf.lemma, wf.lexsn) is None:
+        issues.append(('missing-synset', detail))
+    return issues
+
+
+def init_worker():
+    global _synsets
+    _synsets = load_synset_table()
+
+
+def validate_path(path):
+    """Check the Semcor file at path and return a pair of the path and its entry
+    for the report. This runs in a worker process."""
+    if uses_compiled(path):
+        semcor_file = compiled.read(compiled.file_name(path), 'file')
+    else:
+        # imported here because BeautifulSoup is slow to import
+        import parser
+        semcor_file = parser.parse(SemcorFile(path))
+    return path, make_entry(semcor_file, _synsets)
+
+
+def make_entry(semcor_file, synsets):
+    """Return the entry for the report for a SemcorFile that was read from a
+    compiled file or parsed."""
+    sentences = [s for para in semcor_file.paragraphs for s in para.sentences]
+    words = sum(1 for s in sentences for e in s.elements if e.is_word_form())
+    return {'fingerprint': fingerprint(semcor_file.fname), 'sentences': len(sentences),
+            'words': words, 'issues': check_file(semcor_file, synsets)}
+
+
+def validate(subcorpora=SUBCORPORA, processes=None, force=False):
+    """Check the files in the subcorpora that changed since the last report, or
+    all files if force is True, and return the updated report, which is also
+    saved. If processes is 1 all work is done in this process, otherwise a pool
+    of worker processes is used."""
+    t0 = time.time()
+    synsets = load_synset_table()
+    report = ValidationReport.load(synsets.fingerprint)
+    paths = [path for path in source_files(subcorpora)
+             if force or not report.is_current(path)]
+    if processes == 1 or len(paths) < 2:
+        init_worker()
+        report.entries.update(validate_path(path) for path in paths)
+    else:
+        pool = multiprocessing.Pool(processes, initializer=init_worker)
+        try:
+            report.entries.update(pool.imap_unordered(validate_path, paths, chunksize=4))
+        finally:
+            pool.close()
+            pool.join()
+    report.seconds = time.time() - t0
+    report.save()
+    return report
+
+
+def update_report(entries, synsets):
+    """Store the entries made with make_entry() when compiling in the saved
+    report."""
+    report = ValidationReport.load(synsets.fingerprint)
+    report.entries.update(entries)
+    report.save()
+    return report
+
+
+if __name__ == '__main__':
+
+    options, args = getopt.getopt(sys.argv[1:], 'j:e:', ['force', 'json'])
+    options = { name: value for (name, value) in options }
+    processes = int(options['-j']) if '-j' in options else None
+    examples = int(options.get('-e', 3))
+
+    for name in args:
+        if name not in SUBCORPORA:
+            sys.exit("unknown subcorpus %s, use one of %s" % (name, ', '.join(SUBCORPORA)))
+    report = validate(args or SUBCORPORA, processes, '--force' in options)
+    if '--json' in options:
+        json.dump(report.as_json(), sys.stdout, indent=1)
+    else:
+        print(report.summary(examples))
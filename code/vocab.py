@@ -0,0 +1,161 @@
+"""vocab.py
+
+Integer identifiers for lemmas, senses, synsets, part-of-speech tags and basic
+types.
+
+The vocabularies are created when compiling Semcor and saved with the compiled
+files. Identifiers are never changed once assigned, recompiling only adds the
+strings that were not seen before, so identifiers can be stored outside of this
+code and remain valid.
+
+Usage:
+
+>>> sc = Semcor()
+>>> sc.vocab.senses.get('walk%2:38:00::')
+>>> sc.vocab.senses.string(1234)
+>>> sc.vocab.encode_form(sc.lemma_idx['walk'][0])
+
+"""
+
+from array import array
+
+import compiled
+
+
+class Vocabulary(object):
+
+    """Maps strings to integers. Identifiers start at 0 and are assigned in the
+    order in which strings are added.
+
+    Instance variables:
+
+    strings : list of strings
+       The strings, indexed on identifier.
+
+    ids : dict (string -> int)
+       The identifier for each string.
+
+    """
+
+    def __init__(self):
+        self.strings = []
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __contains__(self, string):
+        return string in self.ids
+
+    def add(self, string):
+        """Add the string if it is not in the vocabulary and return its id."""
+        identifier = self.ids.get(string)
+        if identifier is None:
+            identifier = len(self.strings)
+            self.ids[string] = identifier
+            self.strings.append(string)
+        return identifier
+
+    def get(self, string, default=None):
+        """Return the identifier of the string or default if it is unknown."""
+        return self.ids.get(string, default)
+
+    def string(self, identifier):
+        return self.strings[identifier]
+
+    def encode(self, strings):
+        """Return an array with the identifiers of the strings, -1 is used for
+        strings that are not in the vocabulary."""
+        ids = self.ids
+        return array('i', [ids.get(s, -1) for s in strings])
+
+    def decode(self, identifiers):
+        """Return the list of strings for the identifiers."""
+        return [self.strings[i] for i in identifiers]
+
+
+class Vocabularies(object):
+
+    """All vocabularies, each one is stored in an instance variable with the
+    name given in NAMES.
+
+    tokens : Vocabulary
+       The text of all word forms and punctuations.
+
+    lemmas : Vocabulary
+       Lemmas of all word forms with a lemma.
+
+    senses : Vocabulary
+       Semcor senses like 'walk%2:38:00::', see WordForm.sense().
+
+    synsets : Vocabulary
+       Synset identifiers from the Synset instances of word forms.
+
+    pos : Vocabulary
+       Part-of-speech tags of all word forms.
+
+    btypes : Vocabulary
+       The basic types of synsets, a synset with more than one basic type is
+       added with its basic types separated by spaces, as in the Synset.
+
+    """
+
+    NAMES = ('tokens', 'lemmas', 'senses', 'synsets', 'pos', 'btypes')
+
+    def __init__(self):
+        for name in Vocabularies.NAMES:
+            setattr(self, name, Vocabulary())
+
+    def __setstate__(self, state):
+        # vocabularies compiled before a vocabulary was added to NAMES get an
+        # empty one, it is filled in when recompiling
+        self.__dict__.update(state)
+        for name in Vocabularies.NAMES:
+            if name not in state:
+                setattr(self, name, Vocabulary())
+
+    def __str__(self):
+        sizes = ' '.join(["%s=%d" % (name, len(getattr(self, name)))
+                          for name in Vocabularies.NAMES])
+        return "<Vocabularies %s>" % sizes
+
+    def add_file(self, semcor_file):
+        """Add all strings from a SemcorFile. Strings are added in document order,
+        this requires that WordForms in the file are bound to their synsets."""
+        for sentence in semcor_file.get_sentences():
+            for element in sentence.elements:
+                self.tokens.add(element.text)
+                if element.is_word_form():
+                    self.add_form(element)
+
+    def add_form(self, wf):
+        self.pos.add(wf.pos)
+        if wf.lemma is not None:
+            self.lemmas.add(wf.lemma)
+        if wf.has_sense():
+            self.senses.add(wf.sense())
+        if wf.synset is not None:
+            self.synsets.add(wf.synset.ssid)
+            self.btypes.add(wf.synset.btypes)
+
+    def encode_form(self, wf):
+        """Return a tuple with the lemma, sense, synset, pos and btypes identifiers
+        of the word form, using -1 for values that are missing or unknown."""
+        synset = wf.synset
+        return (self.lemmas.get(wf.lemma, -1),
+                self.senses.get(wf.sense(), -1),
+                -1 if synset is None else self.synsets.get(synset.ssid, -1),
+                self.pos.get(wf.pos, -1),
+                -1 if synset is None else self.btypes.get(synset.btypes, -1))
+
+    def pickle(self):
+        compiled.write(compiled.file_name('vocabularies'), self, 'vocabularies')
+
+
+def load_vocabularies():
+    """Return the compiled vocabularies, or empty vocabularies if they have not
+    been compiled yet or were compiled with an older version of the code."""
+    try:
+        return compiled.read(compiled.file_name('vocabularies'), 'vocabularies')
+    except (IOError, compiled.CompiledFormatError):
+        return Vocabularies()